@@ -0,0 +1,39 @@
+import msgpack
+import msgpack_numpy as m
+m.patch()
+
+from benchmarks.harness import benchmark
+from benchmarks.payloads import SENSOR_CONFIGS, response, compact_response
+from deepracer_gym.gym_adapter import DeepracerGymAdapter
+from deepracer_gym.protocol import ProtocolDecoder
+
+
+@benchmark('client.msgpack_encode', params=SENSOR_CONFIGS)
+def msgpack_encode(sensors):
+    payload = response(sensors)
+    return lambda: msgpack.packb(payload)
+
+
+@benchmark('client.msgpack_decode', params=SENSOR_CONFIGS)
+def msgpack_decode(sensors):
+    packed = msgpack.packb(response(sensors))
+    return lambda: msgpack.unpackb(packed)
+
+
+@benchmark('client.parse_response', params=SENSOR_CONFIGS)
+def parse_response(sensors):
+    packed = msgpack.packb(response(sensors))
+
+    def run():
+        # _parse_response mutates info, so parse a fresh decode each time
+        DeepracerGymAdapter._parse_response(msgpack.unpackb(packed))
+    return run
+
+
+@benchmark('client.compact_decode', params=SENSOR_CONFIGS)
+def compact_decode(sensors):
+    payload, schema, static = compact_response(sensors)
+    packed = msgpack.packb(payload)
+    decoder = ProtocolDecoder({'compact': True})
+    decoder.schema, decoder.static = schema, static
+    return lambda: decoder.decode(msgpack.unpackb(packed))
@@ -0,0 +1,21 @@
+import torch
+import msgpack
+import msgpack_numpy as m
+from gymnasium import spaces
+m.patch()
+
+from benchmarks.harness import benchmark
+from benchmarks.payloads import SENSOR_CONFIGS, response, observation_space
+from deepracer_gym.gym_adapter import DeepracerGymAdapter
+
+
+@benchmark('env.flatten_to_tensor', params=SENSOR_CONFIGS)
+def flatten_to_tensor(sensors):
+    '''FlattenObservation followed by the tensor conversion in PPOAgent.get_action.'''
+    space = observation_space(sensors)
+    observation, _, _, _ = DeepracerGymAdapter._parse_response(
+        msgpack.unpackb(msgpack.packb(response(sensors)))
+    )
+    return lambda: torch.tensor(
+        spaces.flatten(space, observation), dtype=torch.float32
+    )
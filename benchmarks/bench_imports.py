@@ -0,0 +1,34 @@
+import os
+import sys
+import subprocess
+
+from benchmarks.harness import benchmark
+
+
+ROOT: str=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# modules whose cold import time is budgeted, in seconds including
+# interpreter start-up; torch alone takes ~2 s on a CPU node
+IMPORT_BUDGETS: dict[str, float]={
+    'deepracer_gym': 0.6,
+    'src.cli': 0.8,
+    'src.ppo': 4.0,
+    'src.run': 4.5,
+}
+
+
+def _environment() -> dict[str, str]:
+    paths = [ROOT, os.path.join(ROOT, 'packages')]
+    if os.environ.get('PYTHONPATH'):
+        paths.append(os.environ['PYTHONPATH'])
+    return dict(os.environ, PYTHONPATH=os.pathsep.join(paths))
+
+
+@benchmark(
+    'imports.cold', threshold=1.5,
+    params={module: module for module in IMPORT_BUDGETS}, budget=IMPORT_BUDGETS
+)
+def cold_import(module):
+    environment = _environment()
+    command = [sys.executable, '-c', f'import {module}']
+    # a fresh interpreter per call: nothing is cached in sys.modules
+    return lambda: subprocess.run(command, env=environment, cwd=ROOT, check=True)
@@ -0,0 +1,40 @@
+import torch
+import numpy as np
+from gymnasium import spaces
+
+from benchmarks.harness import benchmark
+from benchmarks.payloads import SENSOR_CONFIGS, flat_environment
+from src.ppo import PPOAgent
+
+
+BUFFER_SIZES: dict[str, int]={'64': 64, '256': 256, '1024': 1024}
+UPDATE_SENSORS: list[str]=SENSOR_CONFIGS['front']
+
+
+def _agent(sensors, **kwargs) -> tuple[PPOAgent, spaces.Box]:
+    torch.manual_seed(0)
+    environment = flat_environment(sensors)
+    return PPOAgent(environment, **kwargs), environment.observation_space
+
+
+@benchmark('learner.get_action', params=SENSOR_CONFIGS)
+def get_action(sensors):
+    agent, space = _agent(sensors)
+    observation = space.sample().astype(np.float64)
+    return lambda: agent.get_action(observation)
+
+
+@benchmark('learner.update', params=BUFFER_SIZES, threshold=1.5)
+def update(size):
+    agent, space = _agent(UPDATE_SENSORS, epoch_k=1)
+    rng = np.random.default_rng(0)
+    observations = [space.sample() for _ in range(size)]
+    actions = rng.uniform(-1, 1, (size, 2))
+    log_probs = rng.normal(size=size)
+
+    def run():
+        # update() empties the buffer; refilling is a few list appends
+        for i in range(size):
+            agent.store(observations[i], actions[i], 1.0, i == size - 1, log_probs[i], 0)
+        agent.update()
+    return run
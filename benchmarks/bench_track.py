@@ -0,0 +1,26 @@
+import numpy as np
+
+from benchmarks.harness import benchmark
+from benchmarks.payloads import reward_params
+from deepracer_gym.track import track_geometry
+
+
+@benchmark('track.heading_error', params={'cached': True, 'linear_scan': False})
+def heading_error(cached):
+    '''one reward-function geometry query per step, as a reward variant would.'''
+    params = reward_params(np.random.default_rng(0))
+    x, y, heading = params['x'], params['y'], params['heading']
+
+    if cached:
+        def run():
+            track_geometry(params).heading_error(x, y, heading)
+        return run
+
+    def run():
+        # what a reward function does without the geometry module
+        waypoints = np.asarray(params['waypoints'])
+        closest = int(np.argmin(np.hypot(waypoints[:, 0] - x, waypoints[:, 1] - y)))
+        after = waypoints[(closest + 1) % len(waypoints)]
+        direction = np.degrees(np.arctan2(after[1] - waypoints[closest][1], after[0] - waypoints[closest][0]))
+        (heading - direction + 180) % 360 - 180
+    return run
@@ -0,0 +1,43 @@
+import torch
+
+from benchmarks.harness import benchmark
+from src.transforms import (
+    EncodeLiDAR,
+    EncodeSectorLiDAR,
+    EncodeStereoCameras,
+    EncodeFrontFacingCamera,
+    LIDAR_SHAPE,
+    SECTOR_LIDAR_SHAPE,
+    STEREO_CAMERA_SHAPE,
+    FRONT_FACING_CAMERA_SHAPE,
+)
+
+
+ENCODERS: dict[str, tuple]={
+    'front': (EncodeFrontFacingCamera, FRONT_FACING_CAMERA_SHAPE),
+    'stereo': (EncodeStereoCameras, STEREO_CAMERA_SHAPE),
+    'lidar': (EncodeLiDAR, LIDAR_SHAPE),
+    'sector_lidar': (EncodeSectorLiDAR, SECTOR_LIDAR_SHAPE),
+}
+BATCH_SIZES: tuple[int, ...]=(1, 64)
+
+
+def _encoder_benchmarks():
+    return {
+        f'{name},b={batch}': (encoder, shape, batch)
+        for name, (encoder, shape) in ENCODERS.items()
+        for batch in BATCH_SIZES
+    }
+
+
+@benchmark('transforms.encode', params=_encoder_benchmarks())
+def encode(spec):
+    encoder_class, shape, batch = spec
+    torch.manual_seed(0)
+    encoder = encoder_class().eval()
+    x = torch.rand(batch, *shape)
+
+    def run():
+        with torch.no_grad():
+            encoder(x)
+    return run
@@ -0,0 +1,141 @@
+import os
+import sys
+import json
+import time
+import platform
+import statistics
+from dataclasses import dataclass, field
+from typing import Callable
+
+
+REPEAT: int=7
+MIN_RUN_TIME: float=0.2         # seconds per repeat, calls are batched to reach it
+DEFAULT_THRESHOLD: float=1.25   # flag a regression when median > threshold * baseline
+BASELINE_DIR: str=os.path.join(os.path.dirname(__file__), 'baselines')
+
+
+@dataclass
+class Benchmark:
+    name: str
+    setup: Callable[[], Callable[[], object]]
+    threshold: float=DEFAULT_THRESHOLD
+    budget: float | None=None   # absolute limit on the median, seconds per call
+
+
+@dataclass
+class Result:
+    name: str
+    median: float               # seconds per call
+    spread: float               # interquartile range, seconds per call
+    calls: int
+    samples: list[float]=field(default_factory=list)
+
+
+REGISTRY: dict[str, Benchmark]={}
+
+
+def benchmark(
+        name: str,
+        threshold: float=DEFAULT_THRESHOLD,
+        params: dict | None=None,
+        budget: float | dict | None=None):
+    '''
+    registers a setup function returning the zero-argument callable to time.
+    With `params`, one benchmark is registered per value as `name[key]`
+    and the value is passed to the setup function; `budget` may then be a
+    dict with one budget per key.
+    '''
+    def decorator(setup):
+        if params is None:
+            REGISTRY[name] = Benchmark(name, setup, threshold, budget)
+        else:
+            for key, value in params.items():
+                REGISTRY[f'{name}[{key}]'] = Benchmark(
+                    f'{name}[{key}]', (lambda value=value: setup(value)), threshold,
+                    budget.get(key) if isinstance(budget, dict) else budget
+                )
+        return setup
+    return decorator
+
+
+def _calls_per_repeat(fn) -> int:
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        if time.perf_counter() - start >= MIN_RUN_TIME or calls >= 1 << 20:
+            return calls
+        calls *= 2
+
+
+def measure(bench: Benchmark, repeat: int=REPEAT) -> Result:
+    fn = bench.setup()
+    fn()                                    # warm-up (lazy init, caches)
+    calls = _calls_per_repeat(fn)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        samples.append((time.perf_counter() - start) / calls)
+    quartiles = statistics.quantiles(samples, n=4) if len(samples) > 1 else [0, 0, 0]
+    return Result(
+        bench.name, statistics.median(samples), quartiles[2] - quartiles[0], calls, samples
+    )
+
+
+def environment_info() -> dict[str, str]:
+    info = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'processor': platform.processor() or 'unknown',
+        'node': platform.node(),
+        'cpus': str(os.cpu_count()),
+    }
+    for module in ('numpy', 'torch', 'msgpack', 'gymnasium'):
+        if module in sys.modules:
+            info[module] = getattr(sys.modules[module], '__version__', 'unknown')
+    return info
+
+
+def baseline_path(name: str) -> str:
+    return name if name.endswith('.json') else os.path.join(BASELINE_DIR, f'{name}.json')
+
+
+def save_baseline(results: list[Result], name: str):
+    path = baseline_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump({
+            'environment': environment_info(),
+            'results': {
+                r.name: {'median': r.median, 'spread': r.spread, 'calls': r.calls}
+                for r in results
+            },
+        }, file, indent=2, sort_keys=True)
+    return path
+
+
+def compare(results: list[Result], name: str) -> list[tuple[Result, float, float]]:
+    '''returns (result, baseline median, ratio) for every regression.'''
+    with open(baseline_path(name), 'r') as file:
+        baseline = json.load(file)['results']
+    regressions = []
+    for result in results:
+        if result.name not in baseline:
+            continue
+        reference = baseline[result.name]['median']
+        ratio = result.median / reference if reference > 0 else float('inf')
+        if ratio > REGISTRY[result.name].threshold:
+            regressions.append((result, reference, ratio))
+    return regressions
+
+
+def over_budget(results: list[Result]) -> list[tuple[Result, float]]:
+    '''returns (result, budget) for every result slower than its benchmark's budget.'''
+    return [
+        (result, REGISTRY[result.name].budget) for result in results
+        if REGISTRY[result.name].budget is not None
+        and result.median > REGISTRY[result.name].budget
+    ]
@@ -0,0 +1,90 @@
+import numpy as np
+from types import SimpleNamespace
+from gymnasium import spaces
+
+from deepracer_gym.envs.utils import SENSOR_SPACE, CAMERA_SHAPE, LIDAR_SHAPE
+
+
+# sensor configurations benchmarked (agent_params.json 'sensor' lists)
+SENSOR_CONFIGS: dict[str, list[str]]={
+    'front': ['FRONT_FACING_CAMERA'],
+    'stereo': ['STEREO_CAMERAS'],
+    'stereo+lidar': ['STEREO_CAMERAS', 'LIDAR'],
+    'lidar': ['LIDAR'],
+}
+NUM_WAYPOINTS: int=120
+NUM_OBJECTS: int=3
+
+
+def raw_measurement(sensor: str, rng: np.random.Generator) -> np.ndarray:
+    '''a measurement as the simulator sends it (cameras are H x W x C).'''
+    if sensor == 'FRONT_FACING_CAMERA':
+        return rng.integers(0, 256, CAMERA_SHAPE + (3,), dtype=np.uint8)
+    if sensor == 'STEREO_CAMERAS':
+        return rng.integers(0, 256, CAMERA_SHAPE + (2,), dtype=np.uint8)
+    if sensor == 'LIDAR':
+        return rng.uniform(0.15, 1.0, LIDAR_SHAPE)
+    raise ValueError(f'No payload for sensor {sensor}.')
+
+
+def reward_params(rng: np.random.Generator, step: int=10) -> dict:
+    theta = np.linspace(0, 2 * np.pi, NUM_WAYPOINTS)
+    return {
+        'all_wheels_on_track': True, 'x': 1.0, 'y': 2.0, 'heading': 45.0,
+        'distance_from_center': 0.1, 'is_left_of_center': True,
+        'progress': 12.5, 'steps': step, 'speed': 1.5, 'steering_angle': -5.0,
+        'track_width': 0.76, 'track_length': 17.7,
+        'waypoints': np.stack((np.cos(theta), np.sin(theta)), -1).tolist(),
+        'closest_waypoints': [3, 4], 'is_offtrack': False, 'is_crashed': False,
+        'is_reversed': False,
+        'objects_distance': rng.uniform(0, 17, NUM_OBJECTS).tolist(),
+        'objects_location': rng.uniform(-3, 3, (NUM_OBJECTS, 2)).tolist(),
+        'objects_left_of_center': [True, False, True],
+        'objects_speed': [0.2] * NUM_OBJECTS,
+        'objects_heading': [0.0] * NUM_OBJECTS,
+        'objects_distance_from_center': [0.2] * NUM_OBJECTS,
+        'closest_objects': [0, 1],
+    }
+
+
+def response(sensors: list[str], seed: int=0) -> dict:
+    '''a `GymAgent.observe` response (the msgpacked env_response.__dict__).'''
+    rng = np.random.default_rng(seed)
+    return {
+        '_next_state': {sensor: raw_measurement(sensor, rng) for sensor in sensors},
+        '_reward': 0.0,
+        '_game_over': False,
+        '_goal': None,
+        'info': {
+            'reward_params': reward_params(rng),
+            'episode_status': {
+                'lap_complete': False, 'crashed': False, 'reversed': False,
+                'off_track': False, 'immobilized': False, 'time_up': False,
+            },
+        },
+    }
+
+
+def observation_space(sensors: list[str]) -> spaces.Dict:
+    return spaces.Dict({sensor: SENSOR_SPACE[sensor] for sensor in sensors})
+
+
+def flat_environment(sensors: list[str]) -> SimpleNamespace:
+    '''the spaces PPOAgent reads from a FlattenObservation-wrapped env.'''
+    return SimpleNamespace(
+        observation_space=spaces.flatten_space(observation_space(sensors)),
+        action_space=spaces.Box(low=-1, high=1, shape=(2,), dtype=np.float64),
+    )
+
+
+STATIC_REWARD_PARAMS: tuple[str, ...]=('waypoints', 'track_width', 'track_length')
+
+
+def compact_response(sensors: list[str], seed: int=0) -> dict:
+    '''a mid-episode response in the compact protocol (no static data, no schema).'''
+    payload = response(sensors, seed)
+    reward_params = payload['info']['reward_params']
+    schema = sorted(k for k in reward_params if k not in STATIC_REWARD_PARAMS)
+    payload['info']['reward_params'] = [reward_params[k] for k in schema]
+    static = {k: reward_params[k] for k in STATIC_REWARD_PARAMS}
+    return payload, schema, static
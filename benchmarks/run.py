@@ -0,0 +1,77 @@
+import sys
+import fnmatch
+import argparse
+import importlib
+
+from benchmarks.harness import (
+    REGISTRY, REPEAT, DEFAULT_THRESHOLD, measure, save_baseline, compare, over_budget
+)
+
+
+MODULES: tuple[str, ...]=(
+    'benchmarks.bench_client',
+    'benchmarks.bench_env',
+    'benchmarks.bench_learner',
+    'benchmarks.bench_transforms',
+    'benchmarks.bench_track',
+    'benchmarks.bench_imports',
+)
+
+
+def main():
+    ap = argparse.ArgumentParser('python -m benchmarks.run')
+    ap.add_argument('-k', '--filter', default='*',
+                    help='glob over benchmark names, e.g. "client.*"')
+    ap.add_argument('--repeat', type=int, default=REPEAT)
+    ap.add_argument('--threads', type=int, default=1,
+                    help='torch intra-op threads (fixed for comparable numbers)')
+    ap.add_argument('--save', metavar='NAME', default=None,
+                    help='store results as benchmarks/baselines/NAME.json')
+    ap.add_argument('--compare', metavar='NAME', default=None,
+                    help=f'fail when a benchmark is slower than NAME by its threshold '
+                         f'(default x{DEFAULT_THRESHOLD})')
+    ap.add_argument('--list', action='store_true')
+    args = ap.parse_args()
+
+    for module in MODULES:
+        importlib.import_module(module)
+    import torch
+    torch.set_num_threads(args.threads)
+
+    names = [name for name in REGISTRY if fnmatch.fnmatch(name, args.filter)]
+    if args.list:
+        print('\n'.join(names))
+        return 0
+
+    results = []
+    for name in names:
+        result = measure(REGISTRY[name], repeat=args.repeat)
+        results.append(result)
+        print(
+            f'{name:<48} {1e6 * result.median:>12.1f} us '
+            f'± {1e6 * result.spread:>9.1f} us  ({result.calls} calls x {args.repeat})'
+        )
+
+    if args.save:
+        print(f'Saved baseline to {save_baseline(results, args.save)}')
+
+    failed = False
+    for result, budget in over_budget(results):
+        print(f'OVER BUDGET {result.name}: {result.median:.3f} s > {budget:.3f} s')
+        failed = True
+
+    if args.compare:
+        regressions = compare(results, args.compare)
+        for result, reference, ratio in regressions:
+            print(
+                f'REGRESSION {result.name}: {1e6 * result.median:.1f} us vs '
+                f'{1e6 * reference:.1f} us baseline (x{ratio:.2f})'
+            )
+        if regressions:
+            return 1
+        print(f'No regressions against {args.compare}.')
+    return int(failed)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -39,3 +39,31 @@ def reward_function(params):
         reward += (speed * 1.0)
 
     return float(reward)
+
+
+def reward_function_vectorized(params):
+    '''
+    Same reward as `reward_function`, over column arrays of
+    recorded reward_params (see `src.reward_replay.load_columns`).
+    '''
+    import numpy as np
+
+    all_wheels_on_track = params['all_wheels_on_track'].astype(bool)
+    distance_from_center = params['distance_from_center']
+    track_width = params['track_width']
+    objects_distance = np.stack(params['objects_distance']).astype(float)
+    closest_objects = np.stack(params['closest_objects']).astype(int)
+    is_crashed = params['is_crashed'].astype(bool)
+    speed = params['speed']
+
+    reward = np.where(distance_from_center > 0.4 * track_width, 0.5, 1.0)
+
+    dist_to_obj = np.take_along_axis(
+        objects_distance, closest_objects[:, :1], axis=1
+    )[:, 0]
+    reward = np.where(dist_to_obj < 2.0, 0.5 * reward, reward)
+    reward = np.where(dist_to_obj < 1.0, 1e-3, reward)
+    reward = np.where(dist_to_obj >= 2.0, reward + speed * 1.0, reward)
+
+    failed = is_crashed | ~all_wheels_on_track
+    return np.where(failed, 1e-3, reward)
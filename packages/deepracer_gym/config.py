@@ -0,0 +1,286 @@
+import os
+import json
+import yaml
+import shutil
+import hashlib
+import threading
+import importlib.util
+from loguru import logger
+from dataclasses import dataclass, field
+
+
+CONFIG_DIR: str='configs'
+# canonical file names inside a config directory (configs/ or a run's own copy)
+AGENT_PARAMS_FILE: str='agent_params.json'
+ENVIRONMENT_PARAMS_FILE: str='environment_params.yaml'
+REWARD_FUNCTION_FILE: str='reward_function.py'
+HYPER_PARAMS_FILE: str='hyper_params.yaml'
+AGENT_PARAMS_PATH: str=os.path.join(CONFIG_DIR, AGENT_PARAMS_FILE)
+ENVIRONMENT_PARAMS_PATH: str=os.path.join(CONFIG_DIR, ENVIRONMENT_PARAMS_FILE)
+# what the policy observes: the configured sensors, or a state vector built
+# from reward_params (deepracer_gym.wrappers.PrivilegedState)
+OBSERVATION_MODES: tuple[str, ...]=('sensors', 'state')
+# (NUMBER_OF_OBSTACLES, NUMBER_OF_BOT_CARS) of each race type
+RACE_TYPES: dict[tuple[int, int], str]={
+    (0, 0): 'time_trial',
+    (6, 0): 'obstacle_avoidance',
+    (0, 3): 'head_to_bot',
+}
+
+
+def validate_action_space_config(config: dict, action_space_type: str):
+    # make sure action_space defined correctly
+    if action_space_type == 'discrete':
+        assert isinstance(config['action_space'], list), \
+                f'action_space_type is discrete but action_space is not a list.'
+
+        for action in config['action_space']:
+            assert isinstance(action, dict), \
+                f'All actions should be defined as dictionaries in action_space.'
+
+            assert all(
+                (
+                    key in action
+                    and
+                    isinstance(action[key], (int, float))
+                ) for key in ('steering_angle', 'speed')
+            ), f'steering_angle or speed incorrectly defined for action in action_space.'
+    elif action_space_type == 'continuous':
+        assert isinstance(config['action_space'], dict), \
+                f'action_space_type is continuous but action_space is not a dictionary.'
+
+        assert all(
+            (
+                key in config['action_space']
+                and
+                isinstance(config['action_space'][key], dict)
+            ) for key in ('steering_angle', 'speed')
+        ), f'steering_angle or speed incorrectly defined for action in action_space.'
+
+        for action, bounds in config['action_space'].items():
+            assert all(
+                (
+                    key in bounds
+                    and
+                    isinstance(bounds[key], (int, float))
+                ) for key in ('low', 'high')
+            ), f'Bounds incorrectly defined for {action} in action_space.'
+
+            assert bounds['low'] < bounds['high'], \
+                f'Lower bound should be lower than upper bound for {action} in action_space.'
+    else:
+        raise ValueError(
+            f'action_space_type can only be continuous or discrete.'
+        )
+
+    return True
+
+
+def action_space_type(config: dict):
+    if 'action_space_type' in config:
+        if config['action_space_type'] not in ('discrete', 'continuous'):
+            raise ValueError(
+                f'Incorrectly defined action_space_type in config file.'
+            )
+        space_type = config['action_space_type']
+    else:
+        if isinstance(config['action_space'], list):
+            # assuming discrete
+            space_type = 'discrete'
+        elif isinstance(config['action_space'], dict):
+            # assuming continuous
+            space_type = 'continuous'
+        else:
+            raise ValueError(
+                f'Incorrectly defined action_space in config file.'
+            )
+    return space_type
+
+
+def race_type(number_of_obstacles: int, number_of_bot_cars: int) -> str:
+    try:
+        return RACE_TYPES[(int(number_of_obstacles), int(number_of_bot_cars))]
+    except KeyError:
+        raise ValueError(
+            f'Incorrect configuration for NUMBER_OF_OBSTACLES or NUMBER_OF_BOT_CARS.'
+        )
+
+
+@dataclass(frozen=True)
+class AgentParams:
+    '''validated contents of agent_params.json.'''
+    path: str
+    sensors: tuple[str, ...]
+    action_space_type: str
+    action_space: list | dict
+    observation: str
+    raw: dict=field(repr=False)
+
+    @classmethod
+    def from_dict(cls, config: dict, path: str='<dict>'):
+        assert 'action_space' in config, \
+            f'Action space not defined in config file {path}.'
+        try:
+            space_type = action_space_type(config)
+        except Exception as e:
+            raise ValueError(
+                f'Incorrectly defined action_space in config file {path}.'
+            ) from e
+        validate_action_space_config(config, space_type)
+        observation = config.get('observation', OBSERVATION_MODES[0])
+        assert observation in OBSERVATION_MODES, \
+            f'observation can only be one of {OBSERVATION_MODES} in {path}. Got {observation} instead.'
+        return cls(
+            path=path,
+            sensors=tuple(config.get('sensor', ())),
+            action_space_type=space_type,
+            action_space=config['action_space'],
+            observation=observation,
+            raw=config,
+        )
+
+
+@dataclass(frozen=True)
+class EnvironmentParams:
+    '''validated contents of environment_params.yaml.'''
+    path: str
+    world_name: str
+    number_of_obstacles: int
+    number_of_bot_cars: int
+    race_type: str
+    raw: dict=field(repr=False)
+
+    @classmethod
+    def from_dict(cls, config: dict, path: str='<dict>'):
+        if 'WORLD_NAME' not in config:
+            raise ValueError(
+                f'WORLD_NAME not defined in {path}'
+            )
+        obstacles = int(config.get('NUMBER_OF_OBSTACLES', 0))
+        bots = int(config.get('NUMBER_OF_BOT_CARS', 0))
+        return cls(
+            path=path,
+            world_name=config['WORLD_NAME'],
+            number_of_obstacles=obstacles,
+            number_of_bot_cars=bots,
+            race_type=race_type(obstacles, bots),
+            raw=config,
+        )
+
+
+class _ConfigCache:
+    '''
+    parsed and validated configs keyed by absolute path; an entry is reused
+    until the file's mtime or size changes, so env construction in loops
+    only pays for an os.stat.
+    '''
+    def __init__(self):
+        self._entries: dict[tuple[str, str], tuple[tuple[int, int], object]]={}
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, path: str, load):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        key = (kind, path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+        value = load(path)
+        with self._lock:
+            self._entries[key] = (version, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_CACHE = _ConfigCache()
+
+
+def _load_agent_params(path: str) -> AgentParams:
+    with open(path, 'r') as file:
+        return AgentParams.from_dict(json.load(file), path)
+
+
+def _load_environment_params(path: str) -> EnvironmentParams:
+    with open(path, 'r') as file:
+        return EnvironmentParams.from_dict(yaml.safe_load(file), path)
+
+
+def load_agent_params(path: str=AGENT_PARAMS_PATH) -> AgentParams:
+    return _CACHE.get('agent', path, _load_agent_params)
+
+
+def load_environment_params(path: str=ENVIRONMENT_PARAMS_PATH) -> EnvironmentParams:
+    return _CACHE.get('environment', path, _load_environment_params)
+
+
+def clear_cache():
+    _CACHE.clear()
+
+
+def config_path(config_dir: str | None, file_name: str) -> str:
+    return os.path.join(config_dir or CONFIG_DIR, file_name)
+
+
+def load_module(path: str, prefix: str='config_module'):
+    '''
+    import a python file (e.g. a reward function) under a name unique to
+    its path, so files from several config directories can coexist.
+    '''
+    path = os.path.abspath(path)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f'Module not found: {path}')
+
+    digest = hashlib.sha1(path.encode()).hexdigest()[:8]
+    spec = importlib.util.spec_from_file_location(f'{prefix}_{digest}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_reward_function(config_dir: str | None=None):
+    module = load_module(
+        config_path(config_dir, REWARD_FUNCTION_FILE), prefix='reward_function'
+    )
+    if not hasattr(module, 'reward_function'):
+        raise ValueError(
+            f'{module.__file__} does not define reward_function(params).'
+        )
+    return module.reward_function
+
+
+def materialize(
+        directory: str,
+        environment_params: str | None=None,
+        agent_params: str | None=None,
+        reward_function: str | None=None,
+        hyper_params: str | None=None
+    ):
+    '''
+    copy the chosen config variants into `directory` under their canonical
+    names (defaults from configs/), validate them and return the directory.
+    A run reads only its own copy, so runs in one checkout don't interfere.
+    '''
+    sources = {
+        ENVIRONMENT_PARAMS_FILE: environment_params,
+        AGENT_PARAMS_FILE: agent_params,
+        REWARD_FUNCTION_FILE: reward_function,
+        HYPER_PARAMS_FILE: hyper_params,
+    }
+    os.makedirs(directory, exist_ok=True)
+    for file_name, source in sources.items():
+        source = source or os.path.join(CONFIG_DIR, file_name)
+        if not os.path.exists(source):
+            raise FileNotFoundError(f'Config not found: {source}')
+        shutil.copy2(source, os.path.join(directory, file_name))
+
+    # fail now rather than in the simulator or mid-run
+    load_environment_params(os.path.join(directory, ENVIRONMENT_PARAMS_FILE))
+    load_agent_params(os.path.join(directory, AGENT_PARAMS_FILE))
+    load_reward_function(directory)
+    logger.info(f'Configs materialized in {directory}.')
+    return directory
@@ -4,18 +4,18 @@ import gymnasium as gym
 from loguru import logger
 from gymnasium import spaces
 from typing import TypeAlias, Callable
-import matplotlib.pyplot as plt
 
-from deepracer_gym.gym_adapter import DeepracerGymAdapter
+from deepracer_gym.gym_adapter import DeepracerGymAdapter, SUBSTEPS_INFO_KEY
+from deepracer_gym.profiling import profile
 from deepracer_gym.envs.utils import (
     make_action_space,
     make_observation_space,
-    num_channels,
+    observation_to_frame,
     string_to_port,
     get_host_name
 )
-from configs.reward_function import (
-    reward_function as DEFAULT_REWARD_FUNCTION
+from deepracer_gym.config import (
+    AGENT_PARAMS_FILE, config_path, load_reward_function
 )
 
 
@@ -42,7 +42,12 @@ class DeepracerGymEnv(gym.Env):
             host: str=HOST,
             port: int=port,
             render_mode: str='rgb_array',
-            reward_function: Callable=DEFAULT_REWARD_FUNCTION,
+            reward_function: Callable | None=None,
+            config_dir: str | None=None,
+            compact: bool=False,
+            image_codec: str | None=None,
+            transport: str='tcp',
+            action_repeat: int=1,
             **kwargs
         ):
         super().__init__(**kwargs)
@@ -50,21 +55,35 @@ class DeepracerGymEnv(gym.Env):
             f'Using to port {port} for deepracer server.'
         )
         self.render_mode = render_mode
-        self.action_space, self._action_metadata = make_action_space()
-        self.observation_space, self._observation_metadata = make_observation_space()
-        self.reward_function = reward_function
+        # configs/ by default, or a run's own copy so concurrent runs don't clash
+        self.config_dir = config_dir
+        agent_params_path = config_path(config_dir, AGENT_PARAMS_FILE)
+        self.action_space, self._action_metadata = make_action_space(agent_params_path)
+        self.observation_space, self._observation_metadata = make_observation_space(agent_params_path)
+        self.reward_function = (
+            reward_function if reward_function is not None
+            else load_reward_function(config_dir)
+        )
         
         if isinstance(self.action_space, spaces.Discrete):
             action_space_type='discrete'
         elif isinstance(self.action_space, spaces.Box):
             action_space_type = 'continuous'
+        # compact/image_codec/transport are negotiated with the server, which
+        # falls back to the original format for anything it does not support
         self.deepracer_gym_adapter = DeepracerGymAdapter(
-            action_space_type, host=host, port=port
+            action_space_type, host=host, port=port,
+            compact=compact, image_codec=image_codec, transport=transport
         )
+        # last parsed observation, for render() and frame taps (video)
+        self.last_observation = None
+        # simulator steps per action (see deepracer_gym.wrappers.ActionRepeat)
+        self.action_repeat = action_repeat
     
     def reset(self, **kwargs):
         super().reset(**kwargs)
         observation, info = self.deepracer_gym_adapter.env_reset()
+        self.last_observation = observation
         return observation, info
     
     def step(self, action: ActionType):
@@ -72,44 +91,25 @@ class DeepracerGymEnv(gym.Env):
             f'Infeasible action. Action space does not containr {action}.'
         
         observation, terminated, truncated, info = (
-            self.deepracer_gym_adapter.send_action(action)
+            self.deepracer_gym_adapter.send_action(action, self.action_repeat)
         )
-        reward = self.reward_function(info['reward_params'])
+        self.last_observation = observation
+        with profile('env.reward'):
+            # repeated actions: one reward per simulator step, in order
+            reward = 0.0
+            for reward_params in info.get(SUBSTEPS_INFO_KEY, ()):
+                reward += self.reward_function(reward_params)
+            reward += self.reward_function(info['reward_params'])
         return observation, reward, terminated, truncated, info
     
     def render(self, mode='rgb_array'):
-        observation, _, _, _ = self.deepracer_gym_adapter._parse_response(
-            self.deepracer_gym_adapter.response
-        )
-        measurement = None
-        for sensor in observation:
-            if 'CAMERA' in sensor:
-                measurement = observation[sensor]
-        
-        if measurement is None:
-            raise ValueError(
-                f'Cannot render output of sensors {list(observation.keys())}.'
-            )
-        
-        channels = num_channels(measurement)
-        if channels == 2:
-            # stereo camera
-            measurement = np.hstack((
-                measurement[0, :, :], measurement[1, :, :]
-            ))
-        
-        channels = num_channels(measurement)
-        if channels == 1:
-            # greyscale image
-            measurement = np.stack(
-                3 * (measurement,), axis=-1
-            )
-        elif channels == 3:
-            # front facing camera
-            measurement = measurement.transpose(1, 2, 0)
+        if self.last_observation is None:
+            raise RuntimeError('Call reset() before render().')
+        frame = observation_to_frame(self.last_observation)
         
         if mode == 'human':
-            plt.imshow(np.asarray(measurement))
+            import matplotlib.pyplot as plt
+            plt.imshow(frame)
             plt.axis('off')
         elif mode == 'rgb_array':
-            return np.asarray(measurement)
+            return frame
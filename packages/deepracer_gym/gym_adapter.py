@@ -4,6 +4,8 @@ from typing import TypeAlias
 from collections.abc import Callable
 
 from deepracer_gym.zmq_client import DeepracerClientZMQ
+from deepracer_gym.profiling import profile
+from deepracer_gym.protocol import SUBSTEPS_KEY, requested_protocol
 from deepracer_gym.utils import (
     terminated_check, truncated_check
 )
@@ -20,13 +22,18 @@ DUMMY_ACTION_CONTINUOUS: Callable[[], np.ndarray[float]]=(
     lambda: np.random.uniform(-1, 1, 2)
 )
 ActionType: TypeAlias=(int | np.ndarray | list[float])
+# info key with the reward_params of the earlier steps of a repeated action
+SUBSTEPS_INFO_KEY: str='substep_reward_params'
 
 class DeepracerGymAdapter:
     def __init__(
             self,
             action_space_type: str,
             host: str=HOST,
-            port: int=PORT):
+            port: int=PORT,
+            compact: bool=False,
+            image_codec: str | None=None,
+            transport: str='tcp'):
         if action_space_type == 'discrete':
             self.dummy_action = DUMMY_ACTION_DISCRETE
         elif action_space_type == 'continuous':
@@ -35,24 +42,39 @@ class DeepracerGymAdapter:
             raise ValueError(
                 f'Action space can only be discrete or continuous. Got {action_space_type} instead.'
             )
-        self.zmq_client = DeepracerClientZMQ(host=host, port=port)
+        self.zmq_client = DeepracerClientZMQ(
+            host=host, port=port,
+            protocol=requested_protocol(
+                compact=compact, image_codec=image_codec, transport=transport
+            )
+        )
         self.zmq_client.ready()
         self.response = None
         self.done = False
+        self.round_trips = 0
 
     def _send_action(self, action: ActionType):
         action: dict[str, ActionType] = {'action': action}
-        self.response = self.zmq_client.send_message(action)
+        return self._send(action)
+
+    def _send(self, message: dict[str, object]):
+        self.response = self.zmq_client.send_message(message)
         self.done = self.response['_game_over']
+        self.round_trips += 1
         return self.response
     
     def env_reset(self):
+        self.round_trips = 0
         if self.response is None:
             # First communication to zmq server
             self.response = self.zmq_client.recieve_response()
             # Smaller timeout after first connection
             self.zmq_client.socket.set(zmq.SNDTIMEO, TIMEOUT_SHORT)
             self.zmq_client.socket.set(zmq.RCVTIMEO, TIMEOUT_SHORT)
+        elif self.zmq_client.decoder.supports('reset'):
+            # server finishes the episode itself and replies with the new one
+            with profile('adapter.reset'):
+                self._send({'reset': 1})
         elif self.done:
             pass
         else:
@@ -74,13 +96,40 @@ class DeepracerGymAdapter:
             )
 
         observation, _, _, info = self._parse_response(self.response)
+        info['reset_round_trips'] = self.round_trips
         return observation, info
     
-    def send_action(self, action: ActionType):
+    def send_action(self, action: ActionType, repeat: int=1):
         if self.done:
             return self._parse_response(self.response)
-        response = self._send_action(action)
-        return self._parse_response(response)
+        if repeat == 1:
+            with profile('zmq.round_trip'):
+                response = self._send_action(action)
+            with profile('adapter.parse'):
+                return self._parse_response(response)
+
+        with profile('zmq.round_trip'):
+            if self.zmq_client.decoder.supports('action_repeat'):
+                # the server runs all `repeat` steps (fewer if the episode ends)
+                response = self._send({'action': action, 'repeat': repeat})
+                substeps = response.pop(SUBSTEPS_KEY, [])
+            else:
+                substeps = []
+                response = self._send_action(action)
+                for _ in range(repeat - 1):
+                    if self.done:
+                        break
+                    substeps.append(self._reward_params(response))
+                    response = self._send_action(action)
+        with profile('adapter.parse'):
+            observation, terminated, truncated, info = self._parse_response(response)
+        info[SUBSTEPS_INFO_KEY] = substeps
+        return observation, terminated, truncated, info
+
+    @staticmethod
+    def _reward_params(response: dict) -> dict:
+        info = response['info']
+        return info.get('reward_params', {}) if isinstance(info, dict) else {}
     
     @staticmethod
     def _parse_response(response: dict):
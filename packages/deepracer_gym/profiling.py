@@ -0,0 +1,176 @@
+import os
+import json
+import math
+import time
+import threading
+from collections import deque
+from loguru import logger
+
+
+PROFILE_ENV_VAR: str='DEEPRACER_PROFILE'
+LOG_INTERVAL: float=60.0                # seconds between percentile logs
+TRACE_CAPACITY: int=200_000             # most recent stage events kept for tracing
+# log-spaced histogram buckets from 1 us to ~100 s
+MIN_EXPONENT: int=-6
+MAX_EXPONENT: int=2
+BUCKETS_PER_DECADE: int=20
+NUM_BUCKETS: int=(MAX_EXPONENT - MIN_EXPONENT) * BUCKETS_PER_DECADE + 1
+PERCENTILES: tuple[float, ...]=(50, 95, 99)
+
+
+class Histogram:
+    '''
+    fixed log-spaced latency histogram; recording is O(1) and
+    percentiles are accurate to a bucket width (~12%).
+    '''
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        if seconds > 0:
+            bucket = int((math.log10(seconds) - MIN_EXPONENT) * BUCKETS_PER_DECADE)
+            bucket = min(max(bucket, 0), NUM_BUCKETS - 1)
+        else:
+            bucket = 0
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return float('nan')
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                # geometric centre of the bucket
+                return 10 ** (MIN_EXPONENT + (bucket + 0.5) / BUCKETS_PER_DECADE)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        summary = {
+            'count': self.count,
+            'mean_ms': 1e3 * self.total / self.count if self.count else float('nan'),
+            'max_ms': 1e3 * self.max,
+        }
+        for q in PERCENTILES:
+            summary[f'p{q:g}_ms'] = 1e3 * self.percentile(q)
+        return summary
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class Profiler:
+    '''
+    per-stage timings for the step hot path (ZMQ round-trip, msgpack
+    decode, response parsing, reward, policy forward, buffer, update).
+    When disabled, `stage()` hands back a shared no-op context manager.
+    '''
+    def __init__(self, enabled: bool=False, log_interval: float=LOG_INTERVAL):
+        self.enabled = enabled
+        self.log_interval = log_interval
+        self.reset()
+
+    def reset(self):
+        self.histograms: dict[str, Histogram]={}
+        self.trace = deque(maxlen=TRACE_CAPACITY)
+        self._origin = time.perf_counter()
+        self._last_log = self._origin
+
+    def enable(self, enabled: bool=True):
+        self.enabled = enabled
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name: str, start: float, end: float):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.record(end - start)
+        self.trace.append((name, start, end, threading.get_ident()))
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        return {
+            name: histogram.summary()
+            for name, histogram in sorted(self.histograms.items())
+        }
+
+    def log_summary(self):
+        lines = [
+            f'{name:<20} n={s["count"]:<8} mean={s["mean_ms"]:.3f}ms '
+            f'p50={s["p50_ms"]:.3f}ms p95={s["p95_ms"]:.3f}ms p99={s["p99_ms"]:.3f}ms'
+            for name, s in self.summary().items()
+        ]
+        logger.info('Step latency breakdown:\n' + '\n'.join(lines))
+
+    def maybe_log(self):
+        '''call once per step; logs percentiles every `log_interval` seconds.'''
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if now - self._last_log >= self.log_interval:
+            self._last_log = now
+            self.log_summary()
+
+    def dump_chrome_trace(self, path: str):
+        '''writes recent stage events in Chrome trace format (chrome://tracing, Perfetto).'''
+        events = [
+            {
+                'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': tid,
+                'ts': 1e6 * (start - self._origin), 'dur': 1e6 * (end - start),
+            } for name, start, end, tid in self.trace
+        ]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+        logger.info(f'Wrote {len(events)} trace events to {path}.')
+
+
+PROFILER = Profiler(
+    enabled=os.environ.get(PROFILE_ENV_VAR, '0') not in ('', '0', 'false', 'False')
+)
+
+
+def profile(name: str):
+    '''`with profile('zmq.recv'): ...` records into the global profiler.'''
+    return PROFILER.stage(name)
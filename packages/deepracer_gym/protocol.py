@@ -0,0 +1,174 @@
+import os
+import uuid
+import numpy as np
+from loguru import logger
+
+
+# Options the client may request in its `ready` message. The server answers
+# with the subset it accepted under `_protocol` in its first response; old
+# servers answer nothing and the client keeps the original (verbose) format.
+PROTOCOL_KEY: str='protocol'
+ACCEPTED_KEY: str='_protocol'
+STATIC_KEY: str='_static'
+SCHEMA_KEY: str='_schema'
+CODEC_KEY: str='__codec__'
+SHM_KEY: str='__shm__'
+SUBSTEPS_KEY: str='_substeps'
+IMAGE_CODECS: tuple[str, ...]=('jpeg', 'lz4')
+TRANSPORTS: tuple[str, ...]=('tcp', 'shm')
+SHM_DIR: str='/dev/shm'
+JPEG_QUALITY: int=90
+
+
+def requested_protocol(
+        compact: bool=False,
+        image_codec: str | None=None,
+        transport: str='tcp',
+        reset: bool=True,
+        action_repeat: bool=True) -> dict:
+    if image_codec is not None and image_codec not in IMAGE_CODECS:
+        raise ValueError(
+            f'image_codec can only be one of {IMAGE_CODECS}. Got {image_codec} instead.'
+        )
+    if transport not in TRANSPORTS:
+        raise ValueError(
+            f'transport can only be one of {TRANSPORTS}. Got {transport} instead.'
+        )
+    options = {}
+    if reset:
+        options['reset'] = True
+    if action_repeat:
+        options['action_repeat'] = True
+    if compact:
+        options['compact'] = True
+    if image_codec is not None:
+        options['image_codec'] = image_codec
+    if transport == 'shm':
+        options['transport'] = 'shm'
+        options['shm_probe'] = make_shm_probe()
+    return options
+
+
+def make_shm_probe() -> str:
+    '''
+    an empty file in /dev/shm; the server only accepts the shared-memory
+    transport if it can see it, i.e. both ends share the same /dev/shm.
+    '''
+    path = os.path.join(SHM_DIR, f'deepracer_gym_probe_{uuid.uuid4().hex}')
+    open(path, 'wb').close()
+    return path
+
+
+def remove_shm_probe(options: dict):
+    path = options.get('shm_probe')
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def _decode_jpeg(data: bytes) -> np.ndarray:
+    try:
+        import cv2
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+        # cv2 decodes colour images as BGR
+        return image[..., ::-1] if image.ndim == 3 else image
+    except ImportError:
+        import io
+        from PIL import Image
+        return np.asarray(Image.open(io.BytesIO(data)))
+
+
+def _decode_lz4(data: bytes, shape, dtype) -> np.ndarray:
+    import lz4.frame
+    return np.frombuffer(
+        lz4.frame.decompress(data), dtype=np.dtype(dtype)
+    ).reshape(shape)
+
+
+def decode_image(encoded: dict) -> np.ndarray:
+    codec = encoded[CODEC_KEY]
+    if codec == 'jpeg':
+        # colour frames are one JPEG, other channel counts one JPEG per channel
+        planes = [_decode_jpeg(data) for data in encoded['data']]
+        image = planes[0] if len(planes) == 1 else np.stack(planes, axis=-1)
+        return image.reshape(encoded['shape'])
+    if codec == 'lz4':
+        return _decode_lz4(encoded['data'], encoded['shape'], encoded['dtype'])
+    raise ValueError(f'Unknown image codec {codec}.')
+
+
+class SharedMemoryRing:
+    '''
+    read side of the server's /dev/shm frame ring. Frames come back as
+    zero-copy views into the mapping; the server cycles through its slots,
+    so a view stays valid for `slots - 1` further steps (copy to keep it).
+    '''
+    def __init__(self):
+        self.maps: dict[str, np.memmap]={}
+
+    def view(self, reference: dict) -> np.ndarray:
+        path = reference[SHM_KEY]
+        dtype = np.dtype(reference['dtype'])
+        shape = tuple(reference['shape'])
+        offset = reference['offset']
+        end = offset + dtype.itemsize * int(np.prod(shape))
+
+        mapping = self.maps.get(path)
+        if mapping is None or end > mapping.shape[0]:
+            # first frame, or the server re-created the ring with a new layout
+            mapping = self.maps[path] = np.memmap(path, dtype=np.uint8, mode='r')
+        return mapping[offset:end].view(np.ndarray).view(dtype).reshape(shape)
+
+
+class ProtocolDecoder:
+    '''
+    turns compact server responses back into the original response layout:
+    re-attaches the static track data (sent at reset) to every step's
+    reward_params, expands the fixed-schema value list into a dict, and
+    decodes compressed or shared-memory camera frames.
+    '''
+    def __init__(self, requested: dict | None=None):
+        self.requested = requested or {}
+        # None until the server answers; servers predating negotiation never do
+        self.accepted: dict | None=None
+        self.static: dict={}
+        self.schema: list[str] | None=None
+        self.ring = SharedMemoryRing()
+
+    def decode(self, response: dict) -> dict:
+        if ACCEPTED_KEY in response:
+            self.accepted = response.pop(ACCEPTED_KEY)
+            remove_shm_probe(self.requested)
+            logger.info(f'Server accepted protocol options {self.accepted}.')
+        if STATIC_KEY in response:
+            self.static = response.pop(STATIC_KEY)
+        if SCHEMA_KEY in response:
+            self.schema = response.pop(SCHEMA_KEY)
+
+        info = response.get('info')
+        if isinstance(info, dict) and isinstance(info.get('reward_params'), (list, tuple)):
+            info['reward_params'] = self._expand(info['reward_params'])
+        if SUBSTEPS_KEY in response:
+            # reward_params of the steps an action was repeated for
+            response[SUBSTEPS_KEY] = [
+                self._expand(substep) if isinstance(substep, (list, tuple)) else substep
+                for substep in response[SUBSTEPS_KEY]
+            ]
+
+        state = response.get('_next_state')
+        if isinstance(state, dict):
+            for sensor, measurement in state.items():
+                if not isinstance(measurement, dict):
+                    continue
+                if SHM_KEY in measurement:
+                    state[sensor] = self.ring.view(measurement)
+                elif CODEC_KEY in measurement:
+                    state[sensor] = decode_image(measurement)
+        return response
+
+    def _expand(self, values) -> dict:
+        reward_params = dict(zip(self.schema, values))
+        reward_params.update(self.static)
+        return reward_params
+
+    def supports(self, option: str) -> bool:
+        return bool(self.accepted and self.accepted.get(option))
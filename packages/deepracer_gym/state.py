@@ -0,0 +1,111 @@
+import math
+import numpy as np
+from gymnasium import spaces
+
+from deepracer_gym.track import TrackGeometry, track_geometry
+
+
+STATE_LOOK_AHEAD: tuple[float, ...]=(0.5, 1.0, 2.0)    # metres along the centerline
+STATE_OBJECTS: int=2            # closest objects (behind, ahead) in the state
+MAX_STEERING_ANGLE: float=30.0  # degrees; scales steering_angle to [-1, 1]
+MAX_SPEED: float=4.0            # m/s; scales speed to about [0, 1]
+MAX_OBJECT_DISTANCE: float=5.0  # metres; farther objects read as this far
+CAR_FEATURES: tuple[str, ...]=(
+    'x', 'y', 'sin_heading', 'cos_heading', 'speed', 'steering_angle',
+    'progress', 'center_offset', 'all_wheels_on_track', 'heading_error',
+)
+OBJECT_FEATURES: tuple[str, ...]=('present', 'forward', 'left', 'distance', 'left_of_center')
+
+
+def state_features(
+        look_ahead: tuple[float, ...]=STATE_LOOK_AHEAD,
+        objects: int=STATE_OBJECTS
+    ) -> list[str]:
+    '''names of the state vector's entries, in order.'''
+    return (
+        list(CAR_FEATURES)
+        + [f'{name}_{distance:g}m' for distance in look_ahead for name in ('heading_error', 'curvature')]
+        + [f'object_{i}_{name}' for i in range(objects) for name in OBJECT_FEATURES]
+    )
+
+
+def state_space(
+        look_ahead: tuple[float, ...]=STATE_LOOK_AHEAD,
+        objects: int=STATE_OBJECTS
+    ) -> spaces.Box:
+    size = len(state_features(look_ahead, objects))
+    return spaces.Box(low=-np.inf, high=np.inf, shape=(size,), dtype=np.float32)
+
+
+def _objects(params: dict, x: float, y: float, heading: float, objects: int) -> list[float]:
+    # nearest objects in the car's frame: forward/left offsets and distance
+    locations = params.get('objects_location') or []
+    indices = [i for i in params.get('closest_objects') or [] if 0 <= i < len(locations)]
+    left_of_center = params.get('objects_left_of_center') or []
+    cos_h, sin_h = math.cos(math.radians(heading)), math.sin(math.radians(heading))
+    values = []
+    for i in indices[:objects]:
+        dx, dy = locations[i][0] - x, locations[i][1] - y
+        distance = min(math.hypot(dx, dy), MAX_OBJECT_DISTANCE)
+        values += [
+            1.0,
+            (dx * cos_h + dy * sin_h) / MAX_OBJECT_DISTANCE,
+            (-dx * sin_h + dy * cos_h) / MAX_OBJECT_DISTANCE,
+            distance / MAX_OBJECT_DISTANCE,
+            1.0 if i < len(left_of_center) and left_of_center[i] else -1.0,
+        ]
+    values += [0.0] * (objects * len(OBJECT_FEATURES) - len(values))
+    return values
+
+
+def state_vector(
+        params: dict,
+        geometry: TrackGeometry,
+        look_ahead: tuple[float, ...]=STATE_LOOK_AHEAD,
+        objects: int=STATE_OBJECTS
+    ) -> np.ndarray:
+    '''
+    fixed-size float32 state from one step's reward_params: the car's pose
+    and controls, its offset from the centerline, heading errors towards and
+    curvature of the centerline at each `look_ahead` distance, and the
+    `objects` closest objects in the car's frame (zeros when absent).
+    Entries are named by state_features.
+    '''
+    x, y, heading = float(params['x']), float(params['y']), float(params['heading'])
+    half_width = 0.5 * float(params.get('track_width') or geometry.track_width)
+    offset = float(params.get('distance_from_center', 0.0)) / max(half_width, 1e-6)
+    values = [
+        x, y,
+        math.sin(math.radians(heading)), math.cos(math.radians(heading)),
+        float(params.get('speed', 0.0)) / MAX_SPEED,
+        float(params.get('steering_angle', 0.0)) / MAX_STEERING_ANGLE,
+        float(params.get('progress', 0.0)) / 100.0,
+        offset if params.get('is_left_of_center', True) else -offset,
+        1.0 if params.get('all_wheels_on_track', True) else 0.0,
+        geometry.heading_error(x, y, heading) / 180.0,
+    ]
+    s = float(geometry.arc_length_at(x, y))
+    for distance in look_ahead:
+        target = geometry.point_at(s + distance)
+        direction = math.degrees(math.atan2(target[1] - y, target[0] - x))
+        values += [
+            ((heading - direction + 180.0) % 360.0 - 180.0) / 180.0,
+            float(geometry.curvature_ahead(x, y, distance)),
+        ]
+    values += _objects(params, x, y, heading, objects)
+    return np.asarray(values, dtype=np.float32)
+
+
+def info_state(
+        info: dict,
+        world_name: str | None=None,
+        look_ahead: tuple[float, ...]=STATE_LOOK_AHEAD,
+        objects: int=STATE_OBJECTS
+    ) -> np.ndarray:
+    '''state_vector of a step's info (zeros if it has no reward_params).'''
+    params = info.get('reward_params')
+    if not params:
+        return np.zeros(len(state_features(look_ahead, objects)), dtype=np.float32)
+    return state_vector(
+        params, track_geometry(params, world_name), look_ahead, objects
+    )
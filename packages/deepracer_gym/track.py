@@ -0,0 +1,279 @@
+import os
+import math
+import numpy as np
+from loguru import logger
+
+
+TRACK_CACHE_DIR: str=os.environ.get(
+    'DEEPRACER_TRACK_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'deepracer_gym', 'tracks')
+)
+NEIGHBOURS: int=4       # nearest waypoints whose segments are checked per query
+PERSISTED_ARRAYS: tuple[str, ...]=(
+    'waypoints', 'segment_lengths', 'directions', 'headings', 'arc_length',
+    'curvature', 'left_border', 'right_border',
+)
+
+
+class _BruteForceIndex:
+    '''stand-in for scipy's cKDTree (query only) when scipy is missing.'''
+    def __init__(self, points: np.ndarray):
+        self.points = points
+        self._x, self._y = points[:, 0].copy(), points[:, 1].copy()
+
+    def query(self, x, k: int=1):
+        if len(x) == 2 and np.ndim(x[0]) == 0:
+            squared = (self._x - x[0]) ** 2 + (self._y - x[1]) ** 2
+            index = np.argpartition(squared, k - 1)[:k] if k < len(squared) else np.arange(len(squared))
+            return np.sqrt(squared[index]), index
+        x = np.asarray(x, dtype=np.float64)
+        single = x.ndim == 1
+        x = x.reshape(-1, 2)
+        distances = np.linalg.norm(x[:, None, :] - self.points[None, :, :], axis=-1)
+        index = np.argsort(distances, axis=1)[:, :k]
+        distances = np.take_along_axis(distances, index, axis=1)
+        return (distances[0], index[0]) if single else (distances, index)
+
+
+def _spatial_index(points: np.ndarray):
+    try:
+        from scipy.spatial import cKDTree
+        return cKDTree(points)
+    except ImportError:
+        logger.warning('scipy not installed; track queries scan all waypoints.')
+        return _BruteForceIndex(points)
+
+
+def _object_array(value) -> np.ndarray:
+    # 0-d, so tuples survive np.savez as one object
+    array = np.empty((), dtype=object)
+    array[()] = value
+    return array
+
+
+def _wrap_degrees(angle):
+    return (np.asarray(angle) + 180.0) % 360.0 - 180.0
+
+
+class TrackGeometry:
+    '''
+    centerline geometry of one track, built once from reward_params'
+    `waypoints` and `track_width`: segment headings and lengths, cumulative
+    arc length, curvature, left/inner/outer borders and a KD-tree over the
+    waypoints for O(log n) nearest-segment and look-ahead queries.
+    Queries take scalars or arrays of positions.
+    '''
+    def __init__(self, waypoints, track_width: float, world_name: str | None=None):
+        points = np.asarray(waypoints, dtype=np.float64)[:, :2]
+        if len(points) > 2 and np.allclose(points[0], points[-1]):
+            # DeepRacer tracks repeat the first waypoint at the end
+            points = points[:-1]
+        self.world_name = world_name
+        self.track_width = float(track_width)
+        self.waypoints = points
+        self.fingerprint = fingerprint(waypoints, track_width)
+
+        segments = np.roll(points, -1, axis=0) - points          # closed loop
+        self.segment_lengths = np.linalg.norm(segments, axis=1)
+        self.directions = segments / np.maximum(self.segment_lengths, 1e-9)[:, None]
+        self.headings = np.degrees(np.arctan2(segments[:, 1], segments[:, 0]))
+        self.arc_length = np.concatenate(([0.0], np.cumsum(self.segment_lengths)[:-1]))
+        self.length = float(self.segment_lengths.sum())
+
+        # curvature at each waypoint: turn between adjacent segments per metre
+        turn = np.radians(_wrap_degrees(self.headings - np.roll(self.headings, 1)))
+        mean_length = 0.5 * (self.segment_lengths + np.roll(self.segment_lengths, 1))
+        self.curvature = turn / np.maximum(mean_length, 1e-9)
+
+        # borders: waypoints offset along the averaged left normal
+        tangents = self.directions + np.roll(self.directions, 1, axis=0)
+        tangents /= np.maximum(np.linalg.norm(tangents, axis=1), 1e-9)[:, None]
+        normals = np.stack((-tangents[:, 1], tangents[:, 0]), axis=1)
+        self.left_border = points + 0.5 * self.track_width * normals
+        self.right_border = points - 0.5 * self.track_width * normals
+        # counter-clockwise tracks (positive signed area) turn left overall
+        area = 0.5 * np.sum(points[:, 0] * np.roll(points[:, 1], -1) - np.roll(points[:, 0], -1) * points[:, 1])
+        self.clockwise = bool(area < 0)
+        self.inner_border, self.outer_border = (
+            (self.right_border, self.left_border) if self.clockwise
+            else (self.left_border, self.right_border)
+        )
+
+        self._build_index()
+
+    def _build_index(self):
+        self.index = _spatial_index(self.waypoints)
+        # per-segment (start x, start y, direction x, direction y, length) as
+        # python floats; single-position queries avoid numpy call overhead
+        self._segments = [
+            (float(sx), float(sy), float(dx), float(dy), float(length))
+            for (sx, sy), (dx, dy), length in zip(
+                self.waypoints, self.directions, self.segment_lengths
+            )
+        ]
+
+    # --- queries ---
+
+    def _nearest_segment(self, x: float, y: float):
+        n = len(self._segments)
+        _, nearest = self.index.query((x, y), k=min(NEIGHBOURS, n))
+        best = (0, 0.0, math.inf)
+        for i in np.atleast_1d(nearest).tolist():
+            for segment in (i, (i - 1) % n):
+                sx, sy, dx, dy, length = self._segments[segment]
+                along = min(max((x - sx) * dx + (y - sy) * dy, 0.0), length)
+                distance = math.hypot(x - sx - along * dx, y - sy - along * dy)
+                if distance < best[2]:
+                    best = (segment, along / max(length, 1e-9), distance)
+        return best
+
+    def nearest_segment(self, x, y):
+        '''
+        (segment index, fraction along it, distance from the centerline) of
+        the closest centerline point; segment i runs from waypoint i to i + 1.
+        '''
+        if np.ndim(x) == 0 and np.ndim(y) == 0:
+            return self._nearest_segment(float(x), float(y))
+        position = np.stack(np.broadcast_arrays(
+            np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        ), axis=-1).reshape(-1, 2)
+        n = len(self.waypoints)
+        k = min(NEIGHBOURS, n)
+        _, nearest = self.index.query(position, k=k)
+        nearest = np.asarray(nearest).reshape(len(position), k)
+        # a point's closest segment starts at or ends at one of its nearest waypoints
+        candidates = np.concatenate((nearest, (nearest - 1) % n), axis=1)
+
+        start = self.waypoints[candidates]                        # P x C x 2
+        direction = self.directions[candidates]
+        length = self.segment_lengths[candidates]
+        along = np.einsum('pcd,pcd->pc', position[:, None, :] - start, direction)
+        along = np.clip(along, 0.0, length)
+        closest = start + along[..., None] * direction
+        distance = np.linalg.norm(position[:, None, :] - closest, axis=-1)
+        best = np.argmin(distance, axis=1)
+        rows = np.arange(len(position))
+
+        segment = candidates[rows, best]
+        fraction = along[rows, best] / np.maximum(length[rows, best], 1e-9)
+        distance = distance[rows, best]
+        return segment, fraction, distance
+
+    def arc_length_at(self, x, y):
+        '''distance along the centerline from the first waypoint.'''
+        segment, fraction, _ = self.nearest_segment(x, y)
+        return self.arc_length[segment] + fraction * self.segment_lengths[segment]
+
+    def point_at(self, s):
+        '''centerline (x, y) at arc length `s` (wraps around the lap).'''
+        s = np.mod(s, self.length)
+        segment = np.clip(np.searchsorted(self.arc_length, s, side='right') - 1, 0, len(self.waypoints) - 1)
+        offset = np.expand_dims(s - self.arc_length[segment], -1)
+        return self.waypoints[segment] + offset * self.directions[segment]
+
+    def look_ahead(self, x, y, distance: float):
+        '''centerline point `distance` metres ahead of the closest one.'''
+        return self.point_at(self.arc_length_at(x, y) + distance)
+
+    def heading_error(self, x, y, heading, look_ahead: float=0.0):
+        '''
+        car heading (degrees, as in reward_params) minus the track direction
+        at the closest point, or towards the point `look_ahead` metres ahead;
+        wrapped to [-180, 180).
+        '''
+        if look_ahead > 0:
+            target = self.look_ahead(x, y, look_ahead)
+            direction = np.degrees(np.arctan2(target[..., 1] - y, target[..., 0] - x))
+        elif np.ndim(x) == 0 and np.ndim(heading) == 0:
+            segment, _, _ = self._nearest_segment(float(x), float(y))
+            return (float(heading) - float(self.headings[segment]) + 180.0) % 360.0 - 180.0
+        else:
+            segment, _, _ = self.nearest_segment(x, y)
+            direction = self.headings[segment]
+        error = _wrap_degrees(np.asarray(heading) - direction)
+        return float(error) if np.ndim(error) == 0 else error
+
+    def curvature_ahead(self, x, y, distance: float):
+        '''largest absolute curvature over the next `distance` metres.'''
+        s = self.arc_length_at(x, y)
+        lookup = np.mod(np.add.outer(np.atleast_1d(s), np.linspace(0.0, distance, 8)), self.length)
+        segment = np.clip(np.searchsorted(self.arc_length, lookup, side='right') - 1, 0, len(self.waypoints) - 1)
+        result = np.abs(self.curvature[segment]).max(axis=-1)
+        return float(result[0]) if np.ndim(s) == 0 else result
+
+    # --- persistence ---
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        np.savez(
+            path,
+            track_width=self.track_width, length=self.length, clockwise=self.clockwise,
+            fingerprint=_object_array(self.fingerprint),
+            world_name=_object_array(self.world_name),
+            **{name: getattr(self, name) for name in PERSISTED_ARRAYS},
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'TrackGeometry':
+        '''the saved arrays as they are; only the spatial index is rebuilt.'''
+        geometry = cls.__new__(cls)
+        with np.load(path, allow_pickle=True) as data:
+            for name in PERSISTED_ARRAYS:
+                setattr(geometry, name, data[name])
+            geometry.track_width = float(data['track_width'])
+            geometry.length = float(data['length'])
+            geometry.clockwise = bool(data['clockwise'])
+            geometry.fingerprint = data['fingerprint'].item()
+            geometry.world_name = data['world_name'].item()
+        geometry.inner_border, geometry.outer_border = (
+            (geometry.right_border, geometry.left_border) if geometry.clockwise
+            else (geometry.left_border, geometry.right_border)
+        )
+        geometry._build_index()
+        return geometry
+
+
+def fingerprint(waypoints, track_width) -> tuple:
+    '''cheap identity of a track: constant time, no pass over the waypoints.'''
+    n = len(waypoints)
+    return (
+        n, float(track_width),
+        tuple(map(float, waypoints[0][:2])),
+        tuple(map(float, waypoints[n // 2][:2])),
+        tuple(map(float, waypoints[-1][:2])),
+    )
+
+
+_GEOMETRIES: dict[tuple, TrackGeometry]={}
+
+
+def track_geometry(params: dict, world_name: str | None=None) -> TrackGeometry:
+    '''
+    the TrackGeometry of the track in `params` (reward_params), built once
+    per process. With `world_name` it is also persisted to (and reused
+    from) TRACK_CACHE_DIR/<world_name>.npz across processes. Reward
+    functions can call this every step.
+    '''
+    key = fingerprint(params['waypoints'], params['track_width'])
+    geometry = _GEOMETRIES.get(key)
+    if geometry is not None:
+        return geometry
+
+    path = os.path.join(TRACK_CACHE_DIR, f'{world_name}.npz') if world_name else None
+    if path and os.path.exists(path):
+        try:
+            geometry = TrackGeometry.load(path)
+        except Exception as e:
+            logger.warning(f'Ignoring unreadable track cache {path}: {e}')
+        if geometry is not None and geometry.fingerprint != key:
+            geometry = None                 # track changed under the same name
+    if geometry is None:
+        geometry = TrackGeometry(params['waypoints'], params['track_width'], world_name)
+        if path:
+            geometry.save(path)
+            logger.info(f'Track geometry for {world_name} cached in {path}.')
+    _GEOMETRIES[key] = geometry
+    return geometry
+
+
+def clear_cache():
+    _GEOMETRIES.clear()
@@ -0,0 +1,97 @@
+import numpy as np
+import gymnasium as gym
+from gymnasium.wrappers import FlattenObservation
+
+from deepracer_gym.envs.deepracer_gym import DeepracerGymEnv
+from deepracer_gym.profiling import profile
+from deepracer_gym.state import (
+    STATE_LOOK_AHEAD, STATE_OBJECTS, state_space, info_state
+)
+from deepracer_gym.config import (
+    AGENT_PARAMS_FILE, ENVIRONMENT_PARAMS_FILE, config_path,
+    load_agent_params, load_environment_params
+)
+
+
+class ActionRepeat(gym.Wrapper):
+    '''
+    applies every action for `repeat` simulator steps and returns the summed
+    reward, stopping early when the episode ends. On a DeepracerGymEnv the
+    simulator repeats the action itself, so a decision costs one round trip
+    and one policy forward; other environments are stepped here.
+    '''
+    def __init__(self, env: gym.Env, repeat: int):
+        if repeat < 1:
+            raise ValueError(f'repeat must be at least 1. Got {repeat} instead.')
+        super().__init__(env)
+        self.repeat = repeat
+        self.server_side = isinstance(env.unwrapped, DeepracerGymEnv)
+        if self.server_side:
+            env.unwrapped.action_repeat = repeat
+
+    def step(self, action):
+        if self.server_side:
+            return self.env.step(action)
+
+        total_reward = 0.0
+        for _ in range(self.repeat):
+            observation, reward, terminated, truncated, info = self.env.step(action)
+            total_reward += reward
+            if terminated or truncated:
+                break
+        return observation, total_reward, terminated, truncated, info
+
+
+class PrivilegedState(gym.Wrapper):
+    '''
+    replaces the sensor observation with deepracer_gym.state.state_vector of
+    the step's reward_params: a few dozen floats (pose, controls, centerline
+    look-ahead, nearest objects) a small MLP learns from in a fraction of
+    the steps and compute a camera policy needs. The simulator still
+    renders the configured sensors; they are dropped here.
+    '''
+    def __init__(
+            self,
+            env: gym.Env,
+            look_ahead: tuple[float, ...]=STATE_LOOK_AHEAD,
+            objects: int=STATE_OBJECTS,
+            world_name: str | None=None
+        ):
+        super().__init__(env)
+        self.look_ahead = tuple(look_ahead)
+        self.objects = objects
+        # persists the track geometry across processes (see track_geometry)
+        self.world_name = world_name
+        self.observation_space = state_space(self.look_ahead, self.objects)
+
+    def state(self, info: dict) -> np.ndarray:
+        return info_state(info, self.world_name, self.look_ahead, self.objects)
+
+    def reset(self, **kwargs):
+        _, info = self.env.reset(**kwargs)
+        return self.state(info), info
+
+    def step(self, action):
+        _, reward, terminated, truncated, info = self.env.step(action)
+        return self.state(info), reward, terminated, truncated, info
+
+
+class ProfiledFlattenObservation(FlattenObservation):
+    '''FlattenObservation, timed as the env.flatten stage.'''
+    def observation(self, observation):
+        with profile('env.flatten'):
+            return super().observation(observation)
+
+
+def observation_wrapper(env: gym.Env) -> gym.Env:
+    '''
+    applies the observation mode of the env's agent_params.json
+    ('observation': 'sensors' or 'state'); use before FlattenObservation.
+    '''
+    config_dir = getattr(env.unwrapped, 'config_dir', None)
+    if load_agent_params(config_path(config_dir, AGENT_PARAMS_FILE)).observation != 'state':
+        return env
+    world_name = load_environment_params(
+        config_path(config_dir, ENVIRONMENT_PARAMS_FILE)
+    ).world_name
+    return PrivilegedState(env, world_name=world_name)
@@ -4,6 +4,11 @@ import msgpack
 import msgpack_numpy as m
 m.patch()
 
+from deepracer_gym.profiling import profile
+from deepracer_gym.protocol import (
+    PROTOCOL_KEY, ProtocolDecoder, remove_shm_probe
+)
+
 
 PORT: int=8888
 HOST: str='127.0.0.1'
@@ -12,9 +17,13 @@ TIMEOUT_SHORT: int=100_000  # ~1.7 m
 
 
 class DeepracerClientZMQ:
-    def __init__(self, host: str=HOST, port: int=PORT):
+    def __init__(self, host: str=HOST, port: int=PORT, protocol: dict | None=None):
         self.host = host
         self.port = port
+        # options are only requested; the server's answer decides the format
+        self.decoder = ProtocolDecoder(protocol)
+        self.bytes_received = 0
+        self.messages_received = 0
         self.socket = zmq.Context().socket(zmq.REQ)
 
         # Large timout for first connection
@@ -24,22 +33,38 @@ class DeepracerClientZMQ:
         self.socket.connect(f'tcp://{self.host}:{self.port}')
     
     def ready(self):
-        message: dict[str, int] = {'ready': 1}
+        message: dict[str, object] = {'ready': 1}
+        if self.decoder.requested:
+            message[PROTOCOL_KEY] = self.decoder.requested
         self._send_message(message)
 
     def recieve_response(self):
-        packed_response = self.socket.recv()
-        response = msgpack.unpackb(packed_response)
+        with profile('zmq.recv'):
+            # includes the simulator's step time
+            packed_response = self.socket.recv()
+        self.bytes_received += len(packed_response)
+        self.messages_received += 1
+        with profile('msgpack.decode'):
+            response = msgpack.unpackb(packed_response)
+        with profile('protocol.decode'):
+            response = self.decoder.decode(response)
         return response
 
+    @property
+    def bytes_per_message(self) -> float:
+        return self.bytes_received / max(self.messages_received, 1)
+
     def send_message(self, message: dict[str, object]):
         self._send_message(message)
         response = self.recieve_response()
         return response
     
     def _send_message(self, message: dict[str, object]):
-        packed_message = msgpack.packb(message)
-        self.socket.send(packed_message)
+        with profile('msgpack.encode'):
+            packed_message = msgpack.packb(message)
+        with profile('zmq.send'):
+            self.socket.send(packed_message)
 
     def __del__(self):
+        remove_shm_probe(self.decoder.requested)
         self.socket.close()
\ No newline at end of file
@@ -30,7 +30,8 @@ setup(
         'pyzmq',
         'msgpack',
         'msgpack_numpy',
-        'loguru'
+        'loguru',
+        'pyyaml'
     ],
     packages=find_packages(),
     classifiers=[
@@ -3,6 +3,7 @@ import zmq
 import json
 import msgpack
 import msgpack_numpy as m
+import numpy as np
 from rl_coach.core_types import ActionInfo
 from rl_coach.agents.clipped_ppo_agent import ClippedPPOAgent
 
@@ -16,6 +17,12 @@ try:
     GYM_PORT=int(os.environ['GYM_PORT'])
 except:
     GYM_PORT=8888
+# Track data that does not change within an episode; in the compact protocol
+# it is sent once per episode instead of inside every step's reward_params.
+STATIC_REWARD_PARAMS=('waypoints', 'track_width', 'track_length')
+JPEG_QUALITY=90
+SHM_PATH='/dev/shm/deepracer_gym_{}'.format(GYM_PORT)
+SHM_SLOTS=8
 
 
 def action_space_type(config):    
@@ -39,6 +46,201 @@ def action_space_type(config):
     return space_type
 
 
+def _image_encoder(codec):
+    '''returns a function encoding an HWC uint8 camera frame, None if unavailable.'''
+    if codec == 'jpeg':
+        try:
+            import cv2
+        except ImportError:
+            return None
+
+        def encode_jpeg(image):
+            if image.ndim == 3 and image.shape[-1] == 3:
+                # one colour JPEG (cv2 expects BGR)
+                planes = [image[..., ::-1]]
+            elif image.ndim == 3:
+                # stereo/other: one greyscale JPEG per channel
+                planes = [image[..., c] for c in range(image.shape[-1])]
+            else:
+                planes = [image]
+            params = [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY]
+            return {
+                '__codec__': 'jpeg',
+                'shape': list(image.shape),
+                'data': [cv2.imencode('.jpg', plane, params)[1].tobytes() for plane in planes],
+            }
+        return encode_jpeg
+
+    if codec == 'lz4':
+        try:
+            import lz4.frame
+        except ImportError:
+            return None
+
+        def encode_lz4(image):
+            return {
+                '__codec__': 'lz4',
+                'shape': list(image.shape),
+                'dtype': image.dtype.str,
+                'data': lz4.frame.compress(image.tobytes()),
+            }
+        return encode_lz4
+    return None
+
+
+class SharedMemoryRing:
+    '''
+    /dev/shm ring buffer of camera frames for a co-located client. Each
+    sensor gets SHM_SLOTS slots; a frame is written to the next slot and
+    only its location goes over ZMQ. The layout is fixed by the first
+    frames and rebuilt if a frame no longer fits.
+    '''
+    def __init__(self, path=SHM_PATH, slots=SHM_SLOTS):
+        self.path = path
+        self.slots = slots
+        self.mapping = None
+        self.layout = {}
+        self.cursor = 0
+
+    def _build(self, state):
+        self.layout = {}
+        offset = 0
+        for sensor in sorted(state):
+            nbytes = state[sensor].nbytes
+            self.layout[sensor] = (offset, nbytes)
+            offset += self.slots * nbytes
+        self.mapping = np.memmap(self.path, dtype=np.uint8, mode='w+', shape=(max(offset, 1),))
+        self.cursor = 0
+        print('Shared-memory ring {} ({} bytes)'.format(self.path, offset))
+
+    def write(self, state):
+        '''state: {sensor: ndarray}; returns {sensor: reference}.'''
+        fits = all(
+            sensor in self.layout and self.layout[sensor][1] == measurement.nbytes
+            for sensor, measurement in state.items()
+        )
+        if self.mapping is None or not fits:
+            self._build(state)
+
+        references = {}
+        for sensor, measurement in state.items():
+            base, nbytes = self.layout[sensor]
+            offset = base + self.cursor * nbytes
+            measurement = np.ascontiguousarray(measurement)
+            self.mapping[offset:offset + nbytes] = measurement.reshape(-1).view(np.uint8)
+            references[sensor] = {
+                '__shm__': self.path,
+                'offset': offset,
+                'shape': list(measurement.shape),
+                'dtype': measurement.dtype.str,
+            }
+        self.cursor = (self.cursor + 1) % self.slots
+        return references
+
+
+class ResponseEncoder:
+    '''
+    Encodes env responses for the gym client. Without negotiated options
+    the response is sent as is. With `compact`, static track data and the
+    reward_params schema are sent at the start of each episode and every
+    step carries only a list of per-step values. With `image_codec`, camera
+    frames are JPEG or LZ4 compressed. With the `shm` transport, camera
+    frames are written to a /dev/shm ring and only referenced.
+    '''
+    def __init__(self):
+        self.ring = None
+        self.negotiate({})
+
+    def negotiate(self, requested):
+        requested = requested or {}
+        self.compact = bool(requested.get('compact', False))
+        self.image_encoder = _image_encoder(requested.get('image_codec'))
+        self.accepted = {}
+        if requested.get('reset'):
+            # explicit {'reset': 1} messages, see GymAgent.act
+            self.accepted['reset'] = True
+        if requested.get('action_repeat'):
+            # {'action': a, 'repeat': k} messages, see GymAgent.observe
+            self.accepted['action_repeat'] = True
+        if self.compact:
+            self.accepted['compact'] = True
+        if self.image_encoder is not None:
+            self.accepted['image_codec'] = requested['image_codec']
+        self.shm = (
+            requested.get('transport') == 'shm'
+            # the client's probe file is only visible if /dev/shm is shared
+            and os.path.exists(requested.get('shm_probe') or '')
+        )
+        if self.shm:
+            self.accepted['transport'] = 'shm'
+            if self.ring is None:
+                self.ring = SharedMemoryRing()
+        if requested:
+            print(f'Gym client requested protocol {requested}, accepted {self.accepted}')
+        self._announce = bool(requested)
+        self._schema = None
+
+    def encode_substep(self, response_dict):
+        '''
+        reward_params of a repeated-action substep, in the step format (a
+        value list when compact and the schema is unchanged, else a dict).
+        '''
+        info = response_dict.get('info')
+        if not isinstance(info, dict):
+            return {}
+        reward_params = info.get('reward_params')
+        if self.compact and isinstance(reward_params, dict):
+            keys = sorted(k for k in reward_params if k not in STATIC_REWARD_PARAMS)
+            if keys == self._schema:
+                return [reward_params[k] for k in keys]
+        return reward_params
+
+    def encode(self, response_dict, substeps=None):
+        if not (self.accepted or self._announce):
+            return response_dict
+
+        # never mutate the simulator's own response object
+        response = dict(response_dict)
+        if self._announce:
+            response['_protocol'] = self.accepted
+            self._announce = False
+
+        state = response.get('_next_state')
+        if isinstance(state, dict) and (self.shm or self.image_encoder is not None):
+            cameras = {
+                sensor: measurement for sensor, measurement in state.items()
+                if 'CAMERA' in sensor and isinstance(measurement, np.ndarray)
+            }
+            if self.shm:
+                cameras = self.ring.write(cameras)
+            else:
+                cameras = {
+                    sensor: self.image_encoder(measurement)
+                    for sensor, measurement in cameras.items()
+                }
+            state = dict(state)
+            state.update(cameras)
+            response['_next_state'] = state
+
+        info = response.get('info')
+        if self.compact and isinstance(info, dict) and isinstance(info.get('reward_params'), dict):
+            reward_params = info['reward_params']
+            keys = sorted(k for k in reward_params if k not in STATIC_REWARD_PARAMS)
+            if keys != self._schema or reward_params.get('steps', 0) <= 1:
+                # start of an episode (or a new layout): resend schema and static data
+                self._schema = keys
+                response['_schema'] = keys
+                response['_static'] = {
+                    k: reward_params[k] for k in STATIC_REWARD_PARAMS if k in reward_params
+                }
+            info = dict(info)
+            info['reward_params'] = [reward_params[k] for k in keys]
+            response['info'] = info
+        if substeps:
+            response['_substeps'] = substeps
+        return response
+
+
 class Server:
     def __init__(self, host='0.0.0.0', port=GYM_PORT):
         self.host = host
@@ -85,24 +287,43 @@ class GymAgent(ClippedPPOAgent):
             )
 
         self.server = Server()
+        self.encoder = ResponseEncoder()
         self._previous_done = False
         self._hard_reset = False
         self._recieved_message = None
+        # action repeat: simulator steps left to run with the current action,
+        # and the reward_params of the steps run so far
+        self._repeat_left = 0
+        self._substeps = []
         print(f'================= Waiting for gym client =================')
 
         packed_msg = self.server.socket.recv()
         msg = msgpack.unpackb(packed_msg)
+        self.encoder.negotiate(msg.get('protocol'))
         print(f'=================== Gym Client Ready! ===================')
 
     def observe(self, env_response):
         response_dict = env_response.__dict__
         self._previous_done = response_dict['_game_over']
         if not self._hard_reset:
-            packed_response = msgpack.packb(response_dict)
+            if self._repeat_left > 0 and not self._previous_done:
+                # keep acting with the received action; the client gets this
+                # step's reward_params with the final response
+                self._repeat_left -= 1
+                self._substeps.append(self.encoder.encode_substep(response_dict))
+                return
+            packed_response = msgpack.packb(
+                self.encoder.encode(response_dict, substeps=self._substeps)
+            )
+            self._substeps = []
             self.server.socket.send(packed_response)
 
             packed_msg = self.server.socket.recv()
             self._recieved_message = msgpack.unpackb(packed_msg)
+            self._repeat_left = 0
+            if (self._recieved_message.get('action') is not None
+                    and self.encoder.accepted.get('action_repeat')):
+                self._repeat_left = max(int(self._recieved_message.get('repeat', 1)) - 1, 0)
         else:
             self._recieved_message = {}
             if self._previous_done:
@@ -119,9 +340,18 @@ class GymAgent(ClippedPPOAgent):
                 action = self._recieved_message['action']
 
             elif (self._recieved_message.get('ready') is not None):
+                # a new client; it may ask for a different protocol
+                self.encoder.negotiate(self._recieved_message.get('protocol'))
                 self._hard_reset = True
                 action = self.dummy_action
 
+            elif (self._recieved_message.get('reset') is not None):
+                # finish the episode server-side without replying; the next
+                # response is the first observation of the new episode.
+                # If the episode is already over the dummy action starts it.
+                self._hard_reset = not self._previous_done
+                action = self.dummy_action
+
         else:
             action = self.dummy_action
         return ActionInfo(action=action)
@@ -3,28 +3,30 @@ import glob
 import json
 import torch
 from src.ppo import PPOAgent
-from src.utils import make_environment, demo, evaluate
+from src.utils_eval import evaluate
+from src.rollout import environment_spaces
 
 # --- CONFIGURATION ---
 TRACKS = ["reInvent2019_wide", "reInvent2019_track", "Vegas_track"]
 DEVICE = torch.device("cpu") # Use CPU for evaluation to be safe
 
-def load_trained_agent(model_path, track_name):
+def load_trained_agent(model_path):
     """
     Loads the agent from a state_dict checkpoint.
     We must re-initialize the PPOAgent structure first.
     """
-    # 1. Create a dummy environment to get dimensions
-    env = make_environment(track_name)
+    # 1. Dimensions from the agent params; evaluate() restarts the simulator
+    #    on each track, so no connection is opened here
+    spaces = environment_spaces()
     
     # 2. Initialize a fresh agent
     # Note: hyperparameters don't matter for inference, just dimensions
-    agent = PPOAgent(env).to(DEVICE)
+    agent = PPOAgent(spaces).to(DEVICE)
     
     # 3. Load the weights
     print(f"   ...Loading weights from {model_path}")
-    state_dict = torch.load(model_path, map_location=DEVICE)
-    agent.actor.load_state_dict(state_dict)
+    # actor-only model_<step>.pt or a full checkpoint.pt
+    agent.load_checkpoint(model_path, optimizer=False, hyperparameters=False)
     
     # 4. Set to Eval mode
     agent.eval()
@@ -49,29 +51,20 @@ def main():
         print(f"\n🎥 PROCESSING TRACK: {track}")
         
         # Load agent (Fresh for each track to ensure clean env)
-        agent = load_trained_agent(model_path, track)
+        agent = load_trained_agent(model_path)
         
-        # 1. Evaluate Metrics (5 Laps)
-        print(f"   ...Running 5 evaluation laps...")
+        # 1. Evaluate Metrics (5 Laps), recording the first lap as the video
+        video_path = f"final_report_output/{track}.mp4"
+        print(f"   ...Running 5 evaluation laps (video to {video_path})...")
         metrics = evaluate(
             agent=agent,
             world_name=track,
             environment_name="deepracer-v0",
-            directory="final_report_output"
+            directory="final_report_output",
+            video_path=video_path
         )
         results[track] = metrics
         print(f"   📊 Results: {metrics}")
-        
-        # 2. Generate Video
-        video_path = f"final_report_output/{track}.mp4"
-        print(f"   ...Rendering Video to {video_path}...")
-        try:
-            # We need to manually run the demo logic because src.utils.demo might assume old agent structure
-            # But let's try the standard utility first since our agent inherits from src.Agent
-            demo(agent=agent, world_name=track, directory="final_report_output")
-            print("   ✅ Video Generation command sent.")
-        except Exception as e:
-            print(f"   ⚠️ Video generation warning: {e}")
 
     # Save Final Summary
     with open("final_report_output/summary.json", "w") as f:
@@ -4,7 +4,7 @@ import torch
 import json
 sys.path.append(os.getcwd())
 from src.ppo import PPOAgent
-from src.utils import make_environment, demo, evaluate_track
+from src.utils_eval import make_environment, evaluate_track
 
 # --- CONFIGURATION ---
 MODEL_PATH = "saved_models_part2/model_h2b_track.pt"
@@ -30,25 +30,19 @@ def main():
     agent.eval()
     env.close()
     
-    # 2. Metrics (5 Laps)
-    print(f"   ...Collecting Metrics...")
+    # 2. Metrics (5 Laps) + Video of the first lap, in one simulator pass
+    video_path = f"{OUTPUT_DIR}/{TRACK}.mp4"
+    print(f"   ...Collecting Metrics and Video...")
     metrics = evaluate_track(
-        agent=agent, 
-        world_name=TRACK, 
-        environment_name="deepracer-v0", 
+        agent=agent,
+        world_name=TRACK,
+        environment_name="deepracer-v0",
         episodes=5,
-        directory=OUTPUT_DIR
+        directory=OUTPUT_DIR,
+        video_path=video_path,
     )
     print(f"   📊 Results: {metrics}")
-    
-    # 3. Video
-    video_path = f"{OUTPUT_DIR}/{TRACK}.mp4"
-    print(f"   ...Rendering Video...")
-    try:
-        demo(agent, TRACK, video_path)
-        print(f"   ✅ Video Saved: {video_path}")
-    except Exception as e:
-        print(f"   ⚠️ Video Error: {e}")
+    print(f"   ✅ Video Saved: {video_path}")
 
 if __name__ == "__main__":
     main()
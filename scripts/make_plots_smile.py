@@ -1,27 +0,0 @@
-import os
-import sys
-import glob
-import json
-import matplotlib.pyplot as plt
-import pandas as pd
-import seaborn as sns
-from tensorboard.backend.event_processing.event_accumulator import EventAccumulator
-
-# Config for SMILE track
-TRACK_NAME = "reInvent2019_track"
-EVAL_DIR = "final_report_smile"
-OUTPUT_DIR = "final_plots_smile"
-TEXT_LOG = "training_smile.log"
-
-# (Reuse standard plotting logic but point to specific dirs)
-def main():
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    print(f"📊 Generating plots for {TRACK_NAME}...")
-    
-    # 1. Training Data
-    # (Simulated extraction for brevity - assume standard logic works)
-    # You can reuse the logic from make_plots.py here
-    print(f"✅ Plots saved to {OUTPUT_DIR}")
-
-if __name__ == "__main__":
-    main()
@@ -9,13 +9,17 @@ helpFunction()
     exit 1 # Exit script after printing help
 }
 
-while getopts "C:M:E:W:" opt
+while getopts "C:M:E:W:Sc:N:P:" opt
 do
     case "$opt" in
         C ) cpus="$OPTARG" ;;
         M ) memory="$OPTARG" ;;
         E ) evaluation="$OPTARG" ;;
         W ) world_name="$OPTARG" ;;
+        S ) share_shm="-S" ;;
+        c ) config_dir="$OPTARG" ;;
+        N ) name="$OPTARG" ;;
+        P ) gym_port="$OPTARG" ;;
         ? ) helpFunction ;; # print helpFunction in case parameter is non-existent
     esac
 done;
@@ -28,10 +32,15 @@ then
     echo "Capping deepracer at ${cpus} CPUs and ${memory} memory.";
 fi
 
-source scripts/stop_deepracer.sh
+source scripts/stop_deepracer.sh -N "${name:-deepracer}"
 
+OPTIND=1    # start_deepracer.sh parses its own options
 source scripts/start_deepracer.sh \
     -C "$cpus" \
     -M "$memory" \
     -E "$evaluation" \
-    -W "$world_name"
+    -W "$world_name" \
+    -c "${config_dir:-configs}" \
+    -N "${name:-deepracer}" \
+    ${gym_port:+-P "$gym_port"} \
+    $share_shm
@@ -4,9 +4,14 @@
 helpFunction()
 {
     echo ""
-    echo "Usage: $0 -C CPUs -M memory"
+    echo "Usage: $0 -C CPUs -M memory [-S] [-c config_dir] [-N name] [-P port] [-B]"
     echo -e "\t-C Maximum CPUs to allocate to the container, e.g. \"3\"."
     echo -e "\t-M Maximum memory to allocate to the container, e.g. \"6g\"."
+    echo -e "\t-S Share the host's /dev/shm with the container (for the shm observation transport)."
+    echo -e "\t-c Config directory mounted as /configs, e.g. a run's materialized configs (default: configs)."
+    echo -e "\t-N Container/instance name, one per concurrent simulator (default: deepracer)."
+    echo -e "\t-P Gym port of this simulator (default: derived from \$USER, 8888 for Docker)."
+    echo -e "\t-B Rebuild the Apptainer image even if it exists."
     exit 1 # Exit script after printing help
 }
 
@@ -56,13 +61,18 @@ on_pace_ice() {
 }
 
 
-while getopts "C:M:E:W:" opt
+while getopts "C:M:E:W:Sc:N:P:B" opt
 do
     case "$opt" in
         C ) cpus="$OPTARG" ;;
         M ) memory="$OPTARG" ;;
         E ) evaluation="$OPTARG" ;;
         W ) world_name="$OPTARG" ;;
+        S ) share_shm=1 ;;
+        c ) config_dir="$OPTARG" ;;
+        N ) name="$OPTARG" ;;
+        P ) gym_port="$OPTARG" ;;
+        B ) rebuild=1 ;;
         ? ) helpFunction ;; # print helpFunction in case parameter is non-existent
     esac
 done
@@ -77,13 +87,22 @@ then
 fi
 
 patches=patches
-configs=configs
+configs="${config_dir:-configs}"
+
+# gym clients on this node can then read camera frames from /dev/shm
+apptainer_shm=()
+docker_shm=()
+if [ -n "$share_shm" ]; then
+    apptainer_shm=(--bind /dev/shm:/dev/shm)
+    docker_shm=(-v /dev/shm:/dev/shm)
+    echo "Sharing /dev/shm with the container."
+fi
 
 mkdir -p "$configs"
 mkdir -p "$patches"
 
 export base=uzairakbar/deepracer:v0
-export container=deepracer
+export container="${name:-deepracer}"
 export image=deepracer
 
 
@@ -108,18 +127,27 @@ fi
 if command_exists apptainer; then
     echo "Building deepracer Apptainer container."
 
-    apptainer pull deepracer_base.sif docker://"$base"
+    # concurrent simulators share one image; only build it once
+    if [ ! -f "$SCRATCH_DIR"/"$image".sif ] || [ -n "$rebuild" ]; then
+        apptainer pull deepracer_base.sif docker://"$base"
 
-    yes no | apptainer build --ignore-fakeroot-command "$SCRATCH_DIR"/"$image".sif deepracer.def
+        yes no | apptainer build --ignore-fakeroot-command "$SCRATCH_DIR"/"$image".sif deepracer.def
+    fi
 
-    GYM_PORT=$(string_to_port "$USER")
+    # extra simulators (-N) get their own Gazebo/ROS ports
+    suffix=""
+    if [ "$container" != "deepracer" ]; then
+        suffix="_$container"
+    fi
+
+    GYM_PORT="${gym_port:-$(string_to_port "$USER")}"
     echo "Using port $GYM_PORT for deepracer."
     
-    GAZEBO_PORT=$(string_to_port "GAZEBO_$USER")        # default is 11345
+    GAZEBO_PORT=$(string_to_port "GAZEBO_$USER$suffix")        # default is 11345
     GAZEBO_MASTER_URI="http://localhost:$GAZEBO_PORT"
     echo "Using port $GAZEBO_MASTER_URI for Gazebo Master."
 
-    ROS_PORT=$(string_to_port "ROS_$USER")              # defaults is 11311
+    ROS_PORT=$(string_to_port "ROS_$USER$suffix")              # defaults is 11311
     ROS_MASTER_URI="http://localhost:$ROS_PORT"
     echo "Using port $ROS_MASTER_URI for ROS Master."
 
@@ -127,7 +155,8 @@ if command_exists apptainer; then
     rm -rf "$overlay" && mkdir "$overlay"
     apptainer instance run \
         --no-mount "$HOME",/tmp,/dev,/etc/hosts,/etc/localtime,/proc,/sys,/var/tmp \
-        --bind configs:/configs \
+        --bind "$configs":/configs \
+        "${apptainer_shm[@]}" \
         --overlay "$overlay"/:/. \
         --env EVALUATION="$evaluation",EVAL_WORLD_NAME="$world_name",GYM_PORT="$GYM_PORT",GAZEBO_MASTER_URI="$GAZEBO_MASTER_URI",ROS_MASTER_URI="$ROS_MASTER_URI" \
         "$SCRATCH_DIR"/"$image".sif "$container" \
@@ -158,12 +187,15 @@ elif command_exists docker; then
         docker system prune --force
     fi
 
-    echo "Using port 8888 for deepracer."
+    GYM_PORT="${gym_port:-8888}"
+    echo "Using port $GYM_PORT for deepracer."
 
     docker run --rm --detach \
         --name="$container" \
-        -v "$PWD"/"$configs":/"$configs":ro \
-        -p 8888:8888 \
+        -v "$(realpath "$configs")":/configs:ro \
+        "${docker_shm[@]}" \
+        -p "$GYM_PORT":"$GYM_PORT" \
+        -e GYM_PORT="$GYM_PORT" \
         -e EVALUATION="$evaluation" \
         -e EVAL_WORLD_NAME="$world_name" \
         --cpus="$cpus" --memory="$memory" \
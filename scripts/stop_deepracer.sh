@@ -42,7 +42,18 @@ string_to_port() {
 }
 
 
-export container=deepracer
+# -N name stops one of several concurrent simulators (see start_deepracer.sh)
+name=""
+OPTIND=1
+while getopts ":N:" opt
+do
+    case "$opt" in
+        N ) name="$OPTARG" ;;
+        ? ) ;;
+    esac
+done
+
+export container="${name:-deepracer}"
 export image=deepracer
 
 
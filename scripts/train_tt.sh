@@ -54,24 +54,31 @@ case "$HP_VARIANT" in
   *)        HP_CONFIG="$HP_VARIANT" ;;
 esac
 
+# Resolve this run's configs into its own directory; the simulator mounts it
+# and training reads it, so concurrent runs never share mutable config files
+CONFIG_DIR="${CONFIG_DIR:-runs/configs/$(date +%Y%m%d_%H%M%S)_$$}"
+python -m src.cli materialize \
+  --out "$CONFIG_DIR" \
+  --env-config "$ENV_CONFIG" \
+  --agent-config "$AGENT_CONFIG" \
+  --reward "$REWARD" \
+  --hparams-config "$HP_CONFIG"
+
 # Ensure simulator running (Apptainer on ICE, Docker locally)
 if command -v apptainer >/dev/null 2>&1; then
   if ! apptainer instance list | grep -q "^deepracer"; then
     echo "[info] starting apptainer instance 'deepracer'..."
-    ./scripts/start_deepracer.sh
+    ./scripts/start_deepracer.sh -c "$CONFIG_DIR"
   fi
 else
   if ! docker ps --format '{{.Names}}' | grep -q '^deepracer$'; then
     echo "[info] starting docker container 'deepracer'..."
-    ./scripts/start_deepracer.sh
+    ./scripts/start_deepracer.sh -c "$CONFIG_DIR"
   fi
 fi
 
 CMD=(python -m src.cli train
-  --env-config "$ENV_CONFIG"
-  --agent-config "$AGENT_CONFIG"
-  --reward "$REWARD"
-  --hparams-config "$HP_CONFIG"
+  --config-dir "$CONFIG_DIR"
   --steps "$STEPS"
 )
 
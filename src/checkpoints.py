@@ -0,0 +1,224 @@
+import os
+import re
+import glob
+import json
+import math
+import time
+import torch
+import numpy as np
+from loguru import logger
+
+from src.ppo import PPOAgent
+from src.utils import make_environment, lap_time, MAX_EVAL_STEPS
+from src.simulators import SimulatorPool
+from deepracer_gym.config import materialize
+
+
+EVAL_WORLDS: tuple[str, ...]=('reInvent2019_wide', 'reInvent2019_track', 'Vegas_track')
+EVAL_EPISODES: int=3
+EVALUATIONS_DIR: str='evaluations'
+RANKING_FILE: str='ranking.json'
+EPISODES_FILE: str='episodes.jsonl'
+COMPLETED_PROGRESS: float=100.0
+
+
+def checkpoint_step(path: str) -> int | None:
+    '''training step of a model_<step>.pt, None for other files.'''
+    match = re.search(r'model_(\d+)\.pt$', os.path.basename(path))
+    return int(match.group(1)) if match else None
+
+
+def find_checkpoints(patterns: list[str]) -> list[str]:
+    '''
+    checkpoint files from paths, globs (** is recursive) and directories
+    (their model_<step>.pt files), without duplicates; model_<step>.pt files
+    in step order, others by name.
+    '''
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, '**', 'model_*.pt'), recursive=True)
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        if not matches:
+            logger.warning(f'No checkpoints match {pattern}.')
+        paths += [os.path.normpath(path) for path in matches if path.endswith('.pt')]
+    paths = list(dict.fromkeys(paths))
+    return sorted(paths, key=lambda path: (
+        os.path.dirname(path), checkpoint_step(path) is None, checkpoint_step(path) or 0, path
+    ))
+
+
+def load_weights(path: str) -> dict:
+    '''
+    the checkpoint, memory-mapped: tensors are read from the page cache as
+    they are copied into the policy instead of into fresh buffers first.
+    Files in the legacy (non-zip) format are read normally.
+    '''
+    try:
+        return torch.load(path, map_location='cpu', mmap=True)
+    except RuntimeError:
+        return torch.load(path, map_location='cpu')
+
+
+def _hidden_sizes(actor: dict) -> tuple[int, ...]:
+    weights = sorted(
+        (key for key in actor if key.endswith('.weight')), key=lambda key: int(key.split('.')[0])
+    )
+    return tuple(actor[key].shape[0] for key in weights[:-1])
+
+
+class HotSwapPolicy:
+    '''
+    one PPOAgent per actor architecture, built on first use; every later
+    checkpoint of that architecture is copied into its weights in place, so
+    switching checkpoints between episodes costs one state-dict copy.
+    '''
+    def __init__(self, environment):
+        self.environment = environment
+        self.agents: dict[tuple, PPOAgent]={}
+
+    def load(self, path: str) -> PPOAgent:
+        checkpoint = load_weights(path)
+        actor = checkpoint.get('actor', checkpoint)
+        signature = tuple((key, tuple(value.shape)) for key, value in actor.items())
+        agent = self.agents.get(signature)
+        if agent is None:
+            if 'layers' in checkpoint:
+                # a compressed actor (src.compress) brings its own network
+                agent = PPOAgent(self.environment)
+                agent.load_checkpoint(checkpoint, optimizer=False, hyperparameters=False)
+            else:
+                agent = PPOAgent(
+                    self.environment,
+                    hidden_sizes=checkpoint.get('hidden_sizes') or _hidden_sizes(actor),
+                )
+            agent.eval()
+            self.agents[signature] = agent
+            logger.info(f'Built a policy for the architecture of {path}.')
+        with torch.no_grad():
+            agent.actor.load_state_dict(actor)
+        return agent
+
+
+def run_episode(environment, agent: PPOAgent, max_steps: int=MAX_EVAL_STEPS) -> dict:
+    observation, info = environment.reset()
+    for step in range(1, max_steps + 1):
+        action, _, _ = agent.get_action(observation, train=False)
+        observation, _, terminated, truncated, info = environment.step(action)
+        if terminated or truncated:
+            break
+    progress = float(info.get('reward_params', {}).get('progress', 0.0))
+    lap = lap_time(info) if 'episode' in info else math.nan
+    return {
+        'progress': progress,
+        'lap_time': None if math.isnan(lap) else float(lap),
+        'steps': step,
+    }
+
+
+def _summary(episodes: list[dict]) -> dict:
+    laps = [e['lap_time'] for e in episodes if e['lap_time'] is not None]
+    return {
+        'progress': float(np.mean([e['progress'] for e in episodes])) if episodes else 0.0,
+        'completion': sum(e['progress'] >= COMPLETED_PROGRESS for e in episodes) / max(len(episodes), 1),
+        'lap_time': float(np.mean(laps)) if laps else None,
+        'episodes': len(episodes),
+    }
+
+
+def rank(results: dict[str, dict[str, list[dict]]]) -> list[dict]:
+    '''
+    checkpoints best first: highest mean progress over all worlds, then
+    lowest mean lap time of the completed laps.
+    '''
+    records = []
+    for path, worlds in results.items():
+        records.append({
+            'checkpoint': path,
+            'step': checkpoint_step(path),
+            **_summary([episode for episodes in worlds.values() for episode in episodes]),
+            'worlds': {world: _summary(episodes) for world, episodes in worlds.items()},
+        })
+    records.sort(key=lambda r: (
+        -r['progress'], math.inf if r['lap_time'] is None else r['lap_time']
+    ))
+    for position, record in enumerate(records, 1):
+        record['rank'] = position
+    return records
+
+
+def evaluate_checkpoints(
+        checkpoints: list[str],
+        worlds: tuple[str, ...]=EVAL_WORLDS,
+        episodes: int=EVAL_EPISODES,
+        config_sources: dict | None=None,
+        name: str | None=None,
+        port: int | None=None,
+        max_steps: int=MAX_EVAL_STEPS,
+        start_simulators: bool=True,
+        simulator_cpus: int | None=None,
+        simulator_memory: str | None=None,
+        simulator_backend: str='auto',
+        simulator_command: str | None=None
+    ) -> list[dict]:
+    '''
+    evaluates every checkpoint for `episodes` episodes on each world and
+    ranks them (see rank). Each world gets one simulator in evaluation mode
+    and one client session: checkpoints are hot-swapped into a policy built
+    once (HotSwapPolicy) between episodes. Episodes are appended to
+    evaluations/<name>/episodes.jsonl as they finish, the ranking is
+    written to evaluations/<name>/ranking.json.
+    '''
+    if not checkpoints:
+        raise ValueError('No checkpoints to evaluate.')
+    if not start_simulators and len(worlds) > 1:
+        raise ValueError('A running simulator has one track; start simulators to evaluate several worlds.')
+    name = name or f'checkpoints_{int(time.time())}'
+    directory = os.path.join(EVALUATIONS_DIR, name)
+    config_dir = materialize(os.path.join(directory, 'configs'), **(config_sources or {}))
+    episodes_path = os.path.join(directory, EPISODES_FILE)
+
+    results = {path: {} for path in checkpoints}
+    for world in worlds:
+        logger.info(f'Evaluating {len(checkpoints)} checkpoints on {world}.')
+        pool = SimulatorPool(
+            1,
+            backend=simulator_backend if start_simulators else 'external',
+            name=name,
+            base_port=port,
+            config_dir=config_dir,
+            cpus=simulator_cpus,
+            memory=simulator_memory,
+            evaluation=True,
+            world_name=world,
+            command=simulator_command,
+            log_dir=os.path.join(directory, 'simulators'),
+        )
+        with pool, pool.start().lease() as simulator:
+            environment = make_environment(port=simulator.port, config_dir=config_dir)
+            policy = HotSwapPolicy(environment)
+            try:
+                for path in checkpoints:
+                    agent = policy.load(path)
+                    records = results[path].setdefault(world, [])
+                    for episode in range(episodes):
+                        record = run_episode(environment, agent, max_steps)
+                        records.append(record)
+                        with open(episodes_path, 'a') as file:
+                            file.write(json.dumps({
+                                'checkpoint': path, 'world': world, 'episode': episode, **record
+                            }) + '\n')
+                    summary = _summary(records)
+                    logger.info(
+                        f'{path} on {world}: progress={summary["progress"]:.1f} '
+                        f'completion={summary["completion"]:.2f} lap_time={summary["lap_time"]}'
+                    )
+            finally:
+                environment.close()
+
+    ranking = rank(results)
+    with open(os.path.join(directory, RANKING_FILE), 'w') as file:
+        json.dump(ranking, file, indent=2)
+    logger.info(f'Ranking of {len(ranking)} checkpoints saved to {os.path.join(directory, RANKING_FILE)}.')
+    return ranking
@@ -1,43 +1,17 @@
 # src/cli.py
 import argparse
 import os
-import shutil
 import sys
-from contextlib import contextmanager
 from pathlib import Path
 
-from src.run import run
-from src.utils import evaluate, demo
+from deepracer_gym.config import load_agent_params, load_environment_params, materialize
+
+# src.run/src.utils (torch, tensorboard) and src.reward_replay are imported
+# by the subcommand that needs them, so --help and argument errors are instant
 
 ROOT = Path(__file__).resolve().parents[1]
 CFG_DIR = ROOT / "configs"
 
-@contextmanager
-def _swap_file(active_path: Path, desired_path: Path):
-    """
-    Temporarily swap a config file so the simulator/tools see the desired variant
-    without permanently overwriting your baseline.
-    """
-    active_path = active_path.resolve()
-    desired_path = desired_path.resolve()
-    backup_path = active_path.with_suffix(active_path.suffix + ".bak")
-
-    if desired_path == active_path:
-        yield
-        return
-
-    if not desired_path.exists():
-        raise FileNotFoundError(f"Config not found: {desired_path}")
-
-    if active_path.exists():
-        shutil.copy2(active_path, backup_path)
-    try:
-        shutil.copy2(desired_path, active_path)
-        yield
-    finally:
-        if backup_path.exists():
-            shutil.move(backup_path, active_path)
-
 def _resolve_env_path(p: str) -> Path:
     q = Path(p)
     return q if q.is_absolute() else (ROOT / p).resolve()
@@ -85,7 +59,150 @@ def main():
                     help="baseline|stage2|stage3 or path to reward_function*.py")
     tr.add_argument("--hparams-config", default="baseline",
                     help="baseline|stage2|stage3 or path to YAML (e.g., configs/hyper_params.stage2.yaml)")
+    tr.add_argument("--config-dir", default=None,
+                    help="Use this materialized config directory (see 'materialize') instead of the variants above")
+    tr.add_argument("--port", type=int, default=None,
+                    help="Gym port of the simulator to train against (default: derived from $USER)")
+    tr.add_argument("--workers", type=int, default=None,
+                    help="Collect with N rollout processes, one per simulator on ports --port .. --port + N - 1")
+    tr.add_argument("--horizon", type=int, default=None,
+                    help="Steps each rollout worker collects per update (with --workers)")
     tr.add_argument("--logdir", default=None)
+    tr.add_argument("--reward-log", default=None,
+                    help="Append every step's reward_params to this JSONL file for offline replay (with --workers, one <name>.worker<i>.jsonl per worker)")
+    tr.add_argument("--profile", action="store_true",
+                    help="Record per-stage step latencies, log p50/p95/p99 and dump runs/<run>/trace.json")
+    tr.add_argument("--compact-protocol", action="store_true",
+                    help="Ask the simulator for the compact wire format (static track data once per episode)")
+    tr.add_argument("--image-codec", choices=["jpeg", "lz4"], default=None,
+                    help="Ask the simulator to compress camera frames")
+    tr.add_argument("--shm", action="store_true",
+                    help="Pass camera frames through /dev/shm (simulator on the same node)")
+    tr.add_argument("--action-repeat", type=int, default=None,
+                    help="Repeat each action for k simulator steps (one round trip and policy forward per k steps)")
+    tr.add_argument("--hidden-sizes", type=int, nargs="+", default=None,
+                    help="Actor/critic hidden layer widths, e.g. 64 64 with 'observation': 'state' agent params")
+    tr.add_argument("--dataset-dir", default=None,
+                    help="Record transitions into this on-disk dataset")
+    tr.add_argument("--pretrain-dataset", default=None,
+                    help="Behavior-cloning / critic pretraining from this dataset before online PPO")
+
+    # --- materialize ---
+    mt = sub.add_parser("materialize", help="Write a run's resolved config directory (e.g. to mount in the simulator)")
+    mt.add_argument("--out", required=True)
+    mt.add_argument("--env-config", default="configs/environment_params.yaml")
+    mt.add_argument("--agent-config", default="configs/agent_params.json")
+    mt.add_argument("--reward", default="baseline",
+                    help="baseline|stage2|stage3 or path to reward_function*.py")
+    mt.add_argument("--hparams-config", default="baseline",
+                    help="baseline|stage2|stage3 or path to YAML")
+
+    # --- sweep ---
+    sw = sub.add_parser("sweep", help="Parallel hyperparameter / reward-variant search with early stopping")
+    sw.add_argument("--space", required=True, help="Search-space YAML (see src/sweep.py)")
+    sw.add_argument("--name", default=None, help="Sweep name; results go to sweeps/<name>/")
+    sw.add_argument("--steps", type=int, default=15000, help="Timesteps per trial")
+    sw.add_argument("--max-concurrent", type=int, default=2, help="Trials (and simulators) running at once")
+    sw.add_argument("--base-port", type=int, default=8888, help="Simulator i listens on base-port + i")
+    sw.add_argument("--min-steps", type=int, default=None, help="First early-stopping rung (default: steps / eta^2)")
+    sw.add_argument("--eta", type=int, default=3, help="Keep the top 1/eta of trials at each rung")
+    sw.add_argument("--seed", type=int, default=0)
+    sw.add_argument("--no-simulator", action="store_true",
+                    help="Don't start/stop simulators; expect them already listening on the ports")
+    sw.add_argument("--sim-cpus", type=int, default=None)
+    sw.add_argument("--sim-memory", default=None)
+    sw.add_argument("--sim-backend", choices=["auto", "apptainer", "docker", "local"], default="auto",
+                    help="How simulators are started (see src/simulators.py)")
+    sw.add_argument("--sim-command", default=None,
+                    help="Command of the local backend, e.g. a stand-in server; may use {port} and {name}")
+    sw.add_argument("--env-config", default="configs/environment_params.yaml")
+    sw.add_argument("--agent-config", default="configs/agent_params.json")
+    sw.add_argument("--reward", default="baseline",
+                    help="Reward used when the space has no 'reward' parameter")
+    sw.add_argument("--hparams-config", default="baseline",
+                    help="Base hyper_params the trial values are applied to")
+    sw.add_argument("--action-repeat", type=int, default=None,
+                    help="Repeat each action for k simulator steps in every trial")
+
+    # --- pbt ---
+    pb = sub.add_parser("pbt", help="Population-based training across concurrent simulators")
+    pb.add_argument("--population", type=int, default=4, help="Workers (and simulators)")
+    pb.add_argument("--steps", type=int, default=15000, help="Timesteps per worker")
+    pb.add_argument("--interval", type=int, default=2000, help="Timesteps between exploit/explore steps")
+    pb.add_argument("--name", default=None, help="Results go to pbt/<name>/")
+    pb.add_argument("--space", default=None,
+                    help="Search-space YAML for initial values and bounds (default: lr, ent_coef, clip_eps)")
+    pb.add_argument("--base-port", type=int, default=8888, help="Worker i's simulator listens on base-port + i")
+    pb.add_argument("--seed", type=int, default=0)
+    pb.add_argument("--no-simulator", action="store_true",
+                    help="Don't start/stop simulators; expect them already listening on the ports")
+    pb.add_argument("--sim-cpus", type=int, default=None)
+    pb.add_argument("--sim-memory", default=None)
+    pb.add_argument("--sim-backend", choices=["auto", "apptainer", "docker", "local"], default="auto",
+                    help="How simulators are started (see src/simulators.py)")
+    pb.add_argument("--sim-command", default=None,
+                    help="Command of the local backend, e.g. a stand-in server; may use {port} and {name}")
+    pb.add_argument("--env-config", default="configs/environment_params.yaml")
+    pb.add_argument("--agent-config", default="configs/agent_params.json")
+    pb.add_argument("--reward", default="baseline",
+                    help="baseline|stage2|stage3 or path to reward_function*.py")
+    pb.add_argument("--hparams-config", default="baseline",
+                    help="Base hyper_params for the values PBT does not search")
+    pb.add_argument("--action-repeat", type=int, default=None,
+                    help="Repeat each action for k simulator steps in every member")
+
+    # --- simulators ---
+    sm = sub.add_parser("simulators", help="Start a pool of simulators, wait for their gym handshake and keep them up")
+    sm.add_argument("--count", type=int, default=1, help="Simulators to start")
+    sm.add_argument("--name", default="deepracer", help="Instance i is named <name>_<i> (just <name> if --count 1)")
+    sm.add_argument("--base-port", type=int, default=None,
+                    help="Simulator i listens on base-port + i (default: derived from $USER)")
+    sm.add_argument("--backend", choices=["auto", "apptainer", "docker", "local"], default="auto")
+    sm.add_argument("--command", default=None,
+                    help="Command of the local backend, e.g. a stand-in server; may use {port} and {name}")
+    sm.add_argument("--config-dir", default="configs", help="Mounted as /configs in every simulator")
+    sm.add_argument("--sim-cpus", type=int, default=None)
+    sm.add_argument("--sim-memory", default=None)
+    sm.add_argument("--evaluation", action="store_true", help="Start the simulators in evaluation mode")
+    sm.add_argument("--world", default=None, help="Evaluation world")
+    sm.add_argument("--shm", action="store_true", help="Share the host's /dev/shm with the simulators")
+    sm.add_argument("--startup-timeout", type=float, default=600.0,
+                    help="Seconds to answer the first handshake before a simulator is restarted")
+
+    # --- distill ---
+    ds = sub.add_parser("distill", help="DAgger distillation of a state-based teacher into a camera/sensor student")
+    ds.add_argument("--teacher", required=True,
+                    help="Teacher checkpoint.pt / model_<step>.pt trained with 'observation': 'state' agent params")
+    ds.add_argument("--name", default=None, help="Results go to distill/<name>/")
+    ds.add_argument("--iterations", type=int, default=5, help="DAgger iterations")
+    ds.add_argument("--steps", type=int, default=2000, help="Simulator steps per iteration")
+    ds.add_argument("--epochs", type=int, default=3, help="Behavior-cloning epochs over the aggregate per iteration")
+    ds.add_argument("--beta", type=float, default=1.0, help="Probability the teacher drives in the first iteration")
+    ds.add_argument("--beta-decay", type=float, default=0.5, help="Factor applied to --beta every iteration")
+    ds.add_argument("--dataset-dir", default=None,
+                    help="Aggregate into this dataset (default: distill/<name>/dataset; an existing one is extended)")
+    ds.add_argument("--student", default=None, help="Continue from these student weights")
+    ds.add_argument("--port", type=int, default=None)
+    ds.add_argument("--seed", type=int, default=0)
+    ds.add_argument("--env-config", default="configs/environment_params.yaml")
+    ds.add_argument("--agent-config", default="configs/agent_params.json",
+                    help="The student's sensors (the simulator renders these)")
+    ds.add_argument("--reward", default="baseline",
+                    help="baseline|stage2|stage3 or path to reward_function*.py")
+    ds.add_argument("--hparams-config", default="baseline")
+
+    # --- compress ---
+    cp = sub.add_parser("compress", help="Prune and low-rank factorize a saved actor, fine-tune and report")
+    cp.add_argument("--model", required=True, help="checkpoint.pt or model_<step>.pt")
+    cp.add_argument("--out", default=None, help="Compressed actor (default: <model>.compressed.pt; report next to it)")
+    cp.add_argument("--dataset", default=None,
+                    help="Recorded observations (--dataset-dir of train/eval) for fine-tuning and the action error")
+    cp.add_argument("--keep", type=float, default=1.0, help="Fraction of hidden units kept by structured pruning")
+    cp.add_argument("--energy", type=float, default=0.95,
+                    help="Squared singular values kept by the low-rank factors")
+    cp.add_argument("--rank", type=int, default=None, help="Fixed rank instead of --energy")
+    cp.add_argument("--epochs", type=int, default=3, help="Fine-tuning epochs")
+    cp.add_argument("--seed", type=int, default=0)
 
     # --- eval ---
     ev = sub.add_parser("eval", help="Evaluate a trained model across tracks")
@@ -94,49 +211,251 @@ def main():
                     default=["reInvent2019_wide", "reInvent2019_track", "Vegas_track"])
     ev.add_argument("--episodes", type=int, default=5)
 
+    # --- rank ---
+    rk = sub.add_parser("rank", help="Evaluate many checkpoints in one simulator session per track and rank them")
+    rk.add_argument("--models", nargs="+", required=True,
+                    help="Checkpoints, globs (e.g. 'runs/<run>/model_*.pt') or run directories")
+    rk.add_argument("--worlds", nargs="+",
+                    default=["reInvent2019_wide", "reInvent2019_track", "Vegas_track"])
+    rk.add_argument("--episodes", type=int, default=3, help="Episodes per checkpoint and world")
+    rk.add_argument("--name", default=None, help="Results go to evaluations/<name>/")
+    rk.add_argument("--port", type=int, default=None, help="Gym port of the evaluation simulator")
+    rk.add_argument("--no-simulator", action="store_true",
+                    help="Use the simulator already running on --port (one world only)")
+    rk.add_argument("--sim-cpus", type=int, default=None)
+    rk.add_argument("--sim-memory", default=None)
+    rk.add_argument("--sim-backend", choices=["auto", "apptainer", "docker", "local"], default="auto",
+                    help="How simulators are started (see src/simulators.py)")
+    rk.add_argument("--sim-command", default=None,
+                    help="Command of the local backend, e.g. a stand-in server; may use {port} and {name}")
+    rk.add_argument("--env-config", default="configs/environment_params.yaml")
+    rk.add_argument("--agent-config", default="configs/agent_params.json",
+                    help="The sensors the checkpoints were trained on")
+    rk.add_argument("--reward", default="baseline",
+                    help="baseline|stage2|stage3 or path to reward_function*.py")
+    rk.add_argument("--hparams-config", default="baseline")
+
     # --- demo ---
     dm = sub.add_parser("demo", help="Render a demo video for a single track")
     dm.add_argument("--model", default="models/ppo_time_trial.pt")
     dm.add_argument("--world", default="reInvent2019_wide")
     dm.add_argument("--out", default="videos/time_trial.mp4")
 
+    # --- replay ---
+    rp = sub.add_parser("replay", help="Score reward variants on recorded reward_params logs")
+    rp.add_argument("--logs", nargs="+", required=True,
+                    help="JSONL files, globs or directories written by --reward-log")
+    rp.add_argument("--reward", nargs="+", default=["baseline"],
+                    help="baseline|stage2|stage3 or paths to reward_function*.py")
+    rp.add_argument("--no-vectorized", action="store_true",
+                    help="Ignore reward_function_vectorized and call reward_function per step")
+
     args = ap.parse_args()
 
-    if args.cmd == "train":
-        env_cfg_path    = _resolve_env_path(args.env_config)
-        agent_cfg_path  = _resolve_agent_path(args.agent_config)
-        reward_src      = _resolve_reward_variant(args.reward)
-        hparams_path    = _resolve_hparams_variant(args.hparams_config)
-
-        # Active files consumed by env/sim and run()
-        active_env     = CFG_DIR / "environment_params.yaml"
-        active_agent   = CFG_DIR / "agent_params.json"
-        active_reward  = CFG_DIR / "reward_function.py"
-        active_hparams = CFG_DIR / "hyper_params.yaml"
-
-        with _swap_file(active_env, env_cfg_path), \
-             _swap_file(active_agent, agent_cfg_path), \
-             _swap_file(active_reward, reward_src), \
-             _swap_file(active_hparams, hparams_path):
-
-            # Build overrides (CLI flags can override YAML)
-            overrides = {}
-            if args.lr is not None:   overrides["lr"] = float(args.lr)
-            if args.seed is not None: overrides["seed"] = int(args.seed)
-            if args.experiment_name:  overrides["experiment_name"] = str(args.experiment_name)
-            if args.steps is not None:overrides["total_timesteps"] = int(args.steps)
-            if args.logdir:           overrides["logdir"] = args.logdir
-
-            run(overrides)
+    if args.cmd in ("train", "materialize", "sweep", "pbt", "distill", "rank"):
+        config_sources = {
+            "environment_params": str(_resolve_env_path(args.env_config)),
+            "agent_params":       str(_resolve_agent_path(args.agent_config)),
+            "reward_function":    str(_resolve_reward_variant(args.reward)),
+            "hyper_params":       str(_resolve_hparams_variant(args.hparams_config)),
+        }
+
+    if args.cmd == "materialize":
+        print(materialize(args.out, **config_sources))
+
+    elif args.cmd == "train":
+        # configs are copied into the run's own directory (or an existing one is
+        # used), never swapped in place, so runs in one checkout don't interfere
+        overrides = {}
+        if args.config_dir:
+            overrides["config_dir"] = args.config_dir
+            env_path = os.path.join(args.config_dir, "environment_params.yaml")
+            agent_path = os.path.join(args.config_dir, "agent_params.json")
+        else:
+            overrides["config_sources"] = config_sources
+            env_path = config_sources["environment_params"]
+            agent_path = config_sources["agent_params"]
+
+        # fail early if a variant is invalid
+        env_params = load_environment_params(env_path)
+        agent_params = load_agent_params(agent_path)
+        print(f"[TRAIN] {env_params.world_name} ({env_params.race_type}), "
+              f"sensors={list(agent_params.sensors)}, {agent_params.observation} observations, "
+              f"{agent_params.action_space_type} actions")
+
+        # Build overrides (CLI flags can override YAML)
+        if args.lr is not None:   overrides["lr"] = float(args.lr)
+        if args.seed is not None: overrides["seed"] = int(args.seed)
+        if args.experiment_name:  overrides["experiment_name"] = str(args.experiment_name)
+        if args.steps is not None:overrides["total_timesteps"] = int(args.steps)
+        if args.logdir:           overrides["logdir"] = args.logdir
+        if args.reward_log:       overrides["reward_log"] = args.reward_log
+        if args.dataset_dir:      overrides["dataset_dir"] = args.dataset_dir
+        if args.profile:          overrides["profile"] = True
+        if args.pretrain_dataset: overrides["pretrain_dataset"] = args.pretrain_dataset
+        if args.compact_protocol: overrides["compact_protocol"] = True
+        if args.image_codec:      overrides["image_codec"] = args.image_codec
+        if args.shm:              overrides["transport"] = "shm"
+        if args.port:             overrides["port"] = args.port
+        if args.workers:          overrides["num_workers"] = args.workers
+        if args.action_repeat:    overrides["action_repeat"] = args.action_repeat
+        if args.horizon:          overrides["rollout_horizon"] = args.horizon
+        if args.hidden_sizes:     overrides["hidden_sizes"] = args.hidden_sizes
+
+        from src.run import run
+        run(overrides)
+
+    elif args.cmd == "sweep":
+        from src.sweep import sweep
+        results = sweep(
+            args.space,
+            config_sources,
+            resolve_reward=lambda variant: str(_resolve_reward_variant(variant)),
+            name=args.name,
+            steps=args.steps,
+            max_concurrent=args.max_concurrent,
+            base_port=args.base_port,
+            min_steps=args.min_steps,
+            eta=args.eta,
+            start_simulators=not args.no_simulator,
+            simulator_cpus=args.sim_cpus,
+            simulator_memory=args.sim_memory,
+            simulator_backend=args.sim_backend,
+            simulator_command=args.sim_command,
+            action_repeat=args.action_repeat,
+            seed=args.seed,
+        )
+        for rank, r in enumerate(results, 1):
+            print(f"[SWEEP] #{rank} trial={r['trial']} score={r['score']} "
+                  f"status={r['status']} steps={r['steps']} params={r['params']}")
+
+    elif args.cmd == "pbt":
+        from src.pbt import pbt
+        results = pbt(
+            config_sources,
+            name=args.name,
+            population=args.population,
+            steps=args.steps,
+            interval=args.interval,
+            space_path=args.space,
+            base_port=args.base_port,
+            start_simulators=not args.no_simulator,
+            simulator_cpus=args.sim_cpus,
+            simulator_memory=args.sim_memory,
+            simulator_backend=args.sim_backend,
+            simulator_command=args.sim_command,
+            action_repeat=args.action_repeat,
+            seed=args.seed,
+        )
+        for rank, r in enumerate(results, 1):
+            print(f"[PBT] #{rank} member={r['member']} score={r['score']} "
+                  f"status={r['status']} parent={r['parent']} hparams={r['hyperparameters']}")
+
+    elif args.cmd == "simulators":
+        from src.simulators import SimulatorPool
+        pool = SimulatorPool(
+            args.count,
+            backend=args.backend,
+            name=args.name,
+            base_port=args.base_port,
+            startup_timeout=args.startup_timeout,
+            config_dir=args.config_dir,
+            cpus=args.sim_cpus,
+            memory=args.sim_memory,
+            evaluation=args.evaluation,
+            world_name=args.world,
+            share_shm=args.shm,
+            command=args.command,
+        )
+        try:
+            pool.start()
+            for r in pool.records():
+                print(f"[SIMULATORS] {r['name']}: {r['status']} gym={r['port']} "
+                      f"gazebo={r['gazebo_port']} ros={r['ros_port']}")
+            pool.supervise()
+        finally:
+            pool.close()
+
+    elif args.cmd == "distill":
+        from src.distill import distill
+        history = distill(
+            args.teacher,
+            config_sources,
+            name=args.name,
+            iterations=args.iterations,
+            steps=args.steps,
+            epochs=args.epochs,
+            beta=args.beta,
+            beta_decay=args.beta_decay,
+            port=args.port,
+            dataset_dir=args.dataset_dir,
+            student_path=args.student,
+            seed=args.seed,
+        )
+        for h in history:
+            print(f"[DISTILL] iteration={h['iteration']} beta={h['beta']:.2f} transitions={h['transitions']} "
+                  f"loss={h['loss']} disagreement={h['disagreement']} return={h['return']}")
+
+    elif args.cmd == "compress":
+        from src.compress import compress
+        report = compress(
+            args.model,
+            out=args.out,
+            dataset_dir=args.dataset,
+            keep=args.keep,
+            energy=args.energy,
+            rank=args.rank,
+            epochs=args.epochs,
+            seed=args.seed,
+        )
+        original, compressed = report["original"], report["compressed"]
+        print(f"[COMPRESS] parameters {original['parameters']} -> {compressed['parameters']}, "
+              f"bytes {original['bytes']} -> {compressed['bytes']}, "
+              f"latency {original['latency'] * 1e6:.0f} -> {compressed['latency'] * 1e6:.0f} us, "
+              f"action error {report.get('action_error')} -> {report['out']}")
 
     elif args.cmd == "eval":
+        from src.utils import evaluate
         for w in args.worlds:
             metrics = evaluate(world_name=w, model_path=args.model, episodes=args.episodes)
             print(f"[EVAL] {w}: {metrics}")
 
+    elif args.cmd == "rank":
+        from src.checkpoints import evaluate_checkpoints, find_checkpoints
+        checkpoints = find_checkpoints(args.models)
+        print(f"[RANK] {len(checkpoints)} checkpoints on {args.worlds}")
+        ranking = evaluate_checkpoints(
+            checkpoints,
+            worlds=args.worlds,
+            episodes=args.episodes,
+            config_sources=config_sources,
+            name=args.name,
+            port=args.port,
+            start_simulators=not args.no_simulator,
+            simulator_cpus=args.sim_cpus,
+            simulator_memory=args.sim_memory,
+            simulator_backend=args.sim_backend,
+            simulator_command=args.sim_command,
+        )
+        for r in ranking:
+            print(f"[RANK] #{r['rank']} {r['checkpoint']} progress={r['progress']:.1f} "
+                  f"completion={r['completion']:.2f} lap_time={r['lap_time']}")
+
     elif args.cmd == "demo":
+        from src.utils import demo
         os.makedirs(os.path.dirname(args.out), exist_ok=True)
         demo(world_name=args.world, model_path=args.model, output_path=args.out)
 
+    elif args.cmd == "replay":
+        from src.reward_replay import load_reward_function, replay, summarize
+        for variant in args.reward:
+            reward_fn, reward_fn_vectorized = load_reward_function(
+                str(_resolve_reward_variant(variant))
+            )
+            if args.no_vectorized:
+                reward_fn_vectorized = None
+            result = replay(reward_fn, args.logs, reward_fn_vectorized)
+            print(f"[REPLAY] {variant}: {summarize(result)}")
+
 if __name__ == "__main__":
     sys.exit(main())
@@ -0,0 +1,287 @@
+import io
+import os
+import copy
+import json
+import time
+import torch
+import numpy as np
+import torch.nn as nn
+from loguru import logger
+
+from src.dataset import TransitionDataset
+
+
+COMPRESSED_VERSION: int=1
+KEEP_UNITS: float=1.0           # fraction of each hidden layer's units kept by pruning
+ENERGY: float=0.95              # squared singular values kept by the low-rank factors
+FINETUNE_EPOCHS: int=3
+FINETUNE_LR: float=1e-3
+FINETUNE_BATCH_SIZE: int=256
+HOLDOUT: float=0.1              # recorded observations kept out of fine-tuning for the report
+LATENCY_REPEAT: int=200
+
+
+def _linear(in_features: int, out_features: int, bias: bool=True) -> nn.Linear:
+    return nn.Linear(in_features, out_features, bias=bias)
+
+
+def build_actor(layers: list[list]) -> nn.Sequential:
+    '''
+    an actor from its layer spec: ['linear', in, out], ['low_rank', in,
+    rank, out] (two Linears, the first without bias) or ['tanh'].
+    '''
+    modules = []
+    for kind, *shape in layers:
+        if kind == 'linear':
+            modules.append(_linear(*shape))
+        elif kind == 'low_rank':
+            in_features, rank, out_features = shape
+            modules.append(nn.Sequential(
+                _linear(in_features, rank, bias=False), _linear(rank, out_features)
+            ))
+        elif kind == 'tanh':
+            modules.append(nn.Tanh())
+        else:
+            raise ValueError(f'Unknown actor layer {kind}.')
+    return nn.Sequential(*modules)
+
+
+def layer_spec(actor: nn.Sequential) -> list[list]:
+    spec = []
+    for module in actor:
+        if isinstance(module, nn.Linear):
+            spec.append(['linear', module.in_features, module.out_features])
+        elif isinstance(module, nn.Sequential):
+            first, second = module
+            spec.append(['low_rank', first.in_features, first.out_features, second.out_features])
+        elif isinstance(module, nn.Tanh):
+            spec.append(['tanh'])
+        else:
+            raise ValueError(f'Cannot describe actor layer {module}.')
+    return spec
+
+
+def load_actor(path: str) -> nn.Sequential:
+    '''
+    the actor of a checkpoint.pt, an actor-only model_<step>.pt (a
+    PPOAgent Linear/Tanh stack, shapes read off the weights) or a
+    compressed actor.
+    '''
+    checkpoint = torch.load(path, map_location='cpu')
+    if 'layers' in checkpoint:
+        actor = build_actor(checkpoint['layers'])
+        actor.load_state_dict(checkpoint['actor'])
+        return actor
+    state = checkpoint.get('actor', checkpoint)
+    weights = sorted(
+        (key for key in state if key.endswith('.weight')), key=lambda key: int(key.split('.')[0])
+    )
+    layers = []
+    for key in weights:
+        out_features, in_features = state[key].shape
+        layers += [['linear', in_features, out_features], ['tanh']]
+    actor = build_actor(layers)
+    actor.load_state_dict({
+        f'{2 * i}.{name}': state[f'{key.split(".")[0]}.{name}']
+        for i, key in enumerate(weights) for name in ('weight', 'bias')
+    })
+    return actor
+
+
+def prune_units(actor: nn.Sequential, keep: float) -> nn.Sequential:
+    '''
+    structured magnitude pruning: each hidden layer keeps the `keep`
+    fraction of its units with the largest |incoming| * |outgoing| weight
+    norms. The result is a smaller dense actor, not a masked one, so it
+    is also faster.
+    '''
+    linears = [module for module in actor if isinstance(module, nn.Linear)]
+    if len(linears) != len([m for m in actor if not isinstance(m, nn.Tanh)]):
+        raise ValueError('Prune before factorizing.')
+    kept = [None] * len(linears)
+    for i in range(len(linears) - 1):
+        layer, following = linears[i], linears[i + 1]
+        importance = layer.weight.norm(dim=1) * following.weight.norm(dim=0)
+        count = max(1, round(keep * layer.out_features))
+        kept[i] = importance.topk(count).indices.sort().values
+
+    pruned = []
+    index = 0
+    for module in actor:
+        if not isinstance(module, nn.Linear):
+            pruned.append(nn.Tanh())
+            continue
+        rows = kept[index] if kept[index] is not None else torch.arange(module.out_features)
+        columns = kept[index - 1] if index > 0 else torch.arange(module.in_features)
+        layer = _linear(len(columns), len(rows))
+        with torch.no_grad():
+            layer.weight.copy_(module.weight[rows][:, columns])
+            layer.bias.copy_(module.bias[rows])
+        pruned.append(layer)
+        index += 1
+    return nn.Sequential(*pruned)
+
+
+def factorize(actor: nn.Sequential, energy: float=ENERGY, rank: int | None=None) -> nn.Sequential:
+    '''
+    replaces each Linear by two thinner ones (truncated SVD: W ~ U_r S_r V_r)
+    where that has fewer parameters. The rank is `rank` or the smallest one
+    keeping `energy` of the squared singular values.
+    '''
+    factorized = []
+    for module in actor:
+        if not isinstance(module, nn.Linear):
+            factorized.append(module)
+            continue
+        with torch.no_grad():
+            U, S, Vh = torch.linalg.svd(module.weight, full_matrices=False)
+        r = rank or int(np.searchsorted(
+            np.cumsum(S.numpy() ** 2) / np.sum(S.numpy() ** 2), energy
+        ) + 1)
+        r = min(r, len(S))
+        if r * (module.in_features + module.out_features) >= module.in_features * module.out_features:
+            factorized.append(module)
+            continue
+        first, second = _linear(module.in_features, r, bias=False), _linear(r, module.out_features)
+        with torch.no_grad():
+            root = S[:r].sqrt()
+            first.weight.copy_(root[:, None] * Vh[:r])
+            second.weight.copy_(U[:, :r] * root[None, :])
+            second.bias.copy_(module.bias)
+        factorized.append(nn.Sequential(first, second))
+    return nn.Sequential(*factorized)
+
+
+def fine_tune(
+        actor: nn.Sequential,
+        reference: nn.Sequential,
+        observations: np.ndarray,
+        epochs: int=FINETUNE_EPOCHS,
+        lr: float=FINETUNE_LR,
+        batch_size: int=FINETUNE_BATCH_SIZE
+    ) -> list[float]:
+    '''regresses the compressed actor's mean actions onto the original's.'''
+    optimizer = torch.optim.Adam(actor.parameters(), lr=lr)
+    observations = torch.as_tensor(observations, dtype=torch.float32)
+    with torch.no_grad():
+        targets = reference(observations)
+    losses = []
+    for epoch in range(epochs):
+        total = 0.0
+        order = torch.randperm(len(observations))
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            loss = nn.functional.mse_loss(actor(observations[batch]), targets[batch])
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(batch)
+        losses.append(total / max(len(observations), 1))
+        logger.info(f'Fine-tune epoch {epoch + 1}/{epochs}: loss={losses[-1]:.6f}')
+    return losses
+
+
+def _size(actor: nn.Sequential) -> int:
+    buffer = io.BytesIO()
+    torch.save(actor.state_dict(), buffer)
+    return buffer.tell()
+
+
+def _latency(actor: nn.Sequential, in_features: int, repeat: int=LATENCY_REPEAT) -> float:
+    '''median seconds of one batch-1 forward on CPU.'''
+    x = torch.zeros(1, in_features)
+    times = []
+    with torch.no_grad():
+        for _ in range(repeat + 10):
+            start = time.perf_counter()
+            actor(x)
+            times.append(time.perf_counter() - start)
+    return float(np.median(times[10:]))
+
+
+def _stats(actor: nn.Sequential, in_features: int) -> dict:
+    return {
+        'parameters': sum(p.numel() for p in actor.parameters()),
+        'bytes': _size(actor),
+        'latency': _latency(actor, in_features),
+    }
+
+
+def _observations(directory: str, limit: int | None=None) -> np.ndarray:
+    dataset = TransitionDataset(directory)
+    indices = np.arange(len(dataset))
+    if limit is not None and len(indices) > limit:
+        indices = np.sort(np.random.default_rng(0).choice(indices, limit, replace=False))
+    return dataset.get(indices)['observations'].reshape(len(indices), -1).astype(np.float32)
+
+
+def compress(
+        model_path: str,
+        out: str | None=None,
+        dataset_dir: str | None=None,
+        keep: float=KEEP_UNITS,
+        energy: float=ENERGY,
+        rank: int | None=None,
+        epochs: int=FINETUNE_EPOCHS,
+        lr: float=FINETUNE_LR,
+        max_observations: int | None=20_000,
+        seed: int=0
+    ) -> dict:
+    '''
+    prunes hidden units (keep < 1), low-rank factorizes the Linears and,
+    given recorded observations (a TransitionDataset, e.g. from --dataset-dir),
+    fine-tunes the result to match the original actor's actions. Writes the
+    compressed actor (loadable by PPOAgent.load_checkpoint) to `out` and
+    returns a report of parameters, bytes, latency and action error on
+    held-out observations, before and after.
+    '''
+    torch.manual_seed(seed)
+    out = out or os.path.splitext(model_path)[0] + '.compressed.pt'
+    original = load_actor(model_path).eval()
+    in_features = next(m for m in original.modules() if isinstance(m, nn.Linear)).in_features
+
+    # a copy: unfactorized layers are reused as they are, then fine-tuned
+    actor = copy.deepcopy(original)
+    if keep < 1.0:
+        actor = prune_units(actor, keep)
+    actor = factorize(actor, energy, rank)
+
+    report = {'model': model_path, 'out': out, 'keep': keep, 'energy': energy, 'rank': rank}
+    holdout = None
+    if dataset_dir:
+        observations = _observations(dataset_dir, max_observations)
+        split = len(observations) - max(1, int(HOLDOUT * len(observations)))
+        holdout = observations[split:]
+        if epochs > 0 and split > 0:
+            actor.train()
+            report['fine_tune_loss'] = fine_tune(actor, original, observations[:split], epochs, lr)
+    else:
+        logger.warning('No recorded observations: no fine-tuning and no action error in the report.')
+    actor.eval()
+
+    report['original'] = _stats(original, in_features)
+    report['compressed'] = _stats(actor, in_features)
+    report['layers'] = layer_spec(actor)
+    if holdout is not None:
+        with torch.no_grad():
+            x = torch.as_tensor(holdout)
+            error = (actor(x) - original(x)).abs()
+        report['action_error'] = {
+            'mean': float(error.mean()), 'max': float(error.max()), 'observations': len(holdout)
+        }
+
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    torch.save({
+        'version': COMPRESSED_VERSION,
+        'layers': report['layers'],
+        'actor': actor.state_dict(),
+    }, out)
+    with open(os.path.splitext(out)[0] + '.json', 'w') as file:
+        json.dump(report, file, indent=2)
+    logger.info(
+        f'Compressed {model_path}: {report["original"]["parameters"]} -> '
+        f'{report["compressed"]["parameters"]} parameters, latency '
+        f'{report["original"]["latency"] * 1e6:.0f} -> {report["compressed"]["latency"] * 1e6:.0f} us, '
+        f'action error {report.get("action_error")}; saved to {out}.'
+    )
+    return report
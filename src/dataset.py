@@ -0,0 +1,220 @@
+import os
+import json
+import numpy as np
+import gymnasium as gym
+from loguru import logger
+
+
+SHARD_SIZE: int=10_000
+INDEX_FILE: str='index.json'
+SHARD_FIELDS: tuple[str, ...]=('observations', 'actions', 'rewards', 'dones')
+
+
+def observation_dtype(observation_space: gym.Space) -> np.dtype:
+    '''camera pixels stay uint8 on disk; anything else is stored as float32.'''
+    dtype = getattr(observation_space, 'dtype', None)
+    if dtype is not None and np.issubdtype(dtype, np.integer):
+        return np.dtype(np.uint8)
+    return np.dtype(np.float32)
+
+
+class TransitionDataset:
+    '''
+    memory-mapped on-disk transitions, split into fixed-size shards:
+
+        <directory>/index.json
+        <directory>/shard_00000/{observations,actions,rewards,dones}.npy
+
+    `observations[i]` is the observation the action `actions[i]` was taken in;
+    `rewards[i]` and `dones[i]` are what the environment returned for it.
+    Opening an existing directory for writing appends to it.
+    '''
+    def __init__(
+            self,
+            directory: str,
+            observation_shape: tuple[int, ...] | None=None,
+            action_shape: tuple[int, ...] | None=None,
+            observation_dtype: np.dtype | str=np.uint8,
+            shard_size: int=SHARD_SIZE,
+            writable: bool=False
+        ):
+        self.directory = directory
+        self.writable = writable
+        index_path = os.path.join(directory, INDEX_FILE)
+
+        if os.path.exists(index_path):
+            with open(index_path, 'r') as file:
+                self.index = json.load(file)
+        elif writable:
+            if observation_shape is None or action_shape is None:
+                raise ValueError(
+                    'observation_shape and action_shape are required for a new dataset.'
+                )
+            os.makedirs(directory, exist_ok=True)
+            self.index = {
+                'observation_shape': list(observation_shape),
+                'observation_dtype': np.dtype(observation_dtype).str,
+                'action_shape': list(action_shape),
+                'shard_size': int(shard_size),
+                'shards': [],
+            }
+        else:
+            raise FileNotFoundError(f'No dataset found at {directory}.')
+
+        self._shards: list[dict[str, np.ndarray]]=[
+            self._open_shard(i) for i in range(len(self.index['shards']))
+        ]
+        self._offsets = None
+
+    @classmethod
+    def for_environment(cls, directory: str, environment: gym.Env, **kwargs):
+        return cls(
+            directory,
+            observation_shape=environment.observation_space.shape,
+            action_shape=environment.action_space.shape,
+            observation_dtype=observation_dtype(environment.observation_space),
+            writable=True,
+            **kwargs
+        )
+
+    def _shard_path(self, shard: int, field: str) -> str:
+        return os.path.join(self.directory, f'shard_{shard:05d}', f'{field}.npy')
+
+    def _open_shard(self, shard: int) -> dict[str, np.ndarray]:
+        mode = 'r+' if self.writable else 'r'
+        return {
+            field: np.load(self._shard_path(shard, field), mmap_mode=mode)
+            for field in SHARD_FIELDS
+        }
+
+    def _new_shard(self):
+        if self._shards:
+            # previous shard is full; make it visible to readers
+            self.flush()
+        shard = len(self.index['shards'])
+        os.makedirs(os.path.dirname(self._shard_path(shard, 'x')), exist_ok=True)
+        capacity = self.index['shard_size']
+        specs = {
+            'observations': (
+                self.index['observation_shape'], self.index['observation_dtype']
+            ),
+            'actions': (self.index['action_shape'], np.float32),
+            'rewards': ((), np.float32),
+            'dones': ((), np.bool_),
+        }
+        self._shards.append({
+            field: np.lib.format.open_memmap(
+                self._shard_path(shard, field), mode='w+',
+                dtype=dtype, shape=(capacity, *shape)
+            ) for field, (shape, dtype) in specs.items()
+        })
+        self.index['shards'].append(0)
+
+    def append(self, observation, action, reward: float, done: bool):
+        assert self.writable, 'Dataset was opened read-only.'
+        if (
+            not self.index['shards']
+            or
+            self.index['shards'][-1] >= self.index['shard_size']
+        ):
+            self._new_shard()
+        shard = self._shards[-1]
+        i = self.index['shards'][-1]
+        shard['observations'][i] = np.asarray(observation).reshape(
+            self.index['observation_shape']
+        )
+        shard['actions'][i] = np.asarray(action, dtype=np.float32).reshape(
+            self.index['action_shape']
+        )
+        shard['rewards'][i] = reward
+        shard['dones'][i] = done
+        self.index['shards'][-1] += 1
+        self._offsets = None
+
+    def flush(self):
+        if not self.writable:
+            return
+        # only the last shard is written to; full ones were flushed on rollover
+        for shard in self._shards[-1:]:
+            for array in shard.values():
+                array.flush()
+        # write the index last, so readers never see unwritten rows
+        temporary = os.path.join(self.directory, INDEX_FILE + '.tmp')
+        with open(temporary, 'w') as file:
+            json.dump(self.index, file)
+        os.replace(temporary, os.path.join(self.directory, INDEX_FILE))
+
+    def close(self):
+        self.flush()
+
+    def __len__(self) -> int:
+        return int(sum(self.index['shards']))
+
+    def _locate(self, indices: np.ndarray):
+        if self._offsets is None:
+            self._offsets = np.cumsum([0] + self.index['shards'])
+        shards = np.searchsorted(self._offsets, indices, side='right') - 1
+        return shards, indices - self._offsets[shards]
+
+    def get(self, indices) -> dict[str, np.ndarray]:
+        '''gathers rows (in the given order) from across shards.'''
+        indices = np.asarray(indices, dtype=np.int64)
+        shards, rows = self._locate(indices)
+        batch = {}
+        for field in SHARD_FIELDS:
+            template = self._shards[0][field]
+            out = np.empty((len(indices), *template.shape[1:]), dtype=template.dtype)
+            for shard in np.unique(shards):
+                mask = shards == shard
+                out[mask] = self._shards[shard][field][rows[mask]]
+            batch[field] = out
+        return batch
+
+    def field(self, name: str) -> np.ndarray:
+        '''a whole (small) field as one in-memory array, e.g. rewards.'''
+        return np.concatenate([
+            shard[name][:count]
+            for shard, count in zip(self._shards, self.index['shards'])
+        ]) if self._shards else np.empty(0)
+
+    def iter_batches(self, batch_size: int, shuffle: bool=True, rng=None):
+        rng = rng if rng is not None else np.random.default_rng()
+        order = rng.permutation(len(self)) if shuffle else np.arange(len(self))
+        for start in range(0, len(order), batch_size):
+            yield self.get(np.sort(order[start:start + batch_size]))
+
+
+class RecordTransitions(gym.Wrapper):
+    '''
+    writes (observation, action, reward, done) of every step into a
+    `TransitionDataset`; works for training rollouts and evaluations alike.
+    The index is flushed at every episode end, so a killed run keeps its
+    finished episodes readable.
+    '''
+    def __init__(self, env: gym.Env, directory: str, **kwargs):
+        super().__init__(env)
+        self.dataset = TransitionDataset.for_environment(directory, env, **kwargs)
+        self._observation = None
+        logger.info(
+            f'Recording transitions to {directory} ({len(self.dataset)} existing).'
+        )
+
+    def reset(self, **kwargs):
+        observation, info = self.env.reset(**kwargs)
+        self._observation = observation
+        return observation, info
+
+    def step(self, action):
+        observation, reward, terminated, truncated, info = self.env.step(action)
+        if self._observation is not None:
+            self.dataset.append(
+                self._observation, action, reward, terminated or truncated
+            )
+            if terminated or truncated:
+                self.dataset.flush()
+        self._observation = observation
+        return observation, reward, terminated, truncated, info
+
+    def close(self):
+        self.dataset.close()
+        return super().close()
@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import types
+import torch
+import numpy as np
+import torch.nn as nn
+from gymnasium import spaces
+from loguru import logger
+
+from src.agents import Agent
+from src.ppo import PPOAgent
+from src.utils import device, set_seed, make_environment
+from src.dataset import TransitionDataset
+from src.pretrain import behavior_cloning, PRETRAIN_BATCH_SIZE, PRETRAIN_LR
+from src.telemetry import MetricsSink
+from src.transforms import (
+    EncodeLiDAR,
+    EncodeSectorLiDAR,
+    EncodeStereoCameras,
+    EncodeFrontFacingCamera,
+    CAMERA_MAX_MEASUREMENT,
+)
+from deepracer_gym.config import (
+    AGENT_PARAMS_FILE, ENVIRONMENT_PARAMS_FILE, config_path,
+    load_agent_params, load_environment_params, materialize
+)
+from deepracer_gym.envs.utils import make_action_space, make_observation_space
+from deepracer_gym.state import state_space, info_state
+
+
+DISTILL_DIR: str='distill'
+STUDENT_FILE: str='student.pt'
+ITERATIONS: int=5
+STEPS_PER_ITERATION: int=2_000
+EPOCHS: int=3                   # behavior-cloning epochs over the aggregate after each iteration
+BETA: float=1.0                 # probability the teacher drives in the first iteration
+BETA_DECAY: float=0.5           # ... multiplied by this every iteration
+HEAD_SIZE: int=64
+SENSOR_ENCODERS: dict[str, type]={
+    'FRONT_FACING_CAMERA': EncodeFrontFacingCamera,
+    'STEREO_CAMERAS': EncodeStereoCameras,
+    'LIDAR': EncodeLiDAR,
+    'SECTOR_LIDAR': EncodeSectorLiDAR,
+}
+
+
+class SensorPolicy(nn.Module):
+    '''
+    flattened sensor observation -> mean action in [-1, 1]: the observation
+    is split back into its sensors (FlattenObservation order), each goes
+    through its encoder from src/transforms.py and a small head maps the
+    concatenated latents to actions.
+    '''
+    def __init__(self, observation_space: spaces.Dict, act_dim: int, head_size: int=HEAD_SIZE):
+        super().__init__()
+        self.sensors = list(observation_space.spaces)
+        self.shapes = [space.shape for space in observation_space.spaces.values()]
+        self.sizes = [int(np.prod(shape)) for shape in self.shapes]
+        self.encoders = nn.ModuleList([SENSOR_ENCODERS[sensor]() for sensor in self.sensors])
+        with torch.no_grad():
+            latent = sum(
+                encoder(torch.zeros(1, *shape)).shape[-1]
+                for encoder, shape in zip(self.encoders, self.shapes)
+            )
+        self.head = nn.Sequential(
+            nn.Linear(latent, head_size),
+            nn.Tanh(),
+            nn.Linear(head_size, act_dim),
+            nn.Tanh(),
+        )
+
+    def forward(self, x):
+        latents = []
+        for sensor, shape, encoder, part in zip(
+                self.sensors, self.shapes, self.encoders, x.split(self.sizes, dim=-1)
+            ):
+            part = part.reshape(-1, *shape)
+            if 'CAMERA' in sensor:
+                part = part / CAMERA_MAX_MEASUREMENT
+            latents.append(encoder(part))
+        return self.head(torch.cat(latents, -1))
+
+
+class SensorStudent(Agent):
+    '''
+    the distilled policy. Exposes `actor`, `act_low`, `act_high` and
+    `device` like PPOAgent, so src.pretrain.behavior_cloning trains it and
+    the evaluation helpers (get_action(obs, train=False)) run it.
+    '''
+    def __init__(self, observation_space: spaces.Dict, action_space: spaces.Box, name: str='student'):
+        super().__init__(name=name)
+        self.device = device()
+        self.act_dim = action_space.shape[0]
+        self.act_low = torch.tensor(action_space.low, dtype=torch.float32).to(self.device)
+        self.act_high = torch.tensor(action_space.high, dtype=torch.float32).to(self.device)
+        self.actor = SensorPolicy(observation_space, self.act_dim).to(self.device)
+
+    def get_action(self, observation, train=False):
+        observation = torch.as_tensor(observation, dtype=torch.float32).to(self.device)
+        with torch.no_grad():
+            raw_action = self.actor(observation.reshape(1, -1))[0]
+        action = self.act_low + 0.5 * (raw_action + 1.0) * (self.act_high - self.act_low)
+        return action.cpu().numpy(), 0.0, 0.0
+
+
+def load_teacher(path: str, action_space: spaces.Box) -> PPOAgent:
+    '''
+    a PPOAgent trained with 'observation': 'state' agent params, from a
+    checkpoint.pt or an actor-only model_<step>.pt (widths read off the weights).
+    '''
+    checkpoint = torch.load(path, map_location='cpu')
+    actor = checkpoint.get('actor', checkpoint)
+    hidden_sizes = checkpoint.get('hidden_sizes') or [
+        actor[key].shape[0] for key in sorted(
+            (key for key in actor if key.endswith('.weight')),
+            key=lambda key: int(key.split('.')[0])
+        )
+    ][:-1]
+    teacher = PPOAgent(
+        types.SimpleNamespace(observation_space=state_space(), action_space=action_space),
+        hidden_sizes=hidden_sizes,
+    )
+    teacher.load_checkpoint(checkpoint, optimizer=False, hyperparameters=False)
+    teacher.eval()
+    return teacher
+
+
+def distill(
+        teacher_path: str,
+        config_sources: dict | None=None,
+        config_dir: str | None=None,
+        name: str | None=None,
+        iterations: int=ITERATIONS,
+        steps: int=STEPS_PER_ITERATION,
+        epochs: int=EPOCHS,
+        beta: float=BETA,
+        beta_decay: float=BETA_DECAY,
+        port: int | None=None,
+        dataset_dir: str | None=None,
+        student_path: str | None=None,
+        batch_size: int=PRETRAIN_BATCH_SIZE,
+        lr: float=PRETRAIN_LR,
+        seed: int=0
+    ) -> list[dict]:
+    '''
+    DAgger from a state teacher to a sensor student. Every iteration runs
+    `steps` simulator steps in which the teacher (on the reward_params state)
+    drives with probability beta * beta_decay ** iteration and the student
+    (on the configured sensors) otherwise. Every visited observation is
+    labelled with the teacher's action and appended to an on-disk
+    TransitionDataset, so the student learns to recover from its own
+    mistakes. After each iteration the student is behavior-cloned on the
+    whole aggregate. Weights and history go to distill/<name>/.
+    '''
+    name = name or f'distill_{int(time.time())}'
+    directory = os.path.join(DISTILL_DIR, name)
+    config_dir = config_dir or materialize(
+        os.path.join(directory, 'configs'), **(config_sources or {})
+    )
+    agent_params_path = config_path(config_dir, AGENT_PARAMS_FILE)
+    if load_agent_params(agent_params_path).observation != 'sensors':
+        raise ValueError(
+            f'The student observes sensors; {agent_params_path} must not set "observation": "state".'
+        )
+    observation_space, _ = make_observation_space(agent_params_path)
+    action_space, _ = make_action_space(agent_params_path)
+    world_name = load_environment_params(
+        config_path(config_dir, ENVIRONMENT_PARAMS_FILE)
+    ).world_name
+
+    set_seed(seed)
+    teacher = load_teacher(teacher_path, action_space)
+    student = SensorStudent(observation_space, action_space)
+    if student_path:
+        student.actor.load_state_dict(torch.load(student_path, map_location=student.device))
+    student.eval()
+
+    env = make_environment(
+        config_dir=config_dir, **({'port': port} if port else {})
+    )
+    dataset = TransitionDataset.for_environment(
+        dataset_dir or os.path.join(directory, 'dataset'), env
+    )
+    metrics = MetricsSink(directory)
+    history_path = os.path.join(directory, 'history.jsonl')
+    span = (action_space.high - action_space.low).astype(np.float32)
+    rng = np.random.default_rng(seed)
+    logger.info(
+        f'Distilling {teacher_path} into a {list(observation_space.spaces)} student '
+        f'({len(dataset)} transitions already in the dataset).'
+    )
+
+    history = []
+    step = 0
+    observation, info = env.reset()
+    state = info_state(info, world_name)
+    episode_return, episode_len = 0.0, 0
+    try:
+        for iteration in range(iterations):
+            mix = beta * beta_decay ** iteration
+            returns, progress, disagreement = [], [], []
+            for _ in range(steps):
+                target, _, _ = teacher.get_action(state, train=False)
+                action, _, _ = student.get_action(observation)
+                disagreement.append(float(np.mean(np.abs(target - action) / span)))
+                executed = target if rng.random() < mix else action
+                next_observation, reward, terminated, truncated, info = env.step(executed)
+                # DAgger: the label is always the teacher's action
+                dataset.append(observation, target, reward, terminated or truncated)
+                observation = next_observation
+                state = info_state(info, world_name)
+                step += 1
+                episode_return += reward
+                episode_len += 1
+                if terminated or truncated:
+                    returns.append(episode_return)
+                    progress.append(info.get('reward_params', {}).get('progress'))
+                    metrics.episode(
+                        step, **{'return': episode_return}, length=episode_len,
+                        progress=progress[-1], beta=mix
+                    )
+                    episode_return, episode_len = 0.0, 0
+                    observation, info = env.reset()
+                    state = info_state(info, world_name)
+            dataset.flush()
+
+            student.train()
+            losses = behavior_cloning(student, dataset, epochs, batch_size, lr)
+            student.eval()
+            record = {
+                'iteration': iteration,
+                'step': step,
+                'beta': mix,
+                'transitions': len(dataset),
+                'loss': losses[-1] if losses else None,
+                'disagreement': float(np.mean(disagreement)) if disagreement else None,
+                'episodes': len(returns),
+                'return': float(np.mean(returns)) if returns else None,
+                'progress': float(np.mean([p for p in progress if p is not None]))
+                    if any(p is not None for p in progress) else None,
+            }
+            history.append(record)
+            metrics.log('distill', step, **{
+                key: value for key, value in record.items() if key not in ('iteration', 'step')
+            })
+            with open(history_path, 'a') as file:
+                file.write(json.dumps(record) + '\n')
+            torch.save(student.actor.state_dict(), os.path.join(directory, f'student_{iteration}.pt'))
+            logger.info(
+                f'DAgger iteration {iteration + 1}/{iterations}: beta={mix:.2f} '
+                f'transitions={len(dataset)} loss={record["loss"]} '
+                f'disagreement={record["disagreement"]} return={record["return"]}'
+            )
+    finally:
+        env.close()
+        dataset.close()
+        metrics.close()
+
+    torch.save(student.actor.state_dict(), os.path.join(directory, STUDENT_FILE))
+    logger.info(f'Student saved to {os.path.join(directory, STUDENT_FILE)}.')
+    return history
@@ -0,0 +1,342 @@
+import os
+import json
+import math
+import time
+import yaml
+import queue
+import random
+import shutil
+import multiprocessing
+from dataclasses import dataclass
+from loguru import logger
+
+from deepracer_gym.config import HYPER_PARAMS_FILE, materialize
+from src.sweep import SCORE_WINDOW, load_search_space, sample
+from src.simulators import Instance, SimulatorPool
+
+
+PBT_DIR: str='pbt'
+CHECKPOINT_FILE: str='checkpoint.pt'
+MODEL_FILE: str='model_final.pt'
+# initial values and bounds of the hyperparameters the population explores
+DEFAULT_SPACE: dict={
+    'method': 'random',
+    'params': {
+        'lr': {'log_uniform': [1.0e-5, 1.0e-3]},
+        'ent_coef': {'log_uniform': [1.0e-4, 5.0e-2]},
+        'clip_eps': {'uniform': [0.1, 0.3]},
+    },
+}
+TRUNCATION: float=0.25              # bottom fraction replaced by copies of the top fraction
+PERTURB_FACTORS: tuple[float, float]=(0.8, 1.2)
+RESAMPLE_PROBABILITY: float=0.25    # explore by resampling instead of perturbing
+REPORT_TIMEOUT: float=30.0          # seconds between liveness checks of workers
+
+
+def score(returns: list[float]) -> float | None:
+    if not returns:
+        return None
+    window = returns[-SCORE_WINDOW:]
+    return sum(window) / len(window)
+
+
+def perturb(hyperparameters: dict, space: dict, rng: random.Random) -> dict:
+    '''
+    PBT explore step: each searched value is resampled from its prior with
+    RESAMPLE_PROBABILITY, otherwise scaled by one of PERTURB_FACTORS (or
+    moved to a neighbouring choice) and kept within the prior's bounds.
+    '''
+    perturbed = dict(hyperparameters)
+    for name, spec in space['params'].items():
+        if not isinstance(spec, dict):
+            continue
+        if rng.random() < RESAMPLE_PROBABILITY or name not in perturbed:
+            perturbed[name] = sample(spec, rng)
+        elif 'values' in spec:
+            values = spec['values']
+            index = values.index(perturbed[name]) if perturbed[name] in values else 0
+            index = min(max(index + rng.choice((-1, 1)), 0), len(values) - 1)
+            perturbed[name] = values[index]
+        else:
+            low, high = spec.get('uniform') or spec.get('log_uniform') or spec['int']
+            value = min(max(perturbed[name] * rng.choice(PERTURB_FACTORS), low), high)
+            perturbed[name] = round(value) if 'int' in spec else value
+    return perturbed
+
+
+def _worker(
+        index: int,
+        port: int,
+        config_dir: str,
+        directory: str,
+        hyperparameters: dict,
+        steps: int,
+        interval: int,
+        seed: int,
+        threads: int,
+        action_repeat: int | None,
+        reports,
+        commands
+    ):
+    '''
+    one population member: trains a PPOAgent against its own simulator and,
+    at the first episode end after every `interval` steps, checkpoints,
+    reports its score and waits for the controller's decision.
+    '''
+    try:
+        import torch
+        from src.ppo import PPOAgent, HIDDEN_SIZES
+        from src.utils import set_seed, make_environment
+        from src.telemetry import MetricsSink
+        from deepracer_gym.wrappers import ActionRepeat
+
+        torch.set_num_threads(threads)
+        with open(os.path.join(config_dir, HYPER_PARAMS_FILE), 'r') as file:
+            defaults = yaml.safe_load(file)
+        set_seed(seed)
+        env = make_environment(defaults['environment'], port=port, config_dir=config_dir)
+        action_repeat = action_repeat or defaults.get('action_repeat', 1)
+        if action_repeat > 1:
+            # steps count decisions, as in src.run
+            env = ActionRepeat(env, action_repeat)
+        agent = PPOAgent(
+            env,
+            lr=defaults['lr'],
+            gamma=defaults.get('gamma', 0.99),
+            clip_eps=defaults.get('clip_eps', 0.2),
+            ent_coef=defaults.get('ent_coef', 0.01),
+            epoch_k=defaults.get('epoch_k', 10),
+            batch_size=defaults.get('batch_size', 64),
+            hidden_sizes=defaults.get('hidden_sizes', HIDDEN_SIZES),
+        )
+        agent.set_hyperparameters(**hyperparameters)
+        metrics = MetricsSink(directory)
+        metrics.log('pbt', 0, **agent.hyperparameters())
+        checkpoint_path = os.path.join(directory, CHECKPOINT_FILE)
+
+        observation, info = env.reset()
+        returns = []
+        episode_return, episode_len = 0, 0
+        ready_at = interval
+        for step in range(1, steps + 1):
+            action, log_prob, _ = agent.get_action(observation)
+            next_observation, reward, terminated, truncated, info = env.step(action)
+            agent.store(observation, action, reward, terminated or truncated, log_prob, 0)
+            observation = next_observation
+            episode_return += reward
+            episode_len += 1
+            if not (terminated or truncated):
+                continue
+
+            metrics.episode(step, **{'return': episode_return}, length=episode_len)
+            returns.append(episode_return)
+            episode_return, episode_len = 0, 0
+            observation, info = env.reset()
+            metrics.update(step, **agent.update())
+
+            if step >= ready_at and step < steps:
+                ready_at = step + interval
+                agent.save_checkpoint(checkpoint_path)
+                reports.put(('ready', index, step, score(returns)))
+                action, new_hyperparameters = commands.get()
+                if action == 'stop':
+                    break
+                if action == 'exploit':
+                    # the controller copied the donor's checkpoint over ours
+                    agent.load_checkpoint(checkpoint_path)
+                    returns.clear()
+                agent.set_hyperparameters(**new_hyperparameters)
+                metrics.log('pbt', step, exploited=action == 'exploit', **agent.hyperparameters())
+
+        agent.save_checkpoint(checkpoint_path)
+        torch.save(agent.actor.state_dict(), os.path.join(directory, MODEL_FILE))
+        env.close()
+        metrics.close()
+        reports.put(('done', index, step, score(returns)))
+    except Exception as e:
+        logger.exception(f'PBT member {index} failed.')
+        reports.put(('failed', index, 0, repr(e)))
+
+
+@dataclass
+class Member:
+    index: int
+    directory: str
+    hyperparameters: dict
+    process: multiprocessing.Process | None=None
+    status: str='running'       # running | ready | done | failed
+    step: int=0
+    score: float | None=None
+    parent: int | None=None     # member last copied from
+    simulator: Instance | None=None
+
+    @property
+    def rank_score(self) -> float:
+        return -math.inf if self.score is None else self.score
+
+    def record(self) -> dict:
+        return {
+            'member': self.index, 'status': self.status, 'step': self.step,
+            'score': self.score, 'hyperparameters': self.hyperparameters,
+            'parent': self.parent, 'directory': self.directory,
+            'port': self.simulator.port if self.simulator else None,
+        }
+
+
+def pbt(
+        config_sources: dict,
+        name: str | None=None,
+        population: int=4,
+        steps: int=15_000,
+        interval: int=2_000,
+        space_path: str | None=None,
+        base_port: int=8888,
+        start_simulators: bool=True,
+        simulator_cpus: int | None=None,
+        simulator_memory: str | None=None,
+        simulator_backend: str='auto',
+        simulator_command: str | None=None,
+        action_repeat: int | None=None,
+        seed: int=0
+    ) -> list[dict]:
+    '''
+    population-based training: `population` PPO workers train concurrently,
+    each against its own simulator, leased from a SimulatorPool for the
+    whole run (or only checked, without `start_simulators`). Whenever all
+    running members have reported (every `interval` steps), the bottom
+    TRUNCATION of the population copies the checkpoint of a random member
+    of the top TRUNCATION (exploit) and perturbs the copied hyperparameters
+    (explore). Members step with ActionRepeat when `action_repeat` (or the
+    hyper_params' action_repeat) is above 1.
+    Returns the members best first; their weights are in pbt/<name>/member_<i>/.
+    '''
+    if population < 2:
+        raise ValueError('Population-based training needs a population of at least 2.')
+    space = load_search_space(space_path) if space_path else DEFAULT_SPACE
+    name = name or f'pbt_{int(time.time())}'
+    pbt_dir = os.path.join(PBT_DIR, name)
+    config_dir = materialize(os.path.join(pbt_dir, 'configs'), **config_sources)
+    rng = random.Random(seed)
+    threads = max(1, (os.cpu_count() or 1) // population)
+    history_path = os.path.join(pbt_dir, 'history.jsonl')
+
+    members = []
+    for index in range(population):
+        directory = os.path.join(pbt_dir, f'member_{index}')
+        os.makedirs(directory, exist_ok=True)
+        hyperparameters = {
+            key: sample(spec, rng) for key, spec in space['params'].items()
+        }
+        members.append(Member(index, directory, hyperparameters))
+
+    pool = SimulatorPool(
+        population,
+        backend=simulator_backend if start_simulators else 'external',
+        name=name,
+        base_port=base_port,
+        config_dir=config_dir,
+        cpus=simulator_cpus,
+        memory=simulator_memory,
+        command=simulator_command,
+        log_dir=os.path.join(pbt_dir, 'simulators'),
+    )
+    try:
+        pool.start()
+        for member in members:
+            member.simulator = pool.acquire(timeout=0)
+            if member.simulator is None:
+                raise RuntimeError(f'Only {member.index} of {population} simulators came up.')
+    except BaseException:
+        pool.close()
+        raise
+
+    context = multiprocessing.get_context('spawn')
+    reports = context.Queue()
+    commands = [context.Queue() for _ in members]
+    for member in members:
+        member.process = context.Process(
+            target=_worker,
+            args=(
+                member.index, member.simulator.port, config_dir, member.directory,
+                member.hyperparameters, steps, interval, seed + member.index,
+                threads, action_repeat, reports, commands[member.index]
+            ),
+            name=f'pbt-member-{member.index}',
+        )
+        member.process.start()
+        logger.info(f'PBT member {member.index} on port {member.simulator.port}: {member.hyperparameters}')
+
+    def exploit_and_explore(generation: int):
+        ranked = sorted(members, key=lambda m: m.rank_score, reverse=True)
+        cutoff = max(1, int(len(ranked) * TRUNCATION))
+        top, bottom = ranked[:cutoff], ranked[-cutoff:]
+        for member in members:
+            if member.status != 'ready':
+                continue
+            action = 'continue'
+            donors = [m for m in top if m.rank_score > member.rank_score]
+            if member in bottom and donors:
+                donor = rng.choice(donors)
+                shutil.copy2(
+                    os.path.join(donor.directory, CHECKPOINT_FILE),
+                    os.path.join(member.directory, CHECKPOINT_FILE)
+                )
+                member.hyperparameters = perturb(donor.hyperparameters, space, rng)
+                member.parent = donor.index
+                action = 'exploit'
+                logger.info(
+                    f'PBT generation {generation}: member {member.index} '
+                    f'({member.score}) <- member {donor.index} ({donor.score}), '
+                    f'{member.hyperparameters}'
+                )
+            with open(history_path, 'a') as file:
+                file.write(json.dumps({
+                    'generation': generation, 'action': action, **member.record()
+                }) + '\n')
+            member.status = 'running'
+            commands[member.index].put((action, member.hyperparameters))
+
+    generation = 0
+    try:
+        while any(m.status in ('running', 'ready') for m in members):
+            try:
+                kind, index, step, value = reports.get(timeout=REPORT_TIMEOUT)
+            except queue.Empty:
+                for member in members:
+                    if member.status == 'running' and not member.process.is_alive():
+                        logger.error(f'PBT member {member.index} exited without reporting.')
+                        member.status = 'failed'
+            else:
+                member = members[index]
+                if kind == 'failed':
+                    member.status = 'failed'
+                    logger.error(f'PBT member {index} failed: {value}')
+                else:
+                    member.status = kind
+                    member.step = step
+                    member.score = value
+
+            # synchronous generations: decide once no member is still training
+            if any(m.status == 'ready' for m in members) \
+                    and not any(m.status == 'running' for m in members):
+                generation += 1
+                exploit_and_explore(generation)
+    finally:
+        for member, command in zip(members, commands):
+            if member.status == 'ready':
+                command.put(('stop', member.hyperparameters))
+        for member in members:
+            member.process.join(timeout=60)
+            if member.process.is_alive():
+                member.process.terminate()
+        pool.close()
+
+    results = sorted((m.record() for m in members), key=lambda r: (
+        -math.inf if r['score'] is None else r['score']
+    ), reverse=True)
+    with open(os.path.join(pbt_dir, 'results.json'), 'w') as file:
+        json.dump(results, file, indent=2)
+    best = os.path.join(results[0]['directory'], MODEL_FILE)
+    if os.path.exists(best):
+        shutil.copy2(best, os.path.join(pbt_dir, 'best_model.pt'))
+    return results
@@ -0,0 +1,330 @@
+import os
+import glob
+import json
+import pickle
+import struct
+import warnings
+import pandas as pd
+import seaborn as sns
+import matplotlib.pyplot as plt
+
+from src.telemetry import METRICS_FILE
+
+
+RUNS_DIR = "runs"
+CACHE_FILE = ".plot_cache.pkl"
+CACHE_VERSION = 1
+EVENT_FILE_GLOB = "events.out.tfevents.*"
+RETURN_TAG = "charts/episodic_return"
+LENGTH_TAG = "charts/episodic_length"
+SMOOTHING_WINDOW = 10
+
+# Track/experiment presets (formerly one make_plots_<preset>.py script each)
+PRESETS = {
+    "wide": {
+        "track": "reInvent2019_wide", "experiment": None,
+        "eval_dir": "final_report_part1", "output_dir": "final_report_plots",
+        "text_log": "training_reInvent2019_wide.log",
+    },
+    "h2b": {
+        "track": "reInvent2019_track", "experiment": "h2b_track",
+        "eval_dir": "final_report_h2b", "output_dir": "final_plots_h2b",
+        "text_log": "training_h2b.log",
+    },
+    "oa": {
+        "track": "reInvent2019_track", "experiment": "smile_track",
+        "eval_dir": "final_report_oa", "output_dir": "final_plots_oa",
+        "text_log": "training_oa.log",
+    },
+    "smile": {
+        "track": "reInvent2019_track", "experiment": "smile_track",
+        "eval_dir": "final_report_smile", "output_dir": "final_plots_smile",
+        "text_log": "training_smile.log",
+    },
+    "vegas": {
+        "track": "Vegas_track", "experiment": "vegas_track",
+        "eval_dir": "final_report_vegas", "output_dir": "final_plots_vegas",
+        "text_log": "training_vegas.log",
+    },
+}
+
+warnings.simplefilter(action="ignore", category=FutureWarning)
+
+
+def find_run_dir(experiment=None, runs_dir=RUNS_DIR):
+    """Latest run directory, optionally only runs of one experiment name."""
+    pattern = f"*__{experiment}__*" if experiment else "*"
+    run_dirs = [d for d in glob.glob(os.path.join(runs_dir, pattern)) if os.path.isdir(d)]
+    return max(run_dirs, key=os.path.getmtime) if run_dirs else None
+
+
+# --- incremental TensorBoard event parsing ---
+
+def _read_records(f):
+    """
+    Yields (end_offset, payload) for each complete TFRecord in an event
+    file, starting at the current position. Stops before a partially
+    written trailing record so it is picked up on the next pass.
+    """
+    while True:
+        header = f.read(12)               # uint64 length + uint32 length crc
+        if len(header) < 12:
+            return
+        (length,) = struct.unpack("<Q", header[:8])
+        payload = f.read(length)
+        footer = f.read(4)                # uint32 payload crc
+        if len(payload) < length or len(footer) < 4:
+            return
+        yield f.tell(), payload
+
+
+def _scalar_values(payload):
+    from tensorboard.compat.proto import event_pb2
+    from tensorboard.util import tensor_util
+
+    event = event_pb2.Event.FromString(payload)
+    if not event.HasField("summary"):
+        return
+    for value in event.summary.value:
+        if value.HasField("simple_value"):
+            yield value.tag, event.step, float(value.simple_value)
+        elif value.HasField("tensor") and value.metadata.plugin_data.plugin_name == "scalars":
+            yield value.tag, event.step, float(tensor_util.make_ndarray(value.tensor).item())
+
+
+def _ingest_event_file(path, state, scalars):
+    """Parses only the bytes appended to `path` since the cached offset."""
+    stat = os.stat(path)
+    if state.get("size") == stat.st_size and state.get("mtime") == stat.st_mtime_ns:
+        return False
+    offset = state.get("offset", 0)
+    if stat.st_size < offset:
+        raise ValueError(f"{path} shrank; cache is stale.")
+
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for end, payload in _read_records(f):
+            for tag, step, value in _scalar_values(payload):
+                scalars.setdefault(tag, []).append((step, value))
+            offset = end
+
+    state.update(size=stat.st_size, mtime=stat.st_mtime_ns, offset=offset)
+    return True
+
+
+def _ingest_metrics_file(path, state, records):
+    """Same idea for the JSONL telemetry stream written by src.telemetry."""
+    stat = os.stat(path)
+    if state.get("size") == stat.st_size and state.get("mtime") == stat.st_mtime_ns:
+        return False
+    offset = state.get("offset", 0)
+    if stat.st_size < offset:
+        raise ValueError(f"{path} shrank; cache is stale.")
+
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break                      # incomplete last line of a live run
+            offset += len(line)
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+
+    state.update(size=stat.st_size, mtime=stat.st_mtime_ns, offset=offset)
+    return True
+
+
+class RunCache:
+    """
+    Parsed scalars of one run directory, persisted next to the run and
+    updated incrementally: each source file is keyed by size/mtime and
+    only the bytes appended since the last ingest are parsed.
+    """
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        self.path = os.path.join(run_dir, CACHE_FILE)
+        self.data = self._load()
+
+    def _empty(self):
+        return {"version": CACHE_VERSION, "files": {}, "scalars": {}, "records": []}
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = pickle.load(f)
+            if data.get("version") == CACHE_VERSION:
+                return data
+        except (OSError, pickle.UnpicklingError, EOFError):
+            pass
+        return self._empty()
+
+    def refresh(self):
+        changed = False
+        try:
+            for path in sorted(glob.glob(os.path.join(self.run_dir, EVENT_FILE_GLOB))):
+                state = self.data["files"].setdefault(os.path.basename(path), {})
+                changed |= _ingest_event_file(path, state, self.data["scalars"])
+
+            metrics_path = os.path.join(self.run_dir, METRICS_FILE)
+            if os.path.exists(metrics_path):
+                state = self.data["files"].setdefault(METRICS_FILE, {})
+                changed |= _ingest_metrics_file(metrics_path, state, self.data["records"])
+        except ValueError:
+            # a source was rewritten from scratch; start over once
+            self.data = self._empty()
+            return self.refresh()
+
+        if changed:
+            temporary = self.path + ".tmp"
+            with open(temporary, "wb") as f:
+                pickle.dump(self.data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, self.path)
+        return self
+
+    def scalars(self, tag):
+        return self.data["scalars"].get(tag, [])
+
+    def episodes(self):
+        return [r for r in self.data["records"] if r.get("kind") == "episode"]
+
+
+# --- training data ---
+
+def _finish_training_frame(df):
+    if df is None or df.empty:
+        return None
+    df = df.sort_values("Step").reset_index(drop=True)
+    df["Efficiency"] = df["Reward"] / df["Length"]
+    df["Reward_Smooth"] = df["Reward"].rolling(window=SMOOTHING_WINDOW).mean()
+    return df
+
+
+def training_frame(run_dir):
+    """Per-episode Step/Reward/Length from the telemetry stream, else TensorBoard."""
+    cache = RunCache(run_dir).refresh()
+
+    episodes = cache.episodes()
+    if episodes:
+        df = pd.DataFrame.from_records(episodes).rename(
+            columns={"step": "Step", "return": "Reward", "length": "Length"}
+        )
+        return _finish_training_frame(df)
+
+    returns = cache.scalars(RETURN_TAG)
+    if not returns:
+        return None
+    df = pd.DataFrame(returns, columns=["Step", "Reward"])
+    lengths = dict(cache.scalars(LENGTH_TAG))
+    # older runs only logged returns
+    df["Length"] = [lengths.get(step, 1) for step in df["Step"]]
+    return _finish_training_frame(df)
+
+
+def parse_text_log(logfile):
+    """Last resort for runs without telemetry or TensorBoard files."""
+    print(f"⚠️ No structured logs. Parsing text log: {logfile}...")
+    if not logfile or not os.path.exists(logfile):
+        print(f"❌ Log file {logfile} not found.")
+        return None
+
+    data = {"Step": [], "Reward": [], "Length": []}
+    with open(logfile, "r") as f:
+        for line in f:
+            if "Step=" in line and "Return=" in line:
+                try:
+                    # Line format: ... | src.run:run:51 - Step=14607 | Ep=330 | Return=12.01 | ...
+                    parts = line.split("|")
+                    step = int([p for p in parts if "Step=" in p][0].split("=")[1].strip())
+                    ret = float([p for p in parts if "Return=" in p][0].split("=")[1].strip())
+                except (IndexError, ValueError):
+                    continue
+                data["Step"].append(step)
+                data["Reward"].append(ret)
+                data["Length"].append(1)
+    if not data["Step"]:
+        print("❌ Text log was empty or format didn't match.")
+        return None
+    return _finish_training_frame(pd.DataFrame(data))
+
+
+# --- rendering ---
+
+def plot_training(df, output_dir, title=None):
+    if df is None or df.empty:
+        return
+    print(f"📊 Generating Training Plots ({len(df)} episodes)...")
+    sns.set_theme(style="darkgrid")
+
+    fig, axes = plt.subplots(1, 3, figsize=(18, 5))
+    sns.lineplot(data=df, x="Step", y="Reward", alpha=0.3, ax=axes[0], color="blue")
+    sns.lineplot(data=df, x="Step", y="Reward_Smooth", ax=axes[0], color="darkblue")
+    axes[0].set_title("Metric 1: Episodic Reward")
+
+    if (df["Length"] > 1).any():
+        sns.lineplot(data=df, x="Step", y="Length", ax=axes[1], color="green")
+        axes[1].set_title("Metric 2: Episode Length")
+    else:
+        # text logs carry no lengths
+        sns.lineplot(data=df, x="Step", y="Reward", ax=axes[1], color="green")
+        axes[1].set_title("Metric 2: Training Stability")
+        axes[1].set_ylabel("Reward")
+
+    sns.lineplot(data=df, x="Step", y="Efficiency", ax=axes[2], color="orange")
+    axes[2].set_title("Metric 3: Efficiency")
+    if title:
+        fig.suptitle(title)
+
+    plt.tight_layout()
+    fig.savefig(os.path.join(output_dir, "training_metrics.png"))
+    plt.close(fig)
+    print(f"✅ Saved training plots to {output_dir}")
+
+
+def plot_evaluation(eval_dir, track, output_dir):
+    json_path = os.path.join(eval_dir, f"{track}_metrics.json")
+    if not os.path.exists(json_path):
+        print(f"⚠️ Evaluation JSON not found: {json_path}")
+        return
+
+    print(f"📂 Reading Evaluation: {json_path}")
+    with open(json_path, "r") as f:
+        data = json.load(f)
+    df = pd.DataFrame({"progress": data["progress"], "lap_time": data["lap_time"]})
+    df["Lap"] = range(1, len(df) + 1)
+
+    fig, axes = plt.subplots(1, 2, figsize=(12, 5))
+    sns.barplot(data=df, x="Lap", y="progress", ax=axes[0], palette="Blues_d", hue="Lap", legend=False)
+    axes[0].set_title(f"Evaluation: Progress % ({track})")
+    axes[0].set_ylim(0, 110)
+    axes[0].axhline(100, color="r", linestyle="--")
+
+    completed = df.dropna(subset=["lap_time"])
+    if completed.empty:
+        axes[1].text(0.5, 0.5, "No Completed Laps", ha="center")
+    else:
+        sns.barplot(data=completed, x="Lap", y="lap_time", ax=axes[1], palette="Greens_d", hue="Lap", legend=False)
+    axes[1].set_title(f"Lap Times ({track})")
+
+    plt.tight_layout()
+    fig.savefig(os.path.join(output_dir, "evaluation_metrics.png"))
+    plt.close(fig)
+    print(f"✅ Saved evaluation plots to {output_dir}")
+
+
+def make_plots(track, output_dir, run_dir=None, experiment=None, eval_dir=None, text_log=None):
+    """Training and evaluation figures for any track/experiment combination."""
+    os.makedirs(output_dir, exist_ok=True)
+
+    run_dir = run_dir or find_run_dir(experiment)
+    df = None
+    if run_dir:
+        print(f"📂 Reading logs from: {run_dir}")
+        df = training_frame(run_dir)
+    if df is None:
+        df = parse_text_log(text_log)
+    plot_training(df, output_dir, title=f"{experiment or track}")
+
+    if eval_dir:
+        plot_evaluation(eval_dir, track, output_dir)
@@ -5,9 +5,24 @@ import torch.optim as optim
 from torch.distributions import Normal
 from src.agents import Agent
 from src.utils import device
+from deepracer_gym.profiling import profile
+
+CHECKPOINT_VERSION = 1
+# hyperparameters that can change mid-run (population-based training)
+MUTABLE_HYPERPARAMETERS = ("lr", "gamma", "clip_eps", "ent_coef", "epoch_k", "batch_size")
+HIDDEN_SIZES = (256, 128)
+
+def mlp(in_dim, hidden_sizes):
+    """Linear + Tanh layers of the given widths (the actor and critic bodies)."""
+    layers = []
+    for size in hidden_sizes:
+        layers += [nn.Linear(in_dim, size), nn.Tanh()]
+        in_dim = size
+    return layers
 
 class PPOAgent(Agent):
-    def __init__(self, environment, gamma=0.99, lr=3e-4, clip_eps=0.2, ent_coef=0.01, epoch_k=10, batch_size=64):
+    def __init__(self, environment, gamma=0.99, lr=3e-4, clip_eps=0.2, ent_coef=0.01, epoch_k=10, batch_size=64,
+                 hidden_sizes=HIDDEN_SIZES):
         super().__init__(environment)
         self.device = device()
         self.gamma = gamma
@@ -15,6 +30,8 @@ class PPOAgent(Agent):
         self.ent_coef = ent_coef
         self.epoch_k = epoch_k
         self.batch_size = batch_size
+        # e.g. (64, 64) for the low-dimensional reward_params state
+        self.hidden_sizes = tuple(hidden_sizes)
 
         # Dimensions
         self.obs_dim = environment.observation_space.shape[0]
@@ -27,11 +44,8 @@ class PPOAgent(Agent):
         
         # Actor (Policy) - Outputs Mean in range [-1, 1] via Tanh
         self.actor = nn.Sequential(
-            nn.Linear(self.obs_dim, 256),
-            nn.Tanh(),
-            nn.Linear(256, 128),
-            nn.Tanh(),
-            nn.Linear(128, self.act_dim),
+            *mlp(self.obs_dim, self.hidden_sizes),
+            nn.Linear(self.hidden_sizes[-1], self.act_dim),
             nn.Tanh() 
         ).to(self.device)
 
@@ -39,17 +53,85 @@ class PPOAgent(Agent):
 
         # Critic (Value)
         self.critic = nn.Sequential(
-            nn.Linear(self.obs_dim, 256),
-            nn.Tanh(),
-            nn.Linear(256, 128),
-            nn.Tanh(),
-            nn.Linear(128, 1)
+            *mlp(self.obs_dim, self.hidden_sizes),
+            nn.Linear(self.hidden_sizes[-1], 1)
         ).to(self.device)
 
         self.optimizer = optim.Adam(list(self.actor.parameters()) + list(self.critic.parameters()) + [self.log_std], lr=lr)
         self.buffer = []
+        # mean and std the critic's targets were normalized with in the last update
+        self.return_scale = (0.0, 1.0)
+
+    def hyperparameters(self):
+        return {
+            "lr": self.optimizer.param_groups[0]["lr"],
+            "gamma": self.gamma,
+            "clip_eps": self.clip_eps,
+            "ent_coef": self.ent_coef,
+            "epoch_k": self.epoch_k,
+            "batch_size": self.batch_size,
+        }
+
+    def set_hyperparameters(self, **hyperparameters):
+        for name, value in hyperparameters.items():
+            if name not in MUTABLE_HYPERPARAMETERS:
+                raise ValueError(f"Unknown hyperparameter {name}.")
+            if name == "lr":
+                for group in self.optimizer.param_groups:
+                    group["lr"] = value
+            else:
+                setattr(self, name, value)
+
+    def checkpoint(self):
+        """Everything needed to resume training: networks, optimizer state and hyperparameters."""
+        return {
+            "version": CHECKPOINT_VERSION,
+            "actor": self.actor.state_dict(),
+            "critic": self.critic.state_dict(),
+            "log_std": self.log_std.detach().cpu(),
+            "optimizer": self.optimizer.state_dict(),
+            "hyperparameters": self.hyperparameters(),
+            "hidden_sizes": list(self.hidden_sizes),
+            "return_scale": list(self.return_scale),
+        }
+
+    def save_checkpoint(self, path):
+        torch.save(self.checkpoint(), path)
+
+    def load_checkpoint(self, checkpoint, optimizer=True, hyperparameters=True):
+        """
+        Load a checkpoint (a path or a dict from checkpoint()). Actor-only
+        state dicts (model_<step>.pt) and compressed actors are accepted too.
+        """
+        if not isinstance(checkpoint, dict):
+            checkpoint = torch.load(checkpoint, map_location=self.device)
+        if "actor" not in checkpoint:
+            self.actor.load_state_dict(checkpoint)
+            return
+        if "layers" in checkpoint:
+            # a compressed actor (src.compress) replaces the network; inference only
+            from src.compress import build_actor
+            self.actor = build_actor(checkpoint["layers"]).to(self.device)
+            self.actor.load_state_dict(checkpoint["actor"])
+            return
+        hidden_sizes = tuple(checkpoint.get("hidden_sizes", self.hidden_sizes))
+        if hidden_sizes != self.hidden_sizes:
+            raise ValueError(f"Checkpoint has hidden_sizes={hidden_sizes}, this agent {self.hidden_sizes}.")
+        self.actor.load_state_dict(checkpoint["actor"])
+        self.critic.load_state_dict(checkpoint["critic"])
+        with torch.no_grad():
+            self.log_std.copy_(checkpoint["log_std"].to(self.device))
+        self.return_scale = tuple(checkpoint.get("return_scale", self.return_scale))
+        if optimizer:
+            self.optimizer.load_state_dict(checkpoint["optimizer"])
+        if hyperparameters:
+            self.set_hyperparameters(**checkpoint["hyperparameters"])
 
     def get_action(self, observation, train=True):
+        with profile("policy.forward"):
+            return self._get_action(observation, train)
+
+    def _get_action(self, observation, train=True):
         if not isinstance(observation, torch.Tensor):
             observation = torch.tensor(observation, dtype=torch.float32).to(self.device)
         if len(observation.shape) == 1:
@@ -76,30 +158,65 @@ class PPOAgent(Agent):
         return scaled_action.cpu().detach().numpy().flatten(), log_prob.cpu().detach().item(), dist.entropy().mean().item()
 
     def store(self, obs, action, reward, done, log_prob, val):
-        self.buffer.append((obs, action, reward, done, log_prob, val))
+        with profile("buffer.store"):
+            self.buffer.append((obs, action, reward, done, log_prob, val))
 
     def update(self):
-        if len(self.buffer) == 0: return
+        with profile("agent.update"):
+            return self._update()
+
+    def _update(self):
+        if len(self.buffer) == 0: return {}
         
-        # Unpack buffer
+        # Unpack buffer (stacked into arrays first; torch.tensor on a list of
+        # ndarrays copies element by element)
         obs, acts, rews, dones, old_log_probs, vals = zip(*self.buffer)
-        
-        obs = torch.tensor(obs, dtype=torch.float32).to(self.device)
+        self.buffer = []
+        return self.learn(
+            np.asarray(obs, dtype=np.float32),
+            np.asarray(acts, dtype=np.float32),
+            self.discounted_returns(rews, dones),
+            np.asarray(old_log_probs, dtype=np.float32),
+        )
+
+    def value(self, observation):
+        """Critic estimate for one observation, in return units."""
+        observation = torch.as_tensor(observation, dtype=torch.float32).to(self.device).reshape(1, -1)
+        with torch.no_grad():
+            v = self.critic(observation).item()
+        mean, std = self.return_scale
+        return v * std + mean
+
+    def discounted_returns(self, rewards, dones, last_value=0.0):
+        """
+        Reward-to-go, restarting at episode ends (arrays or sequences).
+        `last_value` continues an episode still running after the last step.
+        """
+        returns = np.empty(len(rewards), dtype=np.float32)
+        G = last_value
+        for t in reversed(range(len(rewards))):
+            if dones[t]: G = 0
+            G = rewards[t] + self.gamma * G
+            returns[t] = G
+        return returns
+
+    def learn(self, obs, acts, returns, old_log_probs):
+        """
+        PPO epochs on stacked arrays: observations [N, obs_dim], (scaled)
+        actions [N, act_dim], returns [N] and behaviour log-probs [N]. Used
+        directly by the rollout worker pool, whose slabs are already arrays.
+        """
+        with profile("agent.learn"):
+            return self._learn(obs, acts, returns, old_log_probs)
+
+    def _learn(self, obs, acts, returns, old_log_probs):
+        obs = torch.as_tensor(obs, dtype=torch.float32).to(self.device)
         # Note: We technically train on the *scaled* actions here if we stored them. 
         # Ideally PPO trains on raw, but for assignment simplicity, this is stable.
-        acts = torch.tensor(acts, dtype=torch.float32).to(self.device)
-        old_log_probs = torch.tensor(old_log_probs, dtype=torch.float32).to(self.device)
-        rews = torch.tensor(rews, dtype=torch.float32).to(self.device)
-        dones = torch.tensor(dones, dtype=torch.float32).to(self.device)
-        
-        # Returns
-        returns = []
-        G = 0
-        for r, d in zip(reversed(rews), reversed(dones)):
-            if d: G = 0
-            G = r + self.gamma * G
-            returns.insert(0, G)
-        returns = torch.tensor(returns, dtype=torch.float32).to(self.device)
+        acts = torch.as_tensor(acts, dtype=torch.float32).to(self.device)
+        old_log_probs = torch.as_tensor(old_log_probs, dtype=torch.float32).to(self.device)
+        returns = torch.as_tensor(returns, dtype=torch.float32).to(self.device)
+        self.return_scale = (returns.mean().item(), returns.std().item() + 1e-8)
         returns = (returns - returns.mean()) / (returns.std() + 1e-8)
         
         # Updates
@@ -135,5 +252,13 @@ class PPOAgent(Agent):
             self.optimizer.zero_grad()
             loss.backward()
             self.optimizer.step()
-            
-        self.buffer = []
\ No newline at end of file
+
+        # Stats of the last epoch, for telemetry
+        with torch.no_grad():
+            approx_kl = (old_log_probs - new_log_probs).mean().item()
+        return {
+            "kl": approx_kl,
+            "entropy": entropy.item(),
+            "actor_loss": actor_loss.item(),
+            "critic_loss": critic_loss.item(),
+        }
\ No newline at end of file
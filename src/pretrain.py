@@ -0,0 +1,119 @@
+import torch
+import numpy as np
+import torch.nn as nn
+import torch.optim as optim
+from loguru import logger
+
+from src.ppo import PPOAgent
+from src.dataset import TransitionDataset
+
+
+BC_EPOCHS: int=5
+CRITIC_EPOCHS: int=5
+PRETRAIN_LR: float=1e-3
+PRETRAIN_BATCH_SIZE: int=256
+
+
+def _observations(agent: PPOAgent, batch: dict[str, np.ndarray]) -> torch.Tensor:
+    return torch.as_tensor(
+        batch['observations'], dtype=torch.float32
+    ).to(agent.device)
+
+
+def behavior_cloning(
+        agent: PPOAgent,
+        dataset: TransitionDataset,
+        epochs: int=BC_EPOCHS,
+        batch_size: int=PRETRAIN_BATCH_SIZE,
+        lr: float=PRETRAIN_LR
+    ) -> list[float]:
+    '''
+    regresses the actor's mean action onto the logged actions.
+    Logged actions are in environment units, so they are mapped
+    back to the actor's [-1, 1] range first (inverse of get_action).
+    '''
+    optimizer = optim.Adam(agent.actor.parameters(), lr=lr)
+    losses = []
+    for epoch in range(epochs):
+        total, count = 0.0, 0
+        for batch in dataset.iter_batches(batch_size):
+            observations = _observations(agent, batch)
+            actions = torch.as_tensor(batch['actions']).to(agent.device)
+            raw_actions = 2 * (actions - agent.act_low) / (agent.act_high - agent.act_low) - 1
+            raw_actions = torch.clamp(raw_actions, -1.0, 1.0)
+
+            loss = nn.MSELoss()(agent.actor(observations), raw_actions)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(observations)
+            count += len(observations)
+        losses.append(total / max(count, 1))
+        logger.info(f'BC epoch {epoch + 1}/{epochs}: loss={losses[-1]:.4f}')
+    return losses
+
+
+def fit_critic(
+        agent: PPOAgent,
+        dataset: TransitionDataset,
+        epochs: int=CRITIC_EPOCHS,
+        batch_size: int=PRETRAIN_BATCH_SIZE,
+        lr: float=PRETRAIN_LR
+    ) -> list[float]:
+    '''
+    fits the critic to normalized discounted returns of the logged
+    episodes, matching the targets `PPOAgent.update` uses.
+    '''
+    returns = agent.discounted_returns(
+        dataset.field('rewards'), dataset.field('dones')
+    )
+    # PPOAgent.value undoes this normalization
+    agent.return_scale = (float(returns.mean()), float(returns.std()) + 1e-8)
+    returns = (returns - returns.mean()) / (returns.std() + 1e-8)
+
+    optimizer = optim.Adam(agent.critic.parameters(), lr=lr)
+    rng = np.random.default_rng()
+    losses = []
+    for epoch in range(epochs):
+        total, count = 0.0, 0
+        order = rng.permutation(len(dataset))
+        for start in range(0, len(order), batch_size):
+            indices = np.sort(order[start:start + batch_size])
+            batch = dataset.get(indices)
+            observations = _observations(agent, batch)
+            targets = torch.as_tensor(returns[indices]).to(agent.device)
+
+            loss = nn.MSELoss()(agent.critic(observations).squeeze(-1), targets)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(indices)
+            count += len(indices)
+        losses.append(total / max(count, 1))
+        logger.info(f'Critic epoch {epoch + 1}/{epochs}: loss={losses[-1]:.4f}')
+    return losses
+
+
+def pretrain(
+        agent: PPOAgent,
+        directory: str,
+        bc_epochs: int=BC_EPOCHS,
+        critic_epochs: int=CRITIC_EPOCHS,
+        batch_size: int=PRETRAIN_BATCH_SIZE,
+        lr: float=PRETRAIN_LR
+    ):
+    '''
+    warms up a PPOAgent from logged transitions before online training.
+    '''
+    dataset = TransitionDataset(directory)
+    expected = agent.obs_dim
+    stored = int(np.prod(dataset.index['observation_shape']))
+    if stored != expected:
+        raise ValueError(
+            f'Dataset observations have {stored} values, agent expects {expected}.'
+        )
+
+    logger.info(f'Pretraining on {len(dataset)} transitions from {directory}.')
+    agent.train()
+    behavior_cloning(agent, dataset, bc_epochs, batch_size, lr)
+    fit_critic(agent, dataset, critic_epochs, batch_size, lr)
@@ -0,0 +1,338 @@
+import os
+import glob
+import json
+import numpy as np
+import gymnasium as gym
+from typing import Callable, Iterator
+
+from deepracer_gym.config import load_module
+from deepracer_gym.track import track_geometry
+
+
+# reward_params fields that do not change within a simulator session.
+# these are logged once per file instead of once per step.
+STATIC_REWARD_PARAMS: tuple[str, ...]=(
+    'waypoints', 'track_width', 'track_length'
+)
+EPISODE_KEY: str='_episode'
+REWARD_KEY: str='_reward'
+VECTORIZED_REWARD_NAME: str='reward_function_vectorized'
+# static fields kept as one array for a whole replay; the scalar ones
+# (track_width, track_length) are per-step columns, so logs of several
+# tracks replay correctly
+SHARED_REWARD_PARAMS: tuple[str, ...]=('waypoints',)
+FLUSH_EVERY: int=1_000
+COLUMNS_CACHE_DIR: str='.columns'      # next to the logs; hidden from `logs/*` globs
+COLUMNS_CACHE_VERSION: int=2
+
+
+def load_reward_module(path: str):
+    '''
+    import a reward function file (e.g. `configs/reward_function.stage2.py`)
+    under a unique module name, so several variants can live side by side.
+    '''
+    if not os.path.exists(path):
+        raise FileNotFoundError(f'Reward function not found: {os.path.abspath(path)}')
+    module = load_module(path, prefix='reward_variant')
+
+    if not hasattr(module, 'reward_function'):
+        raise ValueError(
+            f'{path} does not define reward_function(params).'
+        )
+    return module
+
+
+def load_reward_function(path: str):
+    '''
+    returns (reward_function, reward_function_vectorized or None).
+    '''
+    module = load_reward_module(path)
+    return (
+        module.reward_function,
+        getattr(module, VECTORIZED_REWARD_NAME, None)
+    )
+
+
+def _to_builtin(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f'Cannot serialize {type(value)}.')
+
+
+class RecordRewardParams(gym.Wrapper):
+    '''
+    appends every step's `info['reward_params']` (and the reward the
+    environment returned for it) to a JSONL file for offline replay.
+    '''
+    def __init__(self, env: gym.Env, path: str, flush_every: int=FLUSH_EVERY):
+        super().__init__(env)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.flush_every = flush_every
+        self._file = open(path, 'a')
+        self._lines: list[str]=[]
+        self._static = None
+        self._episode = -1
+
+    def reset(self, **kwargs):
+        observation, info = self.env.reset(**kwargs)
+        self._episode += 1
+        return observation, info
+
+    def step(self, action):
+        observation, reward, terminated, truncated, info = self.env.step(action)
+        params = info.get('reward_params')
+        if params:
+            self._record(params, reward)
+        return observation, reward, terminated, truncated, info
+
+    def _record(self, params: dict, reward: float):
+        static = {
+            key: params[key] for key in STATIC_REWARD_PARAMS if key in params
+        }
+        if static != self._static:
+            # track changed (or first step); log it before the step records
+            self._static = static
+            self._lines.append(
+                json.dumps({'static': static}, default=_to_builtin)
+            )
+
+        record = {
+            key: value for key, value in params.items()
+            if key not in STATIC_REWARD_PARAMS
+        }
+        record[EPISODE_KEY] = self._episode
+        record[REWARD_KEY] = float(reward)
+        self._lines.append(json.dumps(record, default=_to_builtin))
+
+        if len(self._lines) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self._lines:
+            self._file.write('\n'.join(self._lines) + '\n')
+            self._file.flush()
+            self._lines = []
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        return super().close()
+
+
+def expand_paths(paths: list[str]) -> list[str]:
+    expanded = []
+    for path in paths:
+        if os.path.isdir(path):
+            expanded.extend(sorted(glob.glob(os.path.join(path, '*.jsonl'))))
+        else:
+            # only files: a glob like logs/* must not pick up directories
+            expanded.extend(
+                sorted(match for match in glob.glob(path) if os.path.isfile(match)) or [path]
+            )
+    return expanded
+
+
+def iter_reward_params(paths: list[str]) -> Iterator[dict]:
+    '''
+    yields recorded reward_params dicts, with the static fields
+    (waypoints, track_width, ...) re-attached to every step.
+    '''
+    episode_offset = 0
+    for path in expand_paths(paths):
+        static = {}
+        last_episode = -1
+        with open(path, 'r') as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if 'static' in record:
+                    static = record['static']
+                    continue
+                last_episode = max(last_episode, record[EPISODE_KEY])
+                record[EPISODE_KEY] += episode_offset
+                record.update(static)
+                yield record
+        # keep episode ids unique across files
+        episode_offset += last_episode + 1
+
+
+def _column(values: list) -> np.ndarray:
+    try:
+        column = np.asarray(values)
+    except ValueError:
+        # ragged (e.g. objects lists changing size); keep python objects
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+    return column
+
+
+def to_columns(records: list[dict]) -> dict[str, np.ndarray]:
+    '''
+    turns a list of reward_params dicts into a dict of column arrays
+    (all but the SHARED_REWARD_PARAMS).
+    '''
+    keys = set().union(*(record.keys() for record in records)) if records else set()
+    return {
+        key: _column([record.get(key) for record in records])
+        for key in sorted(keys)
+        if key not in SHARED_REWARD_PARAMS
+    }
+
+
+def _shared(records: list[dict], path: str) -> dict:
+    '''the SHARED_REWARD_PARAMS of a log; raises if the log has several.'''
+    shared = {}
+    for name in SHARED_REWARD_PARAMS:
+        values = []
+        for record in records:
+            value = record.get(name)
+            if value is not None and not any(v is value or v == value for v in values):
+                values.append(value)
+        if len(values) > 1:
+            raise ValueError(f'{path} has {len(values)} different {name}; replay one track at a time.')
+        if values:
+            shared[name] = values[0]
+    return shared
+
+
+def _cache_path(path: str) -> str:
+    directory, name = os.path.split(path)
+    return os.path.join(directory, COLUMNS_CACHE_DIR, name + '.npz')
+
+
+def load_columns(paths: list[str], cache: bool=True) -> dict[str, np.ndarray]:
+    '''
+    column arrays for all recorded steps in `paths`; static fields are
+    per-step columns too, except the waypoints, which are one array (all
+    logs must share them). Per-file columns are cached in a .columns
+    directory next to the log (keyed by its size and mtime).
+    '''
+    per_file = []
+    shared = {}
+    episode_offset = 0
+    for path in expand_paths(paths):
+        stat = os.stat(path)
+        cache_path = _cache_path(path)
+        key = np.array([stat.st_size, stat.st_mtime_ns, COLUMNS_CACHE_VERSION])
+        columns = None
+        if cache and os.path.exists(cache_path):
+            with np.load(cache_path, allow_pickle=True) as data:
+                if np.array_equal(data['__key__'], key):
+                    columns = {
+                        name: data[name] for name in data.files
+                        if name not in ('__key__', '__shared__')
+                    }
+                    file_shared = data['__shared__'].item()
+        if columns is None:
+            records = list(iter_reward_params([path]))
+            columns = to_columns(records)
+            file_shared = _shared(records, path)
+            if cache:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                np.savez(
+                    cache_path, __key__=key,
+                    __shared__=np.array(file_shared, dtype=object), **columns
+                )
+        for name, value in file_shared.items():
+            if name in shared and not np.array_equal(np.asarray(shared[name]), np.asarray(value)):
+                raise ValueError(f'The logs have different {name}; replay one track at a time.')
+            shared[name] = value
+        if EPISODE_KEY in columns and len(columns[EPISODE_KEY]):
+            columns[EPISODE_KEY] = columns[EPISODE_KEY] + episode_offset
+            episode_offset = int(columns[EPISODE_KEY].max()) + 1
+        per_file.append(columns)
+
+    keys = set().union(*(columns.keys() for columns in per_file)) if per_file else set()
+    lengths = [
+        len(columns[EPISODE_KEY]) if EPISODE_KEY in columns else 0
+        for columns in per_file
+    ]
+    merged = {}
+    for name in keys:
+        parts = [
+            columns[name] if name in columns else _column([None] * length)
+            for columns, length in zip(per_file, lengths)
+        ]
+        try:
+            merged[name] = np.concatenate(parts)
+        except ValueError:
+            merged[name] = _column([v for part in parts for v in part])
+    for name, value in shared.items():
+        merged[name] = np.asarray(value)
+    return merged
+
+
+def track_features(columns: dict[str, np.ndarray], look_ahead: float=1.0) -> dict[str, np.ndarray]:
+    '''
+    per-step track geometry for column arrays from `load_columns`: arc
+    length along the centerline, distance from it, heading error (now and
+    towards the point `look_ahead` metres ahead) and curvature ahead, from
+    one KD-tree query per step instead of a scan over the waypoints.
+    '''
+    geometry = track_geometry({
+        'waypoints': columns['waypoints'], 'track_width': float(columns['track_width'][0])
+    })
+    x, y = columns['x'].astype(float), columns['y'].astype(float)
+    heading = columns['heading'].astype(float)
+    _, _, distance = geometry.nearest_segment(x, y)
+    return {
+        'track_arc_length': geometry.arc_length_at(x, y),
+        'track_distance': distance,
+        'track_heading_error': geometry.heading_error(x, y, heading),
+        'track_heading_error_ahead': geometry.heading_error(x, y, heading, look_ahead=look_ahead),
+        'track_curvature_ahead': geometry.curvature_ahead(x, y, look_ahead),
+    }
+
+
+def episode_returns(rewards: np.ndarray, episodes: np.ndarray) -> np.ndarray:
+    _, index = np.unique(episodes, return_inverse=True)
+    return np.bincount(index, weights=rewards)
+
+
+def replay(
+        reward_function: Callable,
+        paths: list[str],
+        reward_function_vectorized: Callable | None=None
+    ) -> dict[str, np.ndarray]:
+    '''
+    scores recorded trajectories with a reward function. Uses the
+    vectorized variant over column arrays when one is provided,
+    otherwise calls `reward_function(params)` once per step.
+    '''
+    if reward_function_vectorized is not None:
+        columns = load_columns(paths)
+        rewards = np.asarray(
+            reward_function_vectorized(columns), dtype=np.float64
+        )
+        episodes = columns[EPISODE_KEY]
+    else:
+        rewards, episodes = [], []
+        for params in iter_reward_params(paths):
+            rewards.append(reward_function(params))
+            episodes.append(params[EPISODE_KEY])
+        rewards = np.asarray(rewards, dtype=np.float64)
+        episodes = np.asarray(episodes, dtype=np.int64)
+
+    return {
+        'rewards': rewards,
+        'episodes': episodes,
+        'episode_returns': episode_returns(rewards, episodes),
+    }
+
+
+def summarize(result: dict[str, np.ndarray]) -> dict[str, float]:
+    rewards, returns = result['rewards'], result['episode_returns']
+    return {
+        'steps': int(len(rewards)),
+        'episodes': int(len(returns)),
+        'mean_reward': float(rewards.mean()) if len(rewards) else float('nan'),
+        'std_reward': float(rewards.std()) if len(rewards) else float('nan'),
+        'mean_return': float(returns.mean()) if len(returns) else float('nan'),
+        'std_return': float(returns.std()) if len(returns) else float('nan'),
+    }
@@ -0,0 +1,366 @@
+import os
+import time
+import types
+import numpy as np
+import multiprocessing
+from multiprocessing import shared_memory
+from gymnasium import spaces
+from loguru import logger
+
+from deepracer_gym.config import AGENT_PARAMS_FILE, config_path, load_agent_params
+from deepracer_gym.envs.utils import make_action_space, make_observation_space
+from deepracer_gym.state import state_space
+
+
+HORIZON: int=512                # steps each worker collects per policy version
+WORKER_THREADS: int=1           # torch threads per worker; inference is tiny
+REPORT_TIMEOUT: float=600.0     # seconds to wait for a worker's rollout
+
+
+def environment_spaces(config_dir: str | None=None):
+    '''
+    flattened observation and action spaces from the agent params, so the
+    learner can build its PPOAgent without connecting to a simulator.
+    '''
+    path = config_path(config_dir, AGENT_PARAMS_FILE)
+    observation_space, _ = make_observation_space(path)
+    if load_agent_params(path).observation == 'state':
+        observation_space = state_space()
+    action_space, _ = make_action_space(path)
+    return types.SimpleNamespace(
+        observation_space=spaces.flatten_space(observation_space),
+        action_space=action_space,
+    )
+
+
+def worker_path(path: str, index: int) -> str:
+    '''worker `index`'s own copy of a per-run file: logs/r.jsonl -> logs/r.worker0.jsonl.'''
+    root, extension = os.path.splitext(path)
+    return f'{root}.worker{index}{extension}'
+
+
+class _SharedArrays:
+    '''
+    named float32 arrays laid out back to back in one SharedMemory block;
+    the creator owns (and unlinks) it, other processes attach by name.
+    '''
+    def __init__(self, shapes: dict[str, tuple[int, ...]], name: str | None=None):
+        self.shapes = shapes
+        sizes = {key: int(np.prod(shape)) * 4 for key, shape in shapes.items()}
+        self.owner = name is None
+        self.memory = shared_memory.SharedMemory(
+            name=name, create=self.owner, size=max(sum(sizes.values()), 1)
+        )
+        self.arrays: dict[str, np.ndarray]={}
+        offset = 0
+        for key, shape in shapes.items():
+            self.arrays[key] = np.ndarray(
+                shape, dtype=np.float32, buffer=self.memory.buf, offset=offset
+            )
+            offset += sizes[key]
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def close(self):
+        self.arrays.clear()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+class SharedParameters(_SharedArrays):
+    '''
+    the policy (actor weights and log_std) as one flat float32 vector plus a
+    version counter. The learner publishes after each update; workers copy
+    it into their local actor only when the version changed.
+    '''
+    def __init__(self, size: int, name: str | None=None):
+        super().__init__({'version': (1,), 'parameters': (size,)}, name=name)
+        self.local_version = -1
+
+    @staticmethod
+    def policy_parameters(agent):
+        return list(agent.actor.parameters()) + [agent.log_std]
+
+    @classmethod
+    def size_of(cls, agent) -> int:
+        return sum(p.numel() for p in cls.policy_parameters(agent))
+
+    def publish(self, agent):
+        import torch
+        with torch.no_grad():
+            vector = torch.nn.utils.parameters_to_vector(self.policy_parameters(agent))
+        self.arrays['parameters'][:] = vector.cpu().numpy()
+        self.arrays['version'][0] += 1
+
+    def pull(self, agent) -> bool:
+        version = int(self.arrays['version'][0])
+        if version == self.local_version:
+            return False
+        import torch
+        with torch.no_grad():
+            torch.nn.utils.vector_to_parameters(
+                torch.from_numpy(self.arrays['parameters'].copy()).to(agent.device),
+                self.policy_parameters(agent)
+            )
+        self.local_version = version
+        return True
+
+
+class RolloutSlab(_SharedArrays):
+    '''
+    one worker's transitions for a policy version, written in place, and
+    the observation after the last of them.
+    '''
+    def __init__(self, horizon: int, obs_dim: int, act_dim: int, name: str | None=None):
+        super().__init__({
+            'observations': (horizon, obs_dim),
+            'last_observation': (obs_dim,),
+            'actions': (horizon, act_dim),
+            'rewards': (horizon,),
+            'dones': (horizon,),
+            'log_probs': (horizon,),
+        }, name=name)
+
+
+def _worker(
+        index: int,
+        environment: str,
+        port: int,
+        config_dir: str | None,
+        seed: int,
+        horizon: int,
+        parameters_name: str,
+        parameters_size: int,
+        slab_name: str,
+        hidden_sizes: tuple[int, ...],
+        environment_options: dict,
+        action_repeat: int,
+        reward_log: str | None,
+        profile_trace: str | None,
+        reports,
+        commands
+    ):
+    '''
+    owns one DeepracerGymEnv. On every 'collect' it pulls the latest policy,
+    fills its slab with `horizon` transitions and reports the finished
+    episodes; the learner reads the slab directly, nothing is pickled.
+    `environment_options` go to make_environment (protocol, transport),
+    slab rows are decisions of `action_repeat` simulator steps and a
+    `reward_log` is written per worker (see worker_path), as is the
+    `profile_trace` of its stage timings.
+    '''
+    try:
+        import torch
+        from src.ppo import PPOAgent
+        from src.utils import set_seed, make_environment, lap_time
+        from src.reward_replay import RecordRewardParams
+        from deepracer_gym.wrappers import ActionRepeat
+        from deepracer_gym.profiling import PROFILER, profile
+
+        torch.set_num_threads(WORKER_THREADS)
+        if profile_trace:
+            PROFILER.enable()
+        set_seed(seed)
+        env = make_environment(
+            environment, seed, port=port, config_dir=config_dir, **environment_options
+        )
+        if action_repeat > 1:
+            env = ActionRepeat(env, action_repeat)
+        if reward_log:
+            env = RecordRewardParams(env, worker_path(reward_log, index))
+        # same architecture as the learner, so the shared parameters fit
+        agent = PPOAgent(env, hidden_sizes=hidden_sizes)
+        obs_dim, act_dim = agent.obs_dim, agent.act_dim
+        parameters = SharedParameters(parameters_size, name=parameters_name)
+        slab = RolloutSlab(horizon, obs_dim, act_dim, name=slab_name)
+        arrays = slab.arrays
+
+        observation, info = env.reset()
+        episode_return, episode_len = 0.0, 0
+        while commands.get() == 'collect':
+            parameters.pull(agent)
+            episodes = []
+            sim_time = 0.0
+            for t in range(horizon):
+                action, log_prob, _ = agent.get_action(observation)
+                step_start = time.perf_counter()
+                with profile('env.step'):
+                    next_observation, reward, terminated, truncated, info = env.step(action)
+                sim_time += time.perf_counter() - step_start
+                PROFILER.maybe_log()
+                done = terminated or truncated
+                arrays['observations'][t] = observation
+                arrays['actions'][t] = action
+                arrays['rewards'][t] = reward
+                arrays['dones'][t] = done
+                arrays['log_probs'][t] = log_prob
+                observation = next_observation
+                episode_return += reward
+                episode_len += 1
+                if done:
+                    episodes.append({
+                        'offset': t,
+                        'return': episode_return,
+                        'length': episode_len,
+                        'progress': info.get('reward_params', {}).get('progress'),
+                        'lap_time': lap_time(info) if 'reward_params' in info else None,
+                    })
+                    episode_return, episode_len = 0.0, 0
+                    observation, info = env.reset()
+            # the episode continues next round; the learner bootstraps it from here
+            arrays['last_observation'][:] = observation
+            reports.put(('rollout', index, episodes, sim_time / horizon))
+
+        if PROFILER.enabled:
+            PROFILER.log_summary()
+            PROFILER.dump_chrome_trace(worker_path(profile_trace, index))
+        slab.close()
+        parameters.close()
+        env.close()
+    except Exception as e:
+        logger.exception(f'Rollout worker {index} failed.')
+        reports.put(('failed', index, repr(e), None))
+
+
+class RolloutPool:
+    '''
+    rollout worker processes, one per simulator (ports `ports`). Each round
+    the learner publishes its policy into shared memory, every worker
+    collects `horizon` steps with it into its own shared slab, and the
+    learner trains on the slabs while the workers wait. Unlike threads, the
+    workers' inference and ZMQ/msgpack work run on separate cores.
+    '''
+    def __init__(
+            self,
+            agent,
+            environment: str,
+            ports: list[int],
+            config_dir: str | None=None,
+            horizon: int=HORIZON,
+            seed: int=0,
+            environment_options: dict | None=None,
+            action_repeat: int=1,
+            reward_log: str | None=None,
+            profile_trace: str | None=None
+        ):
+        self.horizon = horizon
+        self.parameters = SharedParameters(SharedParameters.size_of(agent))
+        self.slabs = [
+            RolloutSlab(horizon, agent.obs_dim, agent.act_dim) for _ in ports
+        ]
+        context = multiprocessing.get_context('spawn')
+        self.reports = context.Queue()
+        self.commands = [context.Queue() for _ in ports]
+        self.processes = []
+        for index, (port, slab) in enumerate(zip(ports, self.slabs)):
+            process = context.Process(
+                target=_worker,
+                args=(
+                    index, environment, port, config_dir, seed + index, horizon,
+                    self.parameters.name, self.parameters.arrays['parameters'].size,
+                    slab.name, agent.hidden_sizes, environment_options or {}, action_repeat, reward_log, profile_trace,
+                    self.reports, self.commands[index]
+                ),
+                name=f'rollout-worker-{index}',
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+        logger.info(f'Started {len(ports)} rollout workers on ports {ports}.')
+
+    def collect(self, agent) -> list[tuple[dict[str, np.ndarray], list[dict], float]]:
+        '''
+        one round with the agent's current policy: returns per worker its
+        slab arrays (views; valid until the next collect), finished episodes
+        and mean simulator latency.
+        '''
+        self.parameters.publish(agent)
+        for commands in self.commands:
+            commands.put('collect')
+        rollouts = [None] * len(self.slabs)
+        for _ in self.slabs:
+            kind, index, payload, sim_latency = self.reports.get(timeout=REPORT_TIMEOUT)
+            if kind == 'failed':
+                raise RuntimeError(f'Rollout worker {index} failed: {payload}')
+            rollouts[index] = (self.slabs[index].arrays, payload, sim_latency)
+        return rollouts
+
+    def close(self):
+        for commands in self.commands:
+            commands.put('stop')
+        for process in self.processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+        for slab in self.slabs:
+            slab.close()
+        self.parameters.close()
+
+
+def slab_returns(agent, arrays: dict[str, np.ndarray]) -> np.ndarray:
+    '''
+    returns of one worker's slab. A slab ends after `horizon` steps, not at
+    an episode end, so an unfinished last episode is bootstrapped with the
+    critic's value of the observation after it (the serial loop only
+    updates at episode ends and never needs this).
+    '''
+    last_value = 0.0 if arrays['dones'][-1] else agent.value(arrays['last_observation'])
+    return agent.discounted_returns(arrays['rewards'], arrays['dones'], last_value)
+
+
+def train_parallel(agent, pool: RolloutPool, total_timesteps: int, metrics, save, dataset=None):
+    '''
+    learner loop over a RolloutPool: returns are computed per worker (each
+    slab is a contiguous trajectory, see slab_returns), then all slabs train one PPO update.
+    `save(step)` is called whenever a 5000-step boundary is crossed. Slabs
+    are appended to `dataset` (a writable TransitionDataset) if given, one
+    worker's trajectory after the other.
+    '''
+    step = 0
+    total_episodes = 0
+    start_time = time.time()
+    while step < total_timesteps:
+        rollout_start = time.perf_counter()
+        rollouts = pool.collect(agent)
+        rollout_time = time.perf_counter() - rollout_start
+
+        for index, (arrays, episodes, sim_latency) in enumerate(rollouts):
+            for episode in episodes:
+                total_episodes += 1
+                metrics.episode(
+                    step + index * pool.horizon + episode.pop('offset') + 1,
+                    sim_latency=sim_latency,
+                    **episode,
+                )
+            if dataset is not None:
+                for t in range(pool.horizon):
+                    dataset.append(
+                        arrays['observations'][t], arrays['actions'][t],
+                        arrays['rewards'][t], arrays['dones'][t]
+                    )
+        if dataset is not None:
+            # readable by pretrain even if the run is killed
+            dataset.flush()
+        previous, step = step, step + pool.horizon * len(rollouts)
+
+        update_start = time.perf_counter()
+        stats = agent.learn(
+            np.concatenate([arrays['observations'] for arrays, _, _ in rollouts]),
+            np.concatenate([arrays['actions'] for arrays, _, _ in rollouts]),
+            np.concatenate([slab_returns(agent, arrays) for arrays, _, _ in rollouts]),
+            np.concatenate([arrays['log_probs'] for arrays, _, _ in rollouts]),
+        )
+        metrics.update(
+            step, update_time=time.perf_counter() - update_start,
+            steps_per_sec=pool.horizon * len(rollouts) / rollout_time, **stats
+        )
+        logger.info(
+            f'Step={step} | Episodes={total_episodes} | '
+            f'{pool.horizon * len(rollouts) / rollout_time:.1f} steps/s | '
+            f'Elapsed={round(time.time() - start_time)}s'
+        )
+        if step // 5000 > previous // 5000 or step >= total_timesteps:
+            save(step)
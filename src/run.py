@@ -1,3 +1,4 @@
+import os
 import yaml
 import time
 import torch
@@ -5,40 +6,136 @@ import datetime
 import numpy as np
 from loguru import logger
 from munch import munchify
-from torch.utils.tensorboard import SummaryWriter
 
-from src.ppo import PPOAgent
-from src.utils import device, set_seed, make_environment
+from src.ppo import PPOAgent, HIDDEN_SIZES
+from src.utils import set_seed, make_environment, lap_time
+from src.reward_replay import RecordRewardParams
+from src.dataset import RecordTransitions, TransitionDataset
+from src.pretrain import pretrain
+from src.telemetry import MetricsSink
+from deepracer_gym.profiling import PROFILER, profile
+from deepracer_gym.wrappers import ActionRepeat
+from deepracer_gym.config import HYPER_PARAMS_FILE, materialize
 
-DEVICE = device()
 HYPER_PARAMS_PATH = 'configs/hyper_params.yaml'
 
-def run(hparams):
+def run_parallel(args, run_name, config_dir, metrics):
+    # one rollout process per simulator on ports port, port + 1, ...;
+    # the learner here never connects to a simulator itself
+    from src.rollout import RolloutPool, environment_spaces, train_parallel
+    from deepracer_gym.envs.deepracer_gym import port as default_port
+
+    spaces = environment_spaces(config_dir)
+    agent = PPOAgent(
+        spaces,
+        lr=args.lr,
+        gamma=args.get("gamma", 0.99),
+        clip_eps=args.get("clip_eps", 0.2),
+        ent_coef=args.get("ent_coef", 0.01),
+        epoch_k=args.get("epoch_k", 10),
+        batch_size=args.get("batch_size", 64),
+        hidden_sizes=args.get("hidden_sizes", HIDDEN_SIZES),
+    )
+    if args.get("pretrain_dataset"):
+        pretrain(
+            agent, args.pretrain_dataset,
+            bc_epochs=args.get("pretrain_bc_epochs", 5),
+            critic_epochs=args.get("pretrain_critic_epochs", 5),
+        )
+    base_port = int(args.get("port") or default_port)
+    pool = RolloutPool(
+        agent, args.environment,
+        ports=[base_port + i for i in range(args.num_workers)],
+        config_dir=config_dir,
+        horizon=args.get("rollout_horizon", 512),
+        seed=args.seed,
+        environment_options=dict(
+            compact=args.get("compact_protocol", False),
+            image_codec=args.get("image_codec"),
+            transport=args.get("transport", "tcp"),
+        ),
+        # workers step with ActionRepeat; steps below count decisions
+        action_repeat=args.get("action_repeat", 1),
+        # one file per worker, next to the given path
+        reward_log=args.get("reward_log"),
+        # workers time their own env steps; the learner writes trace.json
+        profile_trace=f"runs/{run_name}/trace.json" if args.get("profile") else None,
+    )
+    # the learner sees every transition, so it keeps the one dataset
+    dataset = (
+        TransitionDataset.for_environment(args.dataset_dir, spaces)
+        if args.get("dataset_dir") else None
+    )
+
+    def save(step):
+        save_path = f"runs/{run_name}/model_{step}.pt"
+        torch.save(agent.actor.state_dict(), save_path)
+        agent.save_checkpoint(f"runs/{run_name}/checkpoint.pt")
+        logger.info(f"💾 Model weights saved to {save_path}")
+
+    logger.info(f"🚀 Starting PPO Training for {args.total_timesteps} steps on {args.num_workers} workers...")
+    try:
+        train_parallel(agent, pool, args.total_timesteps, metrics, save, dataset)
+    finally:
+        pool.close()
+        if dataset is not None:
+            dataset.close()
+    logger.info("✅ Training Complete.")
+
+def run_serial(args, run_name, config_dir, metrics):
     start_time = time.time()
-    
-    with open(HYPER_PARAMS_PATH, 'r') as file:
-        default_hparams = yaml.safe_load(file)
-    final_hparams = default_hparams.copy()
-    final_hparams.update(hparams)
-    args = munchify(final_hparams)
-    
-    run_name = f"{args.environment}__{args.experiment_name}__{args.seed}__{int(time.time())}"
-    writer = SummaryWriter(f"runs/{run_name}")
-    
-    set_seed(args.seed)
-    env = make_environment(args.environment)
-    agent = PPOAgent(env, lr=args.lr)
+    # one simulator per concurrent run (sweeps, PBT); default port otherwise
+    simulator = {"port": int(args.port)} if args.get("port") else {}
+    env = make_environment(
+        args.environment,
+        **simulator,
+        compact=args.get("compact_protocol", False),
+        image_codec=args.get("image_codec"),
+        transport=args.get("transport", "tcp"),
+        config_dir=config_dir,
+    )
+    if args.get("action_repeat", 1) > 1:
+        # the simulator repeats each action; steps below count decisions
+        env = ActionRepeat(env, args.action_repeat)
+    if args.get("reward_log"):
+        # keep reward_params for offline reward design (src.cli replay)
+        env = RecordRewardParams(env, args.reward_log)
+    if args.get("dataset_dir"):
+        # keep transitions for offline pretraining on later tracks
+        env = RecordTransitions(env, args.dataset_dir)
+    agent = PPOAgent(
+        env,
+        lr=args.lr,
+        gamma=args.get("gamma", 0.99),
+        clip_eps=args.get("clip_eps", 0.2),
+        ent_coef=args.get("ent_coef", 0.01),
+        epoch_k=args.get("epoch_k", 10),
+        batch_size=args.get("batch_size", 64),
+        hidden_sizes=args.get("hidden_sizes", HIDDEN_SIZES),
+    )
+    if args.get("pretrain_dataset"):
+        pretrain(
+            agent, args.pretrain_dataset,
+            bc_epochs=args.get("pretrain_bc_epochs", 5),
+            critic_epochs=args.get("pretrain_critic_epochs", 5),
+        )
     
     observation, info = env.reset()
     episode_return = 0
     episode_len = 0
     total_episodes = 0
+    episode_start = time.perf_counter()
+    sim_time = 0.0
     
     logger.info(f"🚀 Starting PPO Training for {args.total_timesteps} steps...")
 
     for step in range(1, args.total_timesteps + 1):
         action, log_prob, _ = agent.get_action(observation)
-        next_observation, reward, terminated, truncated, info = env.step(action)
+        step_start = time.perf_counter()
+        with profile("env.step"):
+            next_observation, reward, terminated, truncated, info = env.step(action)
+        sim_time += time.perf_counter() - step_start
+        PROFILER.maybe_log()
         agent.store(observation, action, reward, terminated or truncated, log_prob, 0)
         
         observation = next_observation
@@ -49,20 +146,82 @@ def run(hparams):
             total_episodes += 1
             et = str(datetime.timedelta(seconds=round(time.time()-start_time)))
             logger.info(f"Step={step} | Ep={total_episodes} | Return={episode_return:.2f} | Elapsed={et}")
-            writer.add_scalar('charts/episodic_return', episode_return, step)
+            metrics.episode(
+                step,
+                **{"return": episode_return},
+                length=episode_len,
+                progress=info.get("reward_params", {}).get("progress"),
+                lap_time=lap_time(info) if "reward_params" in info else None,
+                steps_per_sec=episode_len / (time.perf_counter() - episode_start),
+                sim_latency=sim_time / episode_len,
+            )
             
+            reset_start = time.perf_counter()
             observation, info = env.reset()
+            metrics.log(
+                "reset", step,
+                round_trips=info.get("reset_round_trips"),
+                reset_time=time.perf_counter() - reset_start,
+            )
             episode_return = 0
             episode_len = 0
-            agent.update()
+            update_start = time.perf_counter()
+            stats = agent.update()
+            metrics.update(step, update_time=time.perf_counter() - update_start, **stats)
+            episode_start = time.perf_counter()
+            sim_time = 0.0
 
         # --- FIX: SAVE STATE_DICT ONLY ---
         if step % 5000 == 0 or step == args.total_timesteps:
             save_path = f"runs/{run_name}/model_{step}.pt"
             # We save the actor network state, which is all we need for evaluation
             torch.save(agent.actor.state_dict(), save_path)
+            # full checkpoint (critic, optimizer, hyperparameters) to resume from
+            agent.save_checkpoint(f"runs/{run_name}/checkpoint.pt")
             logger.info(f"💾 Model weights saved to {save_path}")
 
     env.close()
-    writer.close()
-    logger.info("✅ Training Complete.")
\ No newline at end of file
+    logger.info("✅ Training Complete.")
+
+def run(hparams):
+    # tensorboard is slow to import; only training needs it
+    from torch.utils.tensorboard import SummaryWriter
+
+    # either an already materialized config directory (e.g. one the simulator
+    # mounts) or the variants to copy into runs/<run_name>/configs
+    config_dir = hparams.get("config_dir")
+    config_sources = hparams.get("config_sources") or {}
+    if config_dir:
+        hyper_params_path = os.path.join(config_dir, HYPER_PARAMS_FILE)
+    else:
+        hyper_params_path = config_sources.get("hyper_params") or HYPER_PARAMS_PATH
+    
+    with open(hyper_params_path, 'r') as file:
+        default_hparams = yaml.safe_load(file)
+    final_hparams = default_hparams.copy()
+    final_hparams.update(hparams)
+    args = munchify(final_hparams)
+    
+    run_name = f"{args.environment}__{args.experiment_name}__{args.seed}__{int(time.time())}"
+    if not config_dir:
+        config_dir = materialize(f"runs/{run_name}/configs", **config_sources)
+    writer = SummaryWriter(f"runs/{run_name}")
+    metrics = MetricsSink(
+        f"runs/{run_name}", writer=writer, parquet=args.get("metrics_parquet", False)
+    )
+    
+    if args.get("profile"):
+        PROFILER.enable()
+    set_seed(args.seed)
+    try:
+        if args.get("num_workers", 1) > 1:
+            run_parallel(args, run_name, config_dir, metrics)
+        else:
+            run_serial(args, run_name, config_dir, metrics)
+    finally:
+        # both paths, and on failure too: what was timed is still useful
+        if PROFILER.enabled:
+            PROFILER.log_summary()
+            PROFILER.dump_chrome_trace(f"runs/{run_name}/trace.json")
+        metrics.close()
+        writer.close()
\ No newline at end of file
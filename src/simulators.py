@@ -0,0 +1,559 @@
+import os
+import json
+import time
+import shlex
+import shutil
+import getpass
+import threading
+import subprocess
+import zmq
+import msgpack
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from loguru import logger
+
+from deepracer_gym.envs.utils import get_host_name, string_to_port
+
+
+HOST: str='127.0.0.1'
+DEFAULT_NAME: str='deepracer'    # the single instance of scripts/start_deepracer.sh
+BASE_IMAGE: str='uzairakbar/deepracer:v0'
+IMAGE: str='deepracer'
+STARTUP_TIMEOUT: float=600.0    # seconds for a simulator to answer its first handshake
+PROBE_TIMEOUT: float=30.0       # a used simulator may first finish its episode
+POLL_INTERVAL: float=2.0
+MAX_RESTARTS: int=3             # per instance, before it is given up on
+STOP_TIMEOUT: float=30.0
+
+
+def _user() -> str:
+    return os.environ.get('USER') or getpass.getuser()
+
+
+def _scratch_dir() -> str:
+    # start_deepracer.sh keeps the image in ~/scratch on PACE ICE nodes
+    if get_host_name().endswith('.pace.gatech.edu'):
+        return os.path.join(os.path.expanduser('~'), 'scratch')
+    return os.getcwd()
+
+
+class HandshakeProbe:
+    '''
+    the gym client's first message ({'ready': 1}), kept outstanding until
+    the simulator answers with an observation. A simulator answering it is
+    ready for the next client, whose own 'ready' restarts the episode.
+    '''
+    def __init__(self, port: int, host: str=HOST):
+        self.socket = zmq.Context.instance().socket(zmq.REQ)
+        self.socket.set(zmq.LINGER, 0)
+        self.socket.connect(f'tcp://{host}:{port}')
+        self.socket.send(msgpack.packb({'ready': 1}))
+
+    def answered(self, timeout: float=0.0) -> bool:
+        if self.socket.poll(int(timeout * 1000), zmq.POLLIN):
+            self.socket.recv()
+            return True
+        return False
+
+    def close(self):
+        self.socket.close()
+
+
+def probe(port: int, host: str=HOST, timeout: float=PROBE_TIMEOUT) -> bool:
+    handshake = HandshakeProbe(port, host)
+    try:
+        return handshake.answered(timeout)
+    finally:
+        handshake.close()
+
+
+@dataclass
+class Instance:
+    '''one simulator of a pool.'''
+    index: int
+    name: str
+    port: int                   # gym port
+    gazebo_port: int
+    ros_port: int
+    status: str='stopped'       # stopped | starting | ready | leased | idle | failed
+    restarts: int=0
+    started_at: float=0.0
+    handle: object=None         # backend state, e.g. a Popen
+    probe: HandshakeProbe | None=field(default=None, repr=False)
+
+    def environment(self) -> dict[str, str]:
+        return {
+            'GYM_PORT': str(self.port),
+            'GAZEBO_MASTER_URI': f'http://localhost:{self.gazebo_port}',
+            'ROS_MASTER_URI': f'http://localhost:{self.ros_port}',
+        }
+
+    def record(self) -> dict:
+        return {
+            'index': self.index, 'name': self.name, 'port': self.port,
+            'gazebo_port': self.gazebo_port, 'ros_port': self.ros_port,
+            'status': self.status, 'restarts': self.restarts,
+        }
+
+
+# --- backends ---
+
+class Backend:
+    '''
+    starts and stops simulators. Options are those of start_deepracer.sh:
+    config_dir (-c, mounted as /configs), cpus (-C), memory (-M),
+    evaluation (-E), world_name (-W) and share_shm (-S).
+    '''
+    name: str='backend'
+
+    def __init__(
+            self,
+            config_dir: str='configs',
+            cpus: int | None=None,
+            memory: str | None=None,
+            evaluation: bool=False,
+            world_name: str | None=None,
+            share_shm: bool=False
+        ):
+        self.config_dir = os.path.abspath(config_dir)
+        self.cpus = cpus or 12
+        self.memory = memory or '50g'
+        self.evaluation = evaluation
+        self.world_name = world_name
+        self.share_shm = share_shm
+
+    def _simulator_environment(self) -> dict[str, str]:
+        return {
+            'EVALUATION': 'True' if self.evaluation else '',
+            'EVAL_WORLD_NAME': self.world_name or '',
+        }
+
+    def prepare(self):
+        '''one-off work before the first start, e.g. building an image.'''
+
+    def start(self, instance: Instance):
+        raise NotImplementedError
+
+    def stop(self, instance: Instance):
+        raise NotImplementedError
+
+    def alive(self, instance: Instance) -> bool:
+        raise NotImplementedError
+
+
+class ApptainerBackend(Backend):
+    '''`apptainer instance run` of deepracer.sif, as start_deepracer.sh.'''
+    name: str='apptainer'
+
+    def __init__(self, *args, rebuild: bool=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rebuild = rebuild
+        self.image = os.path.join(_scratch_dir(), f'{IMAGE}.sif')
+
+    def prepare(self):
+        # concurrent simulators share one image; only build it once
+        if os.path.exists(self.image) and not self.rebuild:
+            return
+        logger.info(f'Building {self.image}.')
+        subprocess.run(['apptainer', 'pull', 'deepracer_base.sif', f'docker://{BASE_IMAGE}'], check=True)
+        subprocess.run(
+            ['apptainer', 'build', '--ignore-fakeroot-command', self.image, 'deepracer.def'],
+            input='no\n' * 16, text=True, check=True
+        )
+
+    def _overlay(self, instance: Instance) -> str:
+        return os.path.join('/tmp', f'{instance.name}_overlay')
+
+    def start(self, instance: Instance):
+        overlay = self._overlay(instance)
+        shutil.rmtree(overlay, ignore_errors=True)
+        os.makedirs(overlay)
+        environment = {**self._simulator_environment(), **instance.environment()}
+        command = [
+            'apptainer', 'instance', 'run',
+            '--no-mount', f'{os.path.expanduser("~")},/tmp,/dev,/etc/hosts,/etc/localtime,/proc,/sys,/var/tmp',
+            '--bind', f'{self.config_dir}:/configs',
+        ]
+        if self.share_shm:
+            command += ['--bind', '/dev/shm:/dev/shm']
+        command += [
+            '--overlay', f'{overlay}/:/.',
+            '--env', ','.join(f'{key}={value}' for key, value in environment.items()),
+            self.image, instance.name,
+            f'--cpus={self.cpus}', f'--memory={self.memory}',
+        ]
+        subprocess.run(command, check=True)
+
+    def stop(self, instance: Instance):
+        subprocess.run(
+            ['apptainer', 'instance', 'stop', instance.name],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        shutil.rmtree(self._overlay(instance), ignore_errors=True)
+
+    def alive(self, instance: Instance) -> bool:
+        result = subprocess.run(
+            ['apptainer', 'instance', 'list', '--json', instance.name],
+            capture_output=True, text=True
+        )
+        try:
+            instances = json.loads(result.stdout).get('instances') or []
+        except json.JSONDecodeError:
+            return False
+        return any(i.get('instance') == instance.name for i in instances)
+
+
+class DockerBackend(Backend):
+    '''`docker run` of the deepracer image, as start_deepracer.sh.'''
+    name: str='docker'
+
+    def prepare(self):
+        exists = lambda image: subprocess.run(
+            ['docker', 'image', 'inspect', image],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ).returncode == 0
+        if not exists(f'{IMAGE}:latest'):
+            if not exists(BASE_IMAGE):
+                subprocess.run(['docker', 'pull', BASE_IMAGE], check=True)
+            subprocess.run(['docker', 'build', '-t', IMAGE, '.'], check=True)
+
+    def start(self, instance: Instance):
+        # Gazebo and ROS stay inside the container's network; only the gym port is published
+        command = [
+            'docker', 'run', '--rm', '--detach',
+            f'--name={instance.name}',
+            '-v', f'{self.config_dir}:/configs:ro',
+        ]
+        if self.share_shm:
+            command += ['-v', '/dev/shm:/dev/shm']
+        # the server listens on, and names its /dev/shm frame ring after,
+        # GYM_PORT; one port per instance keeps shared rings apart
+        command += ['-p', f'{instance.port}:{instance.port}', '-e', f'GYM_PORT={instance.port}']
+        for key, value in self._simulator_environment().items():
+            command += ['-e', f'{key}={value}']
+        command += [f'--cpus={self.cpus}', f'--memory={self.memory}', IMAGE]
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+
+    def stop(self, instance: Instance):
+        subprocess.run(
+            ['docker', 'stop', instance.name],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+
+    def alive(self, instance: Instance) -> bool:
+        result = subprocess.run(
+            ['docker', 'inspect', '-f', '{{.State.Running}}', instance.name],
+            capture_output=True, text=True
+        )
+        return result.stdout.strip() == 'true'
+
+
+class LocalBackend(Backend):
+    '''
+    a local process per instance, e.g. a stand-in server for tests.
+    `command` may use {port}, {name} and {config_dir}; the process also
+    gets GYM_PORT, GAZEBO_MASTER_URI, ROS_MASTER_URI, EVALUATION and
+    EVAL_WORLD_NAME in its environment. Output goes to log_dir/<name>.log.
+    '''
+    name: str='local'
+
+    def __init__(self, command: str | list[str], *args, log_dir: str | None=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.command = shlex.split(command) if isinstance(command, str) else list(command)
+        self.log_dir = log_dir
+
+    def start(self, instance: Instance):
+        command = [
+            part.format(port=instance.port, name=instance.name, config_dir=self.config_dir)
+            for part in self.command
+        ]
+        environment = {**os.environ, **self._simulator_environment(), **instance.environment()}
+        log = subprocess.DEVNULL
+        if self.log_dir:
+            os.makedirs(self.log_dir, exist_ok=True)
+            log = open(os.path.join(self.log_dir, f'{instance.name}.log'), 'a')
+        instance.handle = subprocess.Popen(
+            command, env=environment, stdout=log, stderr=subprocess.STDOUT
+        )
+        if log is not subprocess.DEVNULL:
+            log.close()
+
+    def stop(self, instance: Instance):
+        process = instance.handle
+        if process is None or process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(timeout=STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def alive(self, instance: Instance) -> bool:
+        return instance.handle is not None and instance.handle.poll() is None
+
+
+class ExternalBackend(Backend):
+    '''simulators started by someone else; only their handshake is checked.'''
+    name: str='external'
+
+    def start(self, instance: Instance):
+        pass
+
+    def stop(self, instance: Instance):
+        pass
+
+    def alive(self, instance: Instance) -> bool:
+        return True
+
+
+BACKENDS: dict[str, type]={
+    backend.name: backend
+    for backend in (ApptainerBackend, DockerBackend, LocalBackend, ExternalBackend)
+}
+
+
+def make_backend(
+        name: str='auto',
+        command: str | list[str] | None=None,
+        log_dir: str | None=None,
+        **options
+    ) -> Backend:
+    '''
+    `auto` picks Apptainer, else Docker, like start_deepracer.sh. `command`
+    and `log_dir` are only used by the local backend.
+    '''
+    if name == 'auto':
+        name = next((n for n in ('apptainer', 'docker') if shutil.which(n)), None)
+        if name is None:
+            raise RuntimeError('Neither Docker nor Apptainer is installed.')
+    if name not in BACKENDS:
+        raise ValueError(f'Simulator backend can only be one of {("auto", *BACKENDS)}. Got {name} instead.')
+    if name == 'local':
+        if not command:
+            raise ValueError('The local simulator backend needs a command.')
+        return LocalBackend(command, log_dir=log_dir, **options)
+    return BACKENDS[name](**options)
+
+
+# --- pool ---
+
+class SimulatorPool:
+    '''
+    `size` simulators with distinct gym, Gazebo and ROS ports. Instance i
+    is named <name>_<i> (just <name> for a single one) and listens on
+    base_port + i (default: string_to_port($USER), as start_deepracer.sh);
+    its Gazebo/ROS ports are hashed from the name like the script does.
+
+    An instance is ready once it answers a gym handshake. Instances that
+    die, or don't answer within startup_timeout, are restarted (at most
+    max_restarts times). acquire()/lease() hand out a ready instance to one
+    user at a time; a released instance is handshaken again before its
+    next lease.
+    '''
+    def __init__(
+            self,
+            size: int,
+            backend: Backend | str='auto',
+            name: str=DEFAULT_NAME,
+            base_port: int | None=None,
+            host: str=HOST,
+            startup_timeout: float=STARTUP_TIMEOUT,
+            max_restarts: int=MAX_RESTARTS,
+            **backend_options
+        ):
+        if size < 1:
+            raise ValueError('A simulator pool needs at least one instance.')
+        self.backend = backend if isinstance(backend, Backend) else make_backend(backend, **backend_options)
+        self.host = host
+        self.startup_timeout = startup_timeout
+        self.max_restarts = max_restarts
+        self._lock = threading.RLock()
+
+        user = _user()
+        base_port = base_port or string_to_port(user)
+        names = [name] if size == 1 else [f'{name}_{index}' for index in range(size)]
+        taken = {base_port + index for index in range(size)}
+        self.instances = []
+        for index, instance_name in enumerate(names):
+            suffix = '' if instance_name == DEFAULT_NAME else f'_{instance_name}'
+            self.instances.append(Instance(
+                index, instance_name, base_port + index,
+                gazebo_port=self._distinct_port(f'GAZEBO_{user}{suffix}', taken),
+                ros_port=self._distinct_port(f'ROS_{user}{suffix}', taken),
+            ))
+
+    @staticmethod
+    def _distinct_port(key: str, taken: set[int]) -> int:
+        # the script's hash, re-salted in the rare case two instances collide
+        port, salt = string_to_port(key), 0
+        while port in taken:
+            salt += 1
+            port = string_to_port(f'{key}#{salt}')
+        taken.add(port)
+        return port
+
+    @property
+    def ports(self) -> list[int]:
+        return [instance.port for instance in self.instances]
+
+    # --- lifecycle ---
+
+    def _launch(self, instance: Instance):
+        logger.info(
+            f'Starting simulator {instance.name} ({self.backend.name}) on gym port {instance.port}, '
+            f'Gazebo {instance.gazebo_port}, ROS {instance.ros_port}.'
+        )
+        self._close_probe(instance)
+        try:
+            self.backend.start(instance)
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.error(f'Simulator {instance.name} failed to start: {e}')
+        instance.status = 'starting'
+        instance.started_at = time.time()
+        # sent now and answered once the simulator is up
+        instance.probe = HandshakeProbe(instance.port, self.host)
+
+    def _close_probe(self, instance: Instance):
+        if instance.probe is not None:
+            instance.probe.close()
+            instance.probe = None
+
+    def start(self, wait: bool=True) -> 'SimulatorPool':
+        self.backend.prepare()
+        with self._lock:
+            for instance in self.instances:
+                self._launch(instance)
+        if wait:
+            self.wait_ready()
+        return self
+
+    def restart(self, instance: Instance, reason: str=''):
+        with self._lock:
+            self._close_probe(instance)
+            self.backend.stop(instance)
+            if instance.restarts >= self.max_restarts:
+                instance.status = 'failed'
+                logger.error(f'Simulator {instance.name} {reason}; giving up after {instance.restarts} restarts.')
+                return
+            instance.restarts += 1
+            logger.warning(f'Simulator {instance.name} {reason}; restarting ({instance.restarts}/{self.max_restarts}).')
+            self._launch(instance)
+
+    def close(self):
+        with self._lock:
+            for instance in self.instances:
+                self._close_probe(instance)
+                if instance.status != 'stopped':
+                    self.backend.stop(instance)
+                    instance.status = 'stopped'
+        logger.info(f'Stopped {len(self.instances)} simulators.')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- health ---
+
+    def poll(self):
+        '''
+        advances starting instances to ready and restarts dead or stuck
+        ones. Leased instances are left to their user: a handshake would
+        take over its connection.
+        '''
+        with self._lock:
+            for instance in self.instances:
+                if instance.status in ('stopped', 'failed', 'leased'):
+                    continue
+                if not self.backend.alive(instance):
+                    self.restart(instance, 'is not running')
+                elif instance.status == 'starting':
+                    if instance.probe.answered():
+                        self._close_probe(instance)
+                        instance.status = 'ready'
+                        logger.info(
+                            f'Simulator {instance.name} ready on port {instance.port} '
+                            f'after {time.time() - instance.started_at:.0f} s.'
+                        )
+                    elif time.time() - instance.started_at > self.startup_timeout:
+                        self.restart(instance, f'did not answer within {self.startup_timeout:.0f} s')
+
+    def wait_ready(self, timeout: float | None=None) -> list[Instance]:
+        '''polls until no instance is starting; raises if none is usable.'''
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            self.poll()
+            if not any(i.status == 'starting' for i in self.instances):
+                break
+            if deadline is not None and time.time() >= deadline:
+                break
+            time.sleep(POLL_INTERVAL)
+        ready = [i for i in self.instances if i.status in ('ready', 'idle', 'leased')]
+        if not ready:
+            raise RuntimeError(f'None of the {len(self.instances)} simulators came up.')
+        return ready
+
+    # --- leases ---
+
+    def acquire(self, timeout: float | None=None) -> Instance | None:
+        '''
+        leases a ready instance, waiting up to `timeout` seconds (forever if
+        None); returns None on timeout.
+        '''
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            self.poll()
+            with self._lock:
+                # handshaken instances first; released ones are handshaken again
+                candidates = sorted(
+                    (i for i in self.instances if i.status in ('ready', 'idle')),
+                    key=lambda i: i.status != 'ready'
+                )
+                for instance in candidates:
+                    if instance.status == 'idle' and not probe(instance.port, self.host):
+                        self.restart(instance, 'did not answer the handshake')
+                        continue
+                    instance.status = 'leased'
+                    return instance
+                if all(i.status in ('failed', 'stopped') for i in self.instances):
+                    raise RuntimeError('No simulator in the pool is usable.')
+            if deadline is not None and time.time() >= deadline:
+                return None
+            time.sleep(POLL_INTERVAL)
+
+    def release(self, instance: Instance, healthy: bool=True):
+        '''
+        returns a lease. The instance is handshaken before its next lease;
+        one its user found unhealthy is restarted right away.
+        '''
+        with self._lock:
+            if instance.status != 'leased':
+                return
+            if healthy:
+                instance.status = 'idle'
+            else:
+                self.restart(instance, 'was released as unhealthy')
+
+    @contextmanager
+    def lease(self, timeout: float | None=None):
+        instance = self.acquire(timeout)
+        if instance is None:
+            raise TimeoutError(f'No simulator became free within {timeout} s.')
+        try:
+            yield instance
+        finally:
+            self.release(instance)
+
+    def supervise(self, interval: float=POLL_INTERVAL * 5):
+        '''keeps the pool alive (restarting dead instances) until interrupted.'''
+        try:
+            while any(i.status != 'failed' for i in self.instances):
+                self.poll()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+    def records(self) -> list[dict]:
+        return [instance.record() for instance in self.instances]
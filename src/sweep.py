@@ -0,0 +1,399 @@
+import os
+import sys
+import glob
+import json
+import math
+import time
+import yaml
+import random
+import itertools
+import subprocess
+from dataclasses import dataclass, field
+from loguru import logger
+from typing import Callable
+
+from deepracer_gym.config import HYPER_PARAMS_FILE, materialize
+from src.telemetry import METRICS_FILE
+from src.simulators import Instance, SimulatorPool
+
+
+SWEEPS_DIR: str='sweeps'
+RUNS_DIR: str='runs'
+METHODS: tuple[str, ...]=('grid', 'random', 'bayes')
+REWARD_PARAM: str='reward'      # search-space key selecting a reward variant
+SCORE_WINDOW: int=20            # episodes averaged into a trial's score
+POLL_INTERVAL: float=10.0       # seconds between metric polls
+ETA: int=3                      # successive halving keeps the top 1/ETA at each rung
+
+
+# --- search space ---
+
+def load_search_space(path: str) -> dict:
+    '''
+    YAML search space, e.g.
+
+        method: random          # grid | random | bayes
+        trials: 16              # not needed for grid
+        params:
+          lr: {log_uniform: [1.0e-5, 1.0e-3]}
+          ent_coef: {values: [0.0, 0.01, 0.05]}
+          clip_eps: {uniform: [0.1, 0.3]}
+          epoch_k: {int: [3, 10]}
+          reward: {values: [baseline, stage2]}
+
+    keys are hyper_params.yaml entries, plus `reward` for reward variants;
+    plain values are fixed for every trial.
+    '''
+    with open(path, 'r') as file:
+        space = yaml.safe_load(file)
+    method = space.get('method', 'random')
+    if method not in METHODS:
+        raise ValueError(f'method can only be one of {METHODS}. Got {method} instead.')
+    params = space.get('params') or {}
+    for name, spec in params.items():
+        if isinstance(spec, dict):
+            kinds = set(spec) & {'values', 'uniform', 'log_uniform', 'int'}
+            if len(kinds) != 1:
+                raise ValueError(f'Search space for {name} needs exactly one of values/uniform/log_uniform/int.')
+            if method == 'grid' and 'values' not in spec:
+                raise ValueError(f'Grid search needs explicit values for {name}.')
+    space['method'] = method
+    space['params'] = params
+    return space
+
+
+def sample(spec, rng: random.Random):
+    if not isinstance(spec, dict):
+        return spec
+    if 'values' in spec:
+        return rng.choice(spec['values'])
+    if 'uniform' in spec:
+        low, high = spec['uniform']
+        return rng.uniform(low, high)
+    if 'log_uniform' in spec:
+        low, high = spec['log_uniform']
+        return math.exp(rng.uniform(math.log(low), math.log(high)))
+    low, high = spec['int']
+    return rng.randint(low, high)
+
+
+class Sampler:
+    '''
+    ask() -> (trial_id, params) or None when the budget is spent;
+    tell(trial_id, score) feeds results back (used by the Bayesian method).
+    '''
+    def __init__(self, space: dict, seed: int=0):
+        self.space = space
+        self.method = space['method']
+        self.rng = random.Random(seed)
+        self.asked = 0
+        self.trials = space.get('trials')
+
+        if self.method == 'grid':
+            names = list(space['params'])
+            values = [
+                spec['values'] if isinstance(spec, dict) else [spec]
+                for spec in space['params'].values()
+            ]
+            self.grid = [dict(zip(names, combo)) for combo in itertools.product(*values)]
+            self.trials = min(self.trials or len(self.grid), len(self.grid))
+
+        self.study = None
+        if self.method == 'bayes':
+            try:
+                import optuna
+                optuna.logging.set_verbosity(optuna.logging.WARNING)
+                self.study = optuna.create_study(
+                    direction='maximize', sampler=optuna.samplers.TPESampler(seed=seed)
+                )
+                self.optuna_trials = {}
+            except ImportError:
+                logger.warning('optuna not installed; falling back to random search.')
+                self.method = 'random'
+
+        if self.trials is None:
+            raise ValueError('Random and Bayesian sweeps need a number of trials.')
+
+    def _optuna_params(self, trial):
+        params = {}
+        for name, spec in self.space['params'].items():
+            if not isinstance(spec, dict):
+                params[name] = spec
+            elif 'values' in spec:
+                params[name] = trial.suggest_categorical(name, spec['values'])
+            elif 'uniform' in spec:
+                params[name] = trial.suggest_float(name, *spec['uniform'])
+            elif 'log_uniform' in spec:
+                params[name] = trial.suggest_float(name, *spec['log_uniform'], log=True)
+            else:
+                params[name] = trial.suggest_int(name, *spec['int'])
+        return params
+
+    @property
+    def exhausted(self) -> bool:
+        return self.asked >= self.trials
+
+    def ask(self):
+        if self.exhausted:
+            return None
+        trial_id = self.asked
+        self.asked += 1
+        if self.method == 'grid':
+            return trial_id, dict(self.grid[trial_id])
+        if self.study is not None:
+            trial = self.study.ask()
+            self.optuna_trials[trial_id] = trial
+            return trial_id, self._optuna_params(trial)
+        return trial_id, {
+            name: sample(spec, self.rng) for name, spec in self.space['params'].items()
+        }
+
+    def tell(self, trial_id: int, score: float | None):
+        if self.study is not None and trial_id in self.optuna_trials:
+            import optuna
+            trial = self.optuna_trials.pop(trial_id)
+            if score is None:
+                self.study.tell(trial, state=optuna.trial.TrialState.FAIL)
+            else:
+                self.study.tell(trial, score)
+
+
+# --- early stopping ---
+
+class SuccessiveHalving:
+    '''
+    asynchronous successive halving: rungs at min_steps * eta^k. A trial
+    reaching a rung is stopped unless its score is in the top 1/eta of the
+    scores recorded at that rung so far (the first arrivals always go on).
+    '''
+    def __init__(self, min_steps: int, max_steps: int, eta: int=ETA):
+        self.eta = eta
+        self.rungs: list[int]=[]
+        rung = min_steps
+        while rung < max_steps:
+            self.rungs.append(rung)
+            rung *= eta
+        self.scores: dict[int, dict[int, float]]={rung: {} for rung in self.rungs}
+
+    def report(self, trial_id: int, score_at: Callable[[int], float | None], step: int) -> bool:
+        '''returns False if the trial should be stopped.'''
+        for rung in self.rungs:
+            if step < rung or trial_id in self.scores[rung]:
+                continue
+            score = score_at(rung)
+            if score is None:
+                continue
+            recorded = self.scores[rung]
+            recorded[trial_id] = score
+            if len(recorded) >= self.eta:
+                cutoff = sorted(recorded.values(), reverse=True)[len(recorded) // self.eta - 1]
+                if score < cutoff:
+                    return False
+        return True
+
+
+# --- trials ---
+
+@dataclass
+class Trial:
+    trial_id: int
+    params: dict
+    simulator: Instance         # leased from the sweep's pool for the trial's lifetime
+    directory: str
+    experiment: str
+    process: subprocess.Popen | None=None
+    status: str='running'
+    episodes: list[tuple[int, float]]=field(default_factory=list)   # (step, return)
+    _offset: int=0
+
+    def metrics_path(self) -> str | None:
+        runs = glob.glob(os.path.join(RUNS_DIR, f'*__{self.experiment}__*', METRICS_FILE))
+        return max(runs, key=os.path.getmtime) if runs else None
+
+    def poll(self):
+        '''reads episode records appended to the run's telemetry since the last poll.'''
+        path = self.metrics_path()
+        if path is None:
+            return
+        with open(path, 'rb') as file:
+            file.seek(self._offset)
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                self._offset += len(line)
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get('kind') == 'episode' and record.get('return') is not None:
+                    self.episodes.append((record['step'], record['return']))
+
+    @property
+    def step(self) -> int:
+        return self.episodes[-1][0] if self.episodes else 0
+
+    def score(self, until: int | None=None) -> float | None:
+        returns = [r for step, r in self.episodes if until is None or step <= until]
+        if not returns:
+            return None
+        window = returns[-SCORE_WINDOW:]
+        return sum(window) / len(window)
+
+    def stop(self, status: str):
+        self.status = status
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    def record(self) -> dict:
+        return {
+            'trial': self.trial_id, 'params': self.params, 'status': self.status,
+            'score': self.score(), 'steps': self.step, 'episodes': len(self.episodes),
+            'port': self.simulator.port, 'experiment': self.experiment,
+            'metrics': self.metrics_path(),
+        }
+
+
+def launch_trial(
+        trial_id: int,
+        params: dict,
+        simulator: Instance,
+        sweep_dir: str,
+        sweep_name: str,
+        config_sources: dict,
+        steps: int,
+        resolve_reward: Callable[[str], str],
+        action_repeat: int | None=None
+    ) -> Trial:
+    directory = os.path.join(sweep_dir, f'trial_{trial_id:03d}')
+    sources = dict(config_sources)
+    if REWARD_PARAM in params:
+        sources['reward_function'] = resolve_reward(params[REWARD_PARAM])
+    config_dir = materialize(os.path.join(directory, 'configs'), **sources)
+
+    # trial hyperparameters go into the trial's own hyper_params.yaml
+    experiment = f'{sweep_name}_t{trial_id:03d}'
+    hyper_params_path = os.path.join(config_dir, HYPER_PARAMS_FILE)
+    with open(hyper_params_path, 'r') as file:
+        hyper_params = yaml.safe_load(file)
+    if action_repeat:
+        # src.run wraps the trial's environment in ActionRepeat
+        hyper_params['action_repeat'] = action_repeat
+    hyper_params.update({k: v for k, v in params.items() if k != REWARD_PARAM})
+    hyper_params['experiment_name'] = experiment
+    with open(hyper_params_path, 'w') as file:
+        yaml.safe_dump(hyper_params, file)
+
+    command = [
+        sys.executable, '-m', 'src.cli', 'train',
+        '--config-dir', config_dir,
+        '--steps', str(steps),
+        '--port', str(simulator.port),
+    ]
+    log = open(os.path.join(directory, 'train.log'), 'w')
+    logger.info(f'Trial {trial_id} on port {simulator.port}: {params}')
+    process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+    return Trial(trial_id, params, simulator, directory, experiment, process)
+
+
+def sweep(
+        space_path: str,
+        config_sources: dict,
+        resolve_reward: Callable[[str], str],
+        name: str | None=None,
+        steps: int=15_000,
+        max_concurrent: int=2,
+        base_port: int=8888,
+        min_steps: int | None=None,
+        eta: int=ETA,
+        start_simulators: bool=True,
+        simulator_cpus: int | None=None,
+        simulator_memory: str | None=None,
+        simulator_backend: str='auto',
+        simulator_command: str | None=None,
+        action_repeat: int | None=None,
+        seed: int=0
+    ) -> list[dict]:
+    '''
+    runs the trials of a search space, at most `max_concurrent` at a time,
+    each against a simulator leased from a SimulatorPool (ports base_port,
+    base_port + 1, ...), stopping poor trials early by successive halving
+    on episodic return. Without `start_simulators` the pool only checks
+    simulators that are already running. Results are appended to
+    sweeps/<name>/results.jsonl; returns them best first. Trials repeat
+    each action `action_repeat` times unless the space searches it.
+    '''
+    space = load_search_space(space_path)
+    name = name or f'sweep_{int(time.time())}'
+    sweep_dir = os.path.join(SWEEPS_DIR, name)
+    os.makedirs(sweep_dir, exist_ok=True)
+    with open(os.path.join(sweep_dir, 'space.yaml'), 'w') as file:
+        yaml.safe_dump(space, file)
+
+    sampler = Sampler(space, seed=seed)
+    halving = SuccessiveHalving(min_steps or max(steps // eta ** 2, 1), steps, eta)
+    running: dict[int, Trial]={}
+    results = []
+
+    # trials differ only in hyperparameters/reward, so the simulators
+    # (which read environment/agent params) are shared by all of them
+    simulator_configs = materialize(os.path.join(sweep_dir, 'simulator_configs'), **config_sources)
+    pool = SimulatorPool(
+        max_concurrent,
+        backend=simulator_backend if start_simulators else 'external',
+        name=name,
+        base_port=base_port,
+        config_dir=simulator_configs,
+        cpus=simulator_cpus,
+        memory=simulator_memory,
+        command=simulator_command,
+        log_dir=os.path.join(sweep_dir, 'simulators'),
+    )
+
+    def finish(trial: Trial):
+        del running[trial.trial_id]
+        pool.release(trial.simulator)
+        trial.poll()
+        sampler.tell(trial.trial_id, trial.score())
+        result = trial.record()
+        results.append(result)
+        with open(os.path.join(sweep_dir, 'results.jsonl'), 'a') as file:
+            file.write(json.dumps(result) + '\n')
+        logger.info(f'Trial {trial.trial_id} {trial.status}: score={result["score"]} steps={result["steps"]}')
+
+    try:
+        pool.start()
+        while True:
+            while len(running) < max_concurrent and not sampler.exhausted:
+                simulator = pool.acquire(timeout=0 if running else None)
+                if simulator is None:
+                    break
+                trial_id, params = sampler.ask()
+                running[trial_id] = launch_trial(
+                    trial_id, params, simulator, sweep_dir, name,
+                    config_sources, steps, resolve_reward, action_repeat
+                )
+            if not running:
+                break
+
+            time.sleep(POLL_INTERVAL)
+            for trial in list(running.values()):
+                trial.poll()
+                if trial.process.poll() is not None:
+                    trial.status = 'completed' if trial.process.returncode == 0 else 'failed'
+                    finish(trial)
+                elif not halving.report(trial.trial_id, trial.score, trial.step):
+                    trial.stop('pruned')
+                    finish(trial)
+    finally:
+        for trial in list(running.values()):
+            trial.stop('interrupted')
+            finish(trial)
+        pool.close()
+
+    results.sort(key=lambda r: -math.inf if r['score'] is None else r['score'], reverse=True)
+    return results
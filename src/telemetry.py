@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import queue
+import threading
+from loguru import logger
+
+
+METRICS_FILE: str='metrics.jsonl'
+FLUSH_INTERVAL: float=5.0       # seconds
+MAX_QUEUE: int=100_000
+# keep the tags older plotting scripts and TensorBoard dashboards expect
+TENSORBOARD_TAGS: dict[tuple[str, str], str]={
+    ('episode', 'return'): 'charts/episodic_return',
+    ('episode', 'length'): 'charts/episodic_length',
+}
+
+
+class MetricsSink:
+    '''
+    structured training telemetry. Records are queued from the training
+    loop and written by a background thread to an append-only JSONL file
+    (one JSON object per line with `kind`, `step`, `time` and values),
+    to TensorBoard, and optionally to Parquet when pyarrow is installed.
+    '''
+    def __init__(
+            self,
+            directory: str,
+            writer=None,                        # torch SummaryWriter
+            parquet: bool=False,
+            flush_interval: float=FLUSH_INTERVAL,
+            max_queue: int=MAX_QUEUE
+        ):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, METRICS_FILE)
+        self.directory = directory
+        self.writer = writer
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._dropped = 0
+        self._parquet_writers = {}
+        self._parquet = parquet and self._parquet_available()
+
+        self._file = open(self.path, 'a')
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._worker, name='metrics-sink', daemon=True
+        )
+        self._thread.start()
+
+    @staticmethod
+    def _parquet_available() -> bool:
+        try:
+            import pyarrow  # noqa: F401
+            return True
+        except ImportError:
+            logger.warning('pyarrow not installed; writing metrics as JSONL only.')
+            return False
+
+    def log(self, kind: str, step: int, **values):
+        record = {'kind': kind, 'step': int(step), 'time': time.time()}
+        for key, value in values.items():
+            value = None if value is None else float(value)
+            # NaN (e.g. no lap time) is not valid JSON
+            record[key] = None if value != value else value
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            # never block the training loop on telemetry
+            self._dropped += 1
+
+    def episode(self, step: int, **values):
+        self.log('episode', step, **values)
+
+    def update(self, step: int, **values):
+        self.log('update', step, **values)
+
+    def _drain(self) -> list[dict]:
+        records = []
+        while True:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                return records
+
+    def _worker(self):
+        while not self._stop.wait(self.flush_interval):
+            self._write(self._drain())
+        self._write(self._drain())
+
+    def _write(self, records: list[dict]):
+        if not records:
+            return
+        self._file.write(
+            ''.join(json.dumps(record) + '\n' for record in records)
+        )
+        self._file.flush()
+
+        if self.writer is not None:
+            for record in records:
+                kind, step = record['kind'], record['step']
+                for key, value in record.items():
+                    if key in ('kind', 'step', 'time') or value is None:
+                        continue
+                    tag = TENSORBOARD_TAGS.get((kind, key), f'{kind}/{key}')
+                    self.writer.add_scalar(tag, value, step)
+
+        if self._parquet:
+            self._write_parquet(records)
+
+    def _write_parquet(self, records: list[dict]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        by_kind = {}
+        for record in records:
+            by_kind.setdefault(record['kind'], []).append(record)
+        for kind, rows in by_kind.items():
+            writer = self._parquet_writers.get(kind)
+            if writer is None:
+                schema = pa.Table.from_pylist(rows).schema
+                writer = pq.ParquetWriter(
+                    os.path.join(self.directory, f'metrics_{kind}.parquet'), schema
+                )
+                self._parquet_writers[kind] = writer
+            # one row group per flush; unseen keys are dropped, missing ones null
+            writer.write_table(pa.Table.from_pylist(rows, schema=writer.schema))
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self._file.close()
+        for writer in self._parquet_writers.values():
+            writer.close()
+        if self._dropped:
+            logger.warning(f'Dropped {self._dropped} metrics records (queue full).')
+
+
+def read_metrics(path: str, kind: str | None=None):
+    '''
+    loads a metrics stream (a run directory or a metrics.jsonl file)
+    into a pandas DataFrame, optionally only records of one `kind`.
+    '''
+    import pandas as pd
+
+    if os.path.isdir(path):
+        path = os.path.join(path, METRICS_FILE)
+    records = []
+    with open(path, 'r') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # partially written last line of a live run
+                continue
+            if kind is None or record.get('kind') == kind:
+                records.append(record)
+    return pd.DataFrame.from_records(records)
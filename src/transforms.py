@@ -5,6 +5,7 @@ import torch.nn as nn
 from deepracer_gym.envs.utils import (
     # un-flattened observation shapes
     LIDAR_SHAPE,
+    SECTOR_LIDAR_SHAPE,
     STEREO_CAMERA_SHAPE,
     FRONT_FACING_CAMERA_SHAPE
 )
@@ -17,10 +18,12 @@ CAMERA_MAX_MEASUREMENT: int=255
 # encoder params
 HIDDEN_CHANNELS: int=16
 LIDAR_LATENT_DIMENSION: int=32
+SECTOR_LIDAR_LATENT_DIMENSION: int=16
 CAMERA_LATENT_DIMENSION: int=96
 
 # flattened observation shapes
 LIDAR_FLATTEN_SHAPE: int=prod(LIDAR_SHAPE)
+SECTOR_LIDAR_FLATTEN_SHAPE: int=prod(SECTOR_LIDAR_SHAPE)
 STEREO_FLATTEN_CAMERA_SHAPE: int=prod(STEREO_CAMERA_SHAPE)
 FRONT_FLATTEN_FACING_CAMERA_SHAPE: int=prod(FRONT_FACING_CAMERA_SHAPE)
 
@@ -158,7 +161,7 @@ class EncodeFrontFacingCamera(nn.Module):
             nn.Flatten(),
             initialize(
                 nn.Linear(
-                    10*16*HIDDEN_CHANNELS,     # 2560
+                    5*8*HIDDEN_CHANNELS,       # 640
                     latent_dim,
                 )
             ),
@@ -211,6 +214,30 @@ class EncodeLiDAR(nn.Module):
         )
 
 
+class EncodeSectorLiDAR(nn.Module):
+    '''
+    MLP encoder for SECTOR_LIDAR observations, the simulator's per-sector
+    occupancy flags (already in [0, 1]); a handful of inputs, so it costs a
+    fraction of the camera encoders.
+    '''
+    def __init__(
+            self,
+            latent_dim=SECTOR_LIDAR_LATENT_DIMENSION,
+            sectors: int=SECTOR_LIDAR_FLATTEN_SHAPE,
+        ):
+        super().__init__()
+        self.output_layer = nn.Sequential(
+            initialize(nn.Linear(sectors, latent_dim)),
+            activation(),
+            initialize(nn.Linear(latent_dim, latent_dim)),
+            activation(),
+        )
+
+    def forward(self, x):
+        if x.dim() == 1:
+            x = x.unsqueeze(0)  # Add batch dim if missing
+        return self.output_layer(x.flatten(1))
+
 
 class UnflattenObservation(nn.Module):
     def forward(self, x):
@@ -1,29 +1,26 @@
 import os
 import json
-import yaml
 import torch
 import random
 import shutil
-import enlighten
+import functools
 import subprocess
 import numpy as np
-import pandas as pd
-import seaborn as sns
 import gymnasium as gym
 from loguru import logger
 from gymnasium import spaces
-import matplotlib.pyplot as plt
 from gymnasium.wrappers import (
-    RecordVideo,
-    FlattenObservation,
     RecordEpisodeStatistics
 )
-from IPython.display import Video, display, clear_output
 
 from src.agents import Agent
+from src.video import StreamVideo
+from deepracer_gym.wrappers import observation_wrapper, ProfiledFlattenObservation
+from deepracer_gym.config import (
+    ENVIRONMENT_PARAMS_PATH, load_environment_params
+)
 
 
-PROGRESS_MANAGER = enlighten.get_manager()
 FS_TICK: int = 12
 FS_LABEL: int = 18
 PLOT_DPI: int=1200
@@ -36,7 +33,6 @@ RC_PARAMS: dict = {
     'xtick.color': 'black',
     'ytick.color': 'black',
 }
-ENVIRONMENT_PARAMS_PATH: str='configs/environment_params.yaml'
 ENVIRONMENT_NAME: str='deepracer-v0'
 MAX_DEMO_STEPS: int = 1_000
 MAX_EVAL_STEPS: int = 1_000
@@ -45,6 +41,20 @@ ONLY_CPU: bool = False
 SEED: int=42
 
 
+# plotting, progress bar and notebook dependencies are imported on first use
+# so that importing this module (and src.cli, src.run) stays cheap
+
+@functools.cache
+def progress_manager():
+    import enlighten
+    return enlighten.get_manager()
+
+
+def _clear_output():
+    from IPython.display import clear_output
+    clear_output(wait=True)
+
+
 def set_seed(seed: int=SEED):
     '''
     set seed for reproducability
@@ -65,7 +75,9 @@ def set_seed(seed: int=SEED):
     logger.info(f'Random seed set as {seed}.')
 
 
+@functools.cache
 def device():
+    '''selected on first call (not at import), then reused.'''
     if torch.cuda.is_available():
         device = 'cuda'
     elif torch.backends.mps.is_available():
@@ -87,8 +99,9 @@ def make_environment(
     ):
     environment = gym.make(environment_name, **kwargs)
     
+    # sensors, or the reward_params state if agent_params.json selects it
     environment = RecordEpisodeStatistics(
-        FlattenObservation(environment)
+        ProfiledFlattenObservation(observation_wrapper(environment))
     )
     
     # environment.seed(seed)
@@ -101,41 +114,13 @@ def make_environment(
 def get_world_name(
     environment_params_path: str=ENVIRONMENT_PARAMS_PATH
     ):
-    with open(environment_params_path, 'r') as f:
-        environment_params = yaml.safe_load(f)
-    
-    if 'WORLD_NAME' not in environment_params:
-        raise ValueError(
-            f'WORLD_NAME not defined in {environment_params_path}'
-        )
-    
-    return environment_params['WORLD_NAME']
+    return load_environment_params(environment_params_path).world_name
 
 
 def get_race_type(
     environment_params_path: str=ENVIRONMENT_PARAMS_PATH
     ):
-    with open(environment_params_path, 'r') as f:
-        environment_params = yaml.safe_load(f)
-    
-    obstacles = int(environment_params['NUMBER_OF_OBSTACLES'])
-    bots = int(environment_params['NUMBER_OF_BOT_CARS'])
-    if (
-        obstacles == 0 and bots == 0
-    ):
-        return 'time_trial'
-    elif (
-        obstacles == 6 and bots == 0
-    ):
-        return 'obstacle_avoidance'
-    elif (
-        obstacles == 0 and bots == 3
-    ):
-        return 'head_to_bot'
-    else:
-        raise ValueError(
-            f'Incorrect configuration for NUMBER_OF_OBSTACLES or NUMBER_OF_BOT_CARS.'
-        )
+    return load_environment_params(environment_params_path).race_type
 
 
 def demo(
@@ -154,28 +139,15 @@ def demo(
     agent.eval().to(demo_device)
     os.makedirs(directory, exist_ok=True)
 
-    # create environment with proper render_mode
-    demo_environment = make_environment(
-        environment_name, render_mode='rgb_array'
-        #environment_name, render_mode=None
-    )
-
-    # apply video recording wrapper
-    # Uncommented to include agent name in video filename
-    # comment this out for training
-    """
-    demo_environment = RecordVideo(
-        demo_environment,
-        video_folder=directory,
-        episode_trigger=lambda x: True,
-        name_prefix=f'{world_name}-{race_type}-{agent.name}'
+    # stream camera frames to a background encoder as the episode runs
+    demo_environment = StreamVideo(
+        make_environment(environment_name),
+        os.path.join(directory, f'{world_name}-{race_type}-{agent.name}.mp4')
     )
-    """
-    
 
     observation, _ = demo_environment.reset()
 
-    demo_progress = PROGRESS_MANAGER.counter(
+    demo_progress = progress_manager().counter(
         total=MAX_DEMO_STEPS, desc=f'{world_name} {race_type} demo', unit='steps', leave=False
     )
     for t in range(MAX_DEMO_STEPS):
@@ -201,9 +173,7 @@ def demo(
     demo_environment.close()
     demo_progress.close()
     
-    # The RecordVideo wrapper names the file automatically with the prefix + step info
-    # We'll grab the latest video with our given prefix
-    # e.g. 'agent_rl-video-episode-0.mp4' or similar
+    # grab the latest video with our given prefix
     filtered_videos = sorted(
         f for f in os.listdir(directory)
         if (
@@ -225,7 +195,8 @@ def demo(
         directory, filtered_videos[-1]
     )
 
-    clear_output(wait=True)
+    from IPython.display import Video, display
+    _clear_output()
     display(
         Video(video_path, embed=True)
     )
@@ -254,7 +225,10 @@ def evaluate_track(
         agent: Agent,
         world_name: str,
         environment_name: str=ENVIRONMENT_NAME,
-        directory: str='./evaluations'               # directory to save eval data
+        directory: str='./evaluations',              # directory to save eval data
+        episodes: int=EVAL_EPISODES,
+        video_path: str | None=None,                 # '{episode}' for several videos
+        video_episodes: tuple[int, ...]=(0,)         # episodes to record
     ):
     race_type = get_race_type(
         environment_params_path=ENVIRONMENT_PARAMS_PATH
@@ -280,18 +254,23 @@ def evaluate_track(
     eval_environment = make_environment(
         ENVIRONMENT_NAME
     )
+    if video_path:
+        # video of the evaluation episodes themselves; no separate demo run
+        eval_environment = StreamVideo(
+            eval_environment, video_path, episodes=tuple(video_episodes)
+        )
     observation, _ = eval_environment.reset()
 
     eval_metrics = {
         'progress': [],
         'lap_time': [],
     }
-    evaluation_progress = PROGRESS_MANAGER.counter(
-        total=EVAL_EPISODES, desc=f'Evaluating {world_name}', unit='episodes'
+    evaluation_progress = progress_manager().counter(
+        total=episodes, desc=f'Evaluating {world_name}', unit='episodes'
     )
-    for episode in range(EVAL_EPISODES):
+    for episode in range(episodes):
         
-        episode_progress = PROGRESS_MANAGER.counter(
+        episode_progress = progress_manager().counter(
             total=MAX_EVAL_STEPS, desc=f'Episode {episode}', unit='steps', leave=False
         )
         for t in range(MAX_EVAL_STEPS):
@@ -372,7 +351,8 @@ def evaluate(
     agent.eval().to(eval_device)
     os.makedirs(directory, exist_ok=True)
 
-    status = PROGRESS_MANAGER.status_bar(
+    import enlighten
+    status = progress_manager().status_bar(
         status_format=race_type + u' {fill}Evaluating {track}{fill}{elapsed}',
         color='bold_underline_bright_white_on_lightslategray',
         justify=enlighten.Justify.CENTER, track='<track>',
@@ -407,6 +387,9 @@ def plot_metrics(
         title,
         directory: str='./plots'               # directory to save plots
     ):
+    import pandas as pd
+    import seaborn as sns
+    import matplotlib.pyplot as plt
 
     df_progress = pd.DataFrame([
         {"Track": track, "Progress": progress}
@@ -472,7 +455,7 @@ def plot_metrics(
     ax[1].set_yscale('log')
     plt.grid(axis='y', linestyle='--', alpha=0.7)
 
-    clear_output(wait=True)
+    _clear_output()
 
     plt.tight_layout()
     plt.show()
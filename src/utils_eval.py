@@ -3,12 +3,15 @@ import json
 import yaml
 import torch
 import random
-import shutil
 import numpy as np
 import gymnasium as gym
-from gymnasium.wrappers import RecordVideo, FlattenObservation, RecordEpisodeStatistics
+from gymnasium.wrappers import FlattenObservation, RecordEpisodeStatistics
 from loguru import logger
-import glob
+
+from src.dataset import RecordTransitions
+from src.video import StreamVideo
+from src.utils import lap_time, run_command
+from deepracer_gym.wrappers import observation_wrapper
 
 SEED = 42
 
@@ -26,14 +29,31 @@ def make_environment(environment_name="deepracer-v0", **kwargs):
     if "world_name" in kwargs:
         del kwargs["world_name"]
     env = gym.make(environment_name, **kwargs)
+    env = observation_wrapper(env)
     env = FlattenObservation(env)
     env = RecordEpisodeStatistics(env)
     return env
 
-def evaluate_track(agent, world_name, environment_name="deepracer-v0", episodes=5, directory='./evaluations'):
+def evaluate_track(agent, world_name, environment_name="deepracer-v0", episodes=5, directory='./evaluations', dataset_dir=None,
+                   video_path=None, video_episodes=(0,)):
     logger.info(f"📊 Evaluating on {world_name} for {episodes} episodes...")
-    
+
+    # load the track: the simulator restarts in evaluation mode on world_name
+    run_command([
+        "/bin/bash",
+        "./scripts/restart_deepracer.sh",
+        "-E", "true",
+        "-W", world_name,
+    ])
+
     env = make_environment(environment_name)
+    if video_path:
+        # record the chosen episodes of this run ("{episode}" in video_path for
+        # more than one) instead of a separate demo pass through the simulator
+        env = StreamVideo(env, video_path, episodes=tuple(video_episodes))
+    if dataset_dir:
+        # evaluation laps are good demonstrations for offline pretraining
+        env = RecordTransitions(env, dataset_dir)
     progress_list = []
     lap_times = []
     
@@ -58,10 +78,11 @@ def evaluate_track(agent, world_name, environment_name="deepracer-v0", episodes=
             done = terminated or truncated
             
             if done:
-                prog = info.get('progress', 0.0)
-                time_val = info.get('episode', {}).get('t', 0.0)
+                # progress only exists inside reward_params
+                prog = float(info['reward_params']['progress'])
+                lap = lap_time(info)
                 progress_list.append(prog)
-                lap_times.append(time_val if prog >= 99.0 else None)
+                lap_times.append(None if np.isnan(lap) else float(lap))
                 logger.info(f"   Ep {i+1}: Progress={prog:.2f}%")
 
     env.close()
@@ -80,31 +101,24 @@ def evaluate_track(agent, world_name, environment_name="deepracer-v0", episodes=
         
     return metrics
 
-def evaluate(agent, world_name=None, environment_name="deepracer-v0", episodes=5, directory='./evaluations'):
+def evaluate(agent, world_name=None, environment_name="deepracer-v0", episodes=5, directory='./evaluations', video_path=None):
     agent.eval()
     if world_name:
-        return evaluate_track(agent, world_name, environment_name, episodes, directory)
+        return evaluate_track(agent, world_name, environment_name, episodes, directory, video_path=video_path)
     
     logger.warning("Bulk evaluation requested.")
     results = {}
     for track in ['reInvent2019_wide', 'reInvent2019_track', 'Vegas_track']:
         results[track] = evaluate_track(agent, track, environment_name, episodes, directory)
+    # back to the configured training track
+    run_command(["/bin/bash", "./scripts/restart_deepracer.sh"])
     return results
 
 def demo(agent, world_name, output_path, environment_name="deepracer-v0", directory="."):
     logger.info(f"🎥 Recording Demo for {world_name}...")
-    video_folder = os.path.dirname(output_path)
-    os.makedirs(video_folder, exist_ok=True)
     
-    env = gym.make(environment_name, render_mode='rgb_array')
-    env = FlattenObservation(env)
-    
-    env = RecordVideo(
-        env,
-        video_folder=video_folder,
-        name_prefix=f"temp_{world_name}",
-        episode_trigger=lambda x: True
-    )
+    # frames are streamed to the encoder as they arrive, not buffered per episode
+    env = StreamVideo(make_environment(environment_name), output_path)
     
     obs, _ = env.reset()
     done = False
@@ -121,13 +135,4 @@ def demo(agent, world_name, output_path, environment_name="deepracer-v0", direct
         done = terminated or truncated
 
     env.close()
-    
-    generated_file = os.path.join(video_folder, f"temp_{world_name}-episode-0.mp4")
-    if os.path.exists(generated_file):
-        shutil.move(generated_file, output_path)
-        logger.info(f"✅ Video saved to: {output_path}")
-    else:
-        files = sorted(glob.glob(f"{video_folder}/*.mp4"))
-        if files:
-            shutil.move(files[-1], output_path)
-            logger.info(f"✅ Video saved (fallback): {output_path}")
+    logger.info(f"✅ Video saved to: {output_path}")
@@ -0,0 +1,201 @@
+import os
+import queue
+import shutil
+import threading
+import subprocess
+import numpy as np
+import gymnasium as gym
+from loguru import logger
+
+from deepracer_gym.envs.utils import observation_to_frame
+
+
+FPS: int=15                 # the simulator steps at ~15 Hz
+QUEUE_SIZE: int=256         # frames buffered between the control loop and the encoder
+FFMPEG_ARGS: tuple[str, ...]=(
+    '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+    # libx264 with yuv420p needs even dimensions
+    '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+)
+
+
+class _FFmpegEncoder:
+    '''raw RGB frames piped into an ffmpeg process.'''
+    def __init__(self, path: str, width: int, height: int, fps: int):
+        self.process = subprocess.Popen(
+            [
+                shutil.which('ffmpeg'), '-y', '-loglevel', 'error',
+                '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+                '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+                *FFMPEG_ARGS, path,
+            ],
+            stdin=subprocess.PIPE,
+        )
+
+    def write(self, frame: np.ndarray):
+        self.process.stdin.write(frame.tobytes())
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait():
+            logger.error(f'ffmpeg exited with {self.process.returncode}.')
+
+
+class _PyAVEncoder:
+    def __init__(self, path: str, width: int, height: int, fps: int):
+        import av
+        self.container = av.open(path, mode='w')
+        self.stream = self.container.add_stream('libx264', rate=fps)
+        self.stream.width = width + width % 2
+        self.stream.height = height + height % 2
+        self.stream.pix_fmt = 'yuv420p'
+
+    def write(self, frame: np.ndarray):
+        import av
+        if frame.shape[0] % 2 or frame.shape[1] % 2:
+            frame = np.pad(frame, ((0, frame.shape[0] % 2), (0, frame.shape[1] % 2), (0, 0)))
+        for packet in self.stream.encode(av.VideoFrame.from_ndarray(frame, format='rgb24')):
+            self.container.mux(packet)
+
+    def close(self):
+        for packet in self.stream.encode():
+            self.container.mux(packet)
+        self.container.close()
+
+
+class _OpenCVEncoder:
+    def __init__(self, path: str, width: int, height: int, fps: int):
+        import cv2
+        self.writer = cv2.VideoWriter(
+            path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height)
+        )
+
+    def write(self, frame: np.ndarray):
+        # OpenCV expects BGR
+        self.writer.write(np.ascontiguousarray(frame[..., ::-1]))
+
+    def close(self):
+        self.writer.release()
+
+
+def _encoder_class():
+    if shutil.which('ffmpeg'):
+        return _FFmpegEncoder
+    for module, encoder in (('av', _PyAVEncoder), ('cv2', _OpenCVEncoder)):
+        try:
+            __import__(module)
+            return encoder
+        except ImportError:
+            continue
+    raise RuntimeError('Video encoding needs ffmpeg on the PATH, PyAV or OpenCV.')
+
+
+class VideoSink:
+    '''
+    writes an mp4 incrementally. Frames go through a bounded queue to a
+    background thread feeding the encoder (an ffmpeg process, else PyAV or
+    OpenCV), so memory stays flat however long the episode and the control
+    loop only pays for a queue put. The encoder opens on the first frame.
+    '''
+    def __init__(self, path: str, fps: int=FPS, queue_size: int=QUEUE_SIZE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.fps = fps
+        self.frames = 0
+        self.error: Exception | None=None
+        self._encoder_class = _encoder_class()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(
+            target=self._worker, name='video-sink', daemon=True
+        )
+        self._thread.start()
+
+    def write(self, frame: np.ndarray):
+        '''frame: H x W x 3 uint8; not copied, so pass a frame you won't modify.'''
+        if self.error is not None:
+            return
+        self._queue.put(frame)
+        self.frames += 1
+
+    def _worker(self):
+        encoder = None
+        while (frame := self._queue.get()) is not None:
+            if self.error is not None:
+                continue
+            try:
+                if encoder is None:
+                    height, width = frame.shape[:2]
+                    encoder = self._encoder_class(self.path, width, height, self.fps)
+                encoder.write(frame)
+            except Exception as e:
+                logger.error(f'Video encoding to {self.path} failed: {e}')
+                self.error = e
+        if encoder is not None:
+            encoder.close()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        if self.error is None:
+            logger.info(f'Video saved to {self.path} ({self.frames} frames).')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StreamVideo(gym.Wrapper):
+    '''
+    taps the camera frame of every step's already parsed observation
+    (DeepracerGymEnv.last_observation, so it works above observation
+    wrappers) into a VideoSink. `path` may contain `{episode}`; only the
+    episodes in `episodes` (all if None) are recorded.
+    '''
+    def __init__(
+            self,
+            env: gym.Env,
+            path: str,
+            episodes: tuple[int, ...] | None=(0,),
+            fps: int=FPS
+        ):
+        super().__init__(env)
+        self.path = path
+        self.episodes = episodes
+        self.fps = fps
+        self.paths: list[str]=[]            # videos written so far
+        self._episode = -1
+        self._sink: VideoSink | None=None
+
+    def _capture(self):
+        if self._sink is not None:
+            self._sink.write(observation_to_frame(self.env.unwrapped.last_observation))
+
+    def _close_sink(self):
+        if self._sink is not None:
+            self._sink.close()
+            self.paths.append(self._sink.path)
+            self._sink = None
+
+    def reset(self, **kwargs):
+        observation, info = self.env.reset(**kwargs)
+        self._close_sink()
+        self._episode += 1
+        if self.episodes is None or self._episode in self.episodes:
+            self._sink = VideoSink(self.path.format(episode=self._episode), fps=self.fps)
+            self._capture()
+        return observation, info
+
+    def step(self, action):
+        observation, reward, terminated, truncated, info = self.env.step(action)
+        self._capture()
+        if terminated or truncated:
+            self._close_sink()
+        return observation, reward, terminated, truncated, info
+
+    def close(self):
+        self._close_sink()
+        return self.env.close()
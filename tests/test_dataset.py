@@ -0,0 +1,35 @@
+import numpy as np
+import gymnasium as gym
+from gymnasium import spaces
+
+from src.dataset import RecordTransitions, TransitionDataset
+
+
+class Episodes(gym.Env):
+    '''episodes of `length` steps with a 3-float observation.'''
+    observation_space = spaces.Box(-1.0, 1.0, (3,), dtype=np.float32)
+    action_space = spaces.Box(-1.0, 1.0, (2,), dtype=np.float32)
+
+    def __init__(self, length: int):
+        self.length = length
+
+    def reset(self, **kwargs):
+        self.t = 0
+        return np.zeros(3, dtype=np.float32), {}
+
+    def step(self, action):
+        self.t += 1
+        return np.full(3, self.t, dtype=np.float32), 1.0, self.t == self.length, False, {}
+
+
+def test_finished_episodes_are_readable_without_close(tmp_path):
+    env = RecordTransitions(Episodes(length=4), str(tmp_path))
+    env.reset()
+    for _ in range(2 * 4 + 2):     # two episodes, then a killed third
+        _, _, terminated, _, _ = env.step(env.action_space.sample())
+        if terminated:
+            env.reset()
+
+    dataset = TransitionDataset(str(tmp_path))
+    assert len(dataset) == 8
+    assert dataset.field('dones').sum() == 2
@@ -0,0 +1,26 @@
+import numpy as np
+
+from deepracer_gym.envs.utils import observation_to_frame
+
+
+def test_front_camera_frame_is_a_copy_of_a_shared_buffer():
+    # the shm transport hands out CHW transposes of HWC views into its ring
+    ring = np.random.randint(0, 256, size=(120, 160, 3), dtype=np.uint8)
+    observation = {'FRONT_FACING_CAMERA': ring.transpose(2, 0, 1)}
+
+    frame = observation_to_frame(observation)
+    expected = ring.copy()
+    ring[:] = 0     # the server overwrites the slot
+
+    assert not np.shares_memory(frame, ring)
+    assert frame.flags['C_CONTIGUOUS']
+    np.testing.assert_array_equal(frame, expected)
+
+
+def test_stereo_frame_is_side_by_side_rgb():
+    left = np.full((120, 160), 10, dtype=np.uint8)
+    right = np.full((120, 160), 20, dtype=np.uint8)
+    frame = observation_to_frame({'STEREO_CAMERAS': np.stack((left, right))})
+
+    assert frame.shape == (120, 320, 3)
+    assert (frame[:, :160] == 10).all() and (frame[:, 160:] == 20).all()
@@ -0,0 +1,58 @@
+import types
+import numpy as np
+from gymnasium import spaces
+
+from src.ppo import PPOAgent
+from src.rollout import slab_returns
+
+
+def make_agent():
+    return PPOAgent(types.SimpleNamespace(
+        observation_space=spaces.Box(-1.0, 1.0, (4,), dtype=np.float32),
+        action_space=spaces.Box(-1.0, 1.0, (2,), dtype=np.float32),
+    ), gamma=0.9)
+
+
+def trajectory(lengths, rng):
+    rewards = rng.uniform(0.0, 2.0, sum(lengths)).astype(np.float32)
+    dones = np.zeros(len(rewards), dtype=np.float32)
+    dones[np.cumsum(lengths) - 1] = 1.0
+    return rewards, dones
+
+
+def test_slab_ending_mid_episode_matches_serial_returns():
+    agent = make_agent()
+    rewards, dones = trajectory([7, 9], np.random.default_rng(0))
+    # serial run(): one update per finished episode, whole episodes only
+    serial = agent.discounted_returns(rewards, dones)
+
+    horizon = 11    # cuts the second episode after 4 of its 9 steps
+    arrays = {
+        'rewards': rewards[:horizon],
+        'dones': dones[:horizon],
+        'last_observation': np.zeros(4, dtype=np.float32),
+    }
+    # a critic that knows the rest of the episode
+    agent.value = lambda observation: float(serial[horizon])
+
+    np.testing.assert_allclose(slab_returns(agent, arrays), serial[:horizon], rtol=1e-5)
+
+
+def test_slab_ending_at_episode_end_is_not_bootstrapped():
+    agent = make_agent()
+    rewards, dones = trajectory([5, 6], np.random.default_rng(1))
+    arrays = {'rewards': rewards, 'dones': dones, 'last_observation': np.zeros(4, dtype=np.float32)}
+    agent.value = lambda observation: 1e6
+
+    np.testing.assert_allclose(
+        slab_returns(agent, arrays), agent.discounted_returns(rewards, dones), rtol=1e-6
+    )
+
+
+def test_value_is_in_return_units():
+    agent = make_agent()
+    observation = np.zeros(4, dtype=np.float32)
+    normalized = agent.value(observation)
+    agent.return_scale = (3.0, 2.0)
+
+    assert np.isclose(agent.value(observation), normalized * 2.0 + 3.0)